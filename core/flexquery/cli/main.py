@@ -5,13 +5,13 @@ import sys
 from flexquery.cli import params as p
 from flexquery.version import __version__
 from flexquery.config.exceptions import  ApplicationError
-from flexquery.task.docs_serve import DocsServeTask
-from flexquery.task.init import InitTask
-from flexquery.task.run import RunTask
 
 from flexquery.config.logging_config import get_logger
 logger = get_logger(__name__)
 
+# Tasks are imported inside their commands: the run task pulls in pandas, SQLAlchemy and
+# the database drivers, which --version, --help and the docs command don't need.
+
 
 def cli_error_handler(func):
     """Decorator to handle errors in CLI commands with user-friendly messages."""
@@ -34,6 +34,7 @@ def global_flags(func):
     @p.win_auth
     @p.username
     @p.password
+    @p.log_level
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         return func(*args, **kwargs)
@@ -42,8 +43,29 @@ def global_flags(func):
 def output_flags(func):
     @p.write_json
     @p.write_csv
+    @p.compress
     @p.write_excel
+    @p.write_parquet
+    @p.parquet_compression
+    @p.row_group_size
+    @p.output_workers
     @p.interactive
+    @p.stream
+    @p.chunk_size
+    @p.no_cache
+    @p.refresh
+    @p.full_refresh
+    @p.profile
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+def batch_flags(func):
+    @p.query
+    @p.all_queries
+    @p.all_envs
+    @p.concurrency
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         return func(*args, **kwargs)
@@ -71,11 +93,22 @@ def cli(**kwargs):
 @p.environment
 @global_flags
 @output_flags
+@batch_flags
+@p.explain
+@p.force
+@p.timeout
+@p.partition_by
+@p.partitions
+@p.unordered
 @cli_error_handler
 def run(**kwargs):
     """Execute a SQL query"""
+    from flexquery.task.run import MultiEnvRunTask, RunTask
 
-    task = RunTask(**kwargs)
+    if kwargs.get('all_envs') or ',' in (kwargs.get('env') or ''):
+        task = MultiEnvRunTask(**kwargs)
+    else:
+        task = RunTask(**kwargs)
     results = task.execute()
     return results
 
@@ -86,16 +119,39 @@ def run(**kwargs):
 @cli_error_handler
 def init(**kwargs):
     """Initialize FlexQuery configuration and project structure"""
+    from flexquery.task.init import InitTask
     
     task = InitTask(**kwargs)
     return task.execute()
 
 
+# diff
+@cli.command("diff")
+@p.diff_query
+@p.left_env
+@p.right_env
+@p.key
+@p.sample
+@p.chunk_size
+@global_flags
+@cli_error_handler
+def diff(**kwargs):
+    """Compare the result of a query in two environments"""
+    from flexquery.task.diff import DiffTask
+
+    task = DiffTask(**kwargs)
+    result = task.execute()
+    if not result.identical:
+        sys.exit(1)
+    return result
+
+
 # docs
 @cli.command("docs")
 @cli_error_handler
 def docs(**kwargs):
     """Show FlexQuery documentation."""
+    from flexquery.task.docs_serve import DocsServeTask
 
     task = DocsServeTask()
     return task.execute()
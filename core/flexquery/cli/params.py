@@ -1,12 +1,14 @@
 import click
 
+from flexquery.config.constants import CSV_COMPRESSIONS, DEFAULT_DIFF_SAMPLE, LOG_LEVELS, PARQUET_COMPRESSIONS
+
 
 environment = click.option(
     "--env",
     "-e",
     type=str,
     default="TEST",
-    help="Which environment to use (DEV, UAT, PROD, TEST for DuckDB)",
+    help="Which environment to use (DEV, UAT, PROD, TEST for DuckDB). A comma-separated list runs the query against each environment concurrently",
     show_default=True
 )
 
@@ -30,6 +32,186 @@ write_json = click.option(
     help="Write the query results to a JSON file"
 )
 
+write_parquet = click.option(
+    "--write-parquet",
+    "-pq",
+    is_flag=True,
+    help="Write the query results to a Parquet file"
+)
+
+compress = click.option(
+    "--compress",
+    type=click.Choice(CSV_COMPRESSIONS),
+    default=None,
+    help="Compress CSV output while it is written (overrides compress in profiles.yml)"
+)
+
+parquet_compression = click.option(
+    "--parquet-compression",
+    type=click.Choice(PARQUET_COMPRESSIONS),
+    default=None,
+    help="Parquet compression codec (overrides parquet_compression in profiles.yml)"
+)
+
+row_group_size = click.option(
+    "--row-group-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Rows per Parquet row group (overrides parquet_row_group_size in profiles.yml)"
+)
+
+output_workers = click.option(
+    "--output-workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of output files written concurrently (overrides output_workers in profiles.yml)"
+)
+
+stream = click.option(
+    "--stream",
+    is_flag=True,
+    help="Stream the query results in chunks instead of loading them into memory at once"
+)
+
+chunk_size = click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of rows per chunk in streaming mode (overrides chunk_size in profiles.yml)"
+)
+
+profile = click.option(
+    "--profile",
+    is_flag=True,
+    help="Print per-phase timings, row and byte counts and peak memory at the end of the run"
+)
+
+full_refresh = click.option(
+    "--full-refresh",
+    is_flag=True,
+    help="Forget the watermark of incremental queries and rebuild their datasets from the initial watermark"
+)
+
+explain = click.option(
+    "--explain",
+    is_flag=True,
+    help="Show the estimated rows and cost of the query from its estimated plan, without running it"
+)
+
+force = click.option(
+    "--force",
+    is_flag=True,
+    help="Run the query even if its estimate exceeds max_estimated_rows or max_estimated_cost in profiles.yml"
+)
+
+timeout = click.option(
+    "--timeout",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Cancel a query on the server after this many seconds (overrides @timeout in the query and query_timeout in profiles.yml)"
+)
+
+partition_by = click.option(
+    "--partition-by",
+    default=None,
+    help="Numeric or date key column: split the query into key ranges fetched concurrently over separate connections"
+)
+
+partitions = click.option(
+    "--partitions",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of key ranges fetched concurrently with --partition-by, within the connection pool capacity (overrides partitions in profiles.yml)"
+)
+
+unordered = click.option(
+    "--unordered",
+    is_flag=True,
+    help="With --partition-by, write rows as soon as any key range returns them instead of in key order"
+)
+
+no_cache = click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Do not read or write the local result cache"
+)
+
+refresh = click.option(
+    "--refresh",
+    is_flag=True,
+    help="Re-run the query even if a cached result exists, and update the cache"
+)
+
+query = click.option(
+    "--query",
+    "-q",
+    "queries",
+    multiple=True,
+    help="Name or glob pattern of a query to run without prompting (repeatable)"
+)
+
+all_queries = click.option(
+    "--all",
+    "all_queries",
+    is_flag=True,
+    help="Run every query in the environment without prompting"
+)
+
+all_envs = click.option(
+    "--all-envs",
+    is_flag=True,
+    help="Run the query against every environment in profiles.yml concurrently"
+)
+
+concurrency = click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of queries run at the same time in batch mode (overrides concurrency in profiles.yml)"
+)
+
+diff_query = click.option(
+    "--query",
+    "-q",
+    required=True,
+    help="Name of the query file to run in both environments"
+)
+
+left_env = click.option(
+    "--left",
+    required=True,
+    help="Environment of the reference result, e.g. UAT"
+)
+
+right_env = click.option(
+    "--right",
+    required=True,
+    help="Environment of the result compared to it, e.g. PROD"
+)
+
+key = click.option(
+    "--key",
+    "-k",
+    "keys",
+    multiple=True,
+    help="Key column that identifies a row (repeatable). Without keys, rows are compared as a whole"
+)
+
+sample = click.option(
+    "--sample",
+    type=click.IntRange(min=0),
+    default=DEFAULT_DIFF_SAMPLE,
+    show_default=True,
+    help="Number of sample rows shown for each kind of difference"
+)
+
+log_level = click.option(
+    "--log-level",
+    type=click.Choice(LOG_LEVELS, case_sensitive=False),
+    default=None,
+    help="Lowest level written to the log files (default: INFO); DEBUG adds debug messages"
+)
+
 win_auth = click.option(
     "--win-auth", 
     is_flag=True,
@@ -1,14 +1,24 @@
 import yaml
 
+from flexquery.config.constants import (
+    CSV_COMPRESSIONS, DEFAULT_CACHE_MAX_SIZE_MB, DEFAULT_CACHE_TTL, DEFAULT_CATEGORY_THRESHOLD,
+    DEFAULT_CHUNK_SIZE, DEFAULT_COMPACT_FILES, DEFAULT_CONCURRENCY, DEFAULT_JSON_DATE_FORMAT, DEFAULT_OUTPUT_WORKERS,
+    DEFAULT_PARQUET_COMPRESSION, DEFAULT_PARTITIONS, DEFAULT_POOL_RECYCLE, DEFAULT_POOL_SIZE, DEFAULT_ROW_GROUP_SIZE,
+    IN_LIST_STRATEGY_NAMES, JSON_DATE_FORMATS, PARQUET_COMPRESSIONS, SWEEP_KEY, SWEEP_OUTPUT_KEY, SWEEP_OUTPUTS
+)
 from flexquery.config.exceptions import ConfigurationError
 from flexquery.config.pathconfig import AppPaths
+from flexquery.config.snapshot import ConfigSnapshot
 
 
 class Config:
     def __init__(self, env, win_auth, **kwargs):
         self.env = env 
-        self.envvar = self._load_profiles()['flexquery']['outputs'].get(env) 
+        self.snapshot = self._load_profiles()
+        self.envvar = self.snapshot.get_profile(env)
         self.params = self._get_params(env)
+        self.sweep = self.params.pop(SWEEP_KEY, None)
+        self.sweep_output = self.params.pop(SWEEP_OUTPUT_KEY, SWEEP_OUTPUTS[0])
         self.win_auth = win_auth
         self.username = self.envvar.get('username')
         self.password = self.envvar.get('password')
@@ -17,6 +27,30 @@ class Config:
         self.server = self.envvar.get('server')
         self.database = self.envvar.get('database')
         self.application_intent = self.envvar.get('read_only')
+        self.pool_size = self.envvar.get('pool_size', DEFAULT_POOL_SIZE)
+        self.pool_recycle = self.envvar.get('pool_recycle', DEFAULT_POOL_RECYCLE)
+        self.pool_pre_ping = self.envvar.get('pool_pre_ping', False)
+        self.stream = self.envvar.get('stream', False)
+        self.chunk_size = self.envvar.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        self.arrow_fetch = self.envvar.get('arrow_fetch', True)
+        self.columnar_fetch = self.envvar.get('columnar_fetch', True)
+        self.optimize_dtypes = self.envvar.get('optimize_dtypes', False)
+        self.category_threshold = self.envvar.get('category_threshold', DEFAULT_CATEGORY_THRESHOLD)
+        self.output_workers = self.envvar.get('output_workers', DEFAULT_OUTPUT_WORKERS)
+        self.concurrency = self.envvar.get('concurrency', DEFAULT_CONCURRENCY)
+        self.in_list_strategy = self.envvar.get('in_list_strategy', 'auto')
+        self.cache = self.envvar.get('cache', False)
+        self.cache_ttl = self.envvar.get('cache_ttl', DEFAULT_CACHE_TTL)
+        self.cache_max_size_mb = self.envvar.get('cache_max_size_mb', DEFAULT_CACHE_MAX_SIZE_MB)
+        self.compress = self.envvar.get('compress')
+        self.json_date_format = self.envvar.get('json_date_format', DEFAULT_JSON_DATE_FORMAT)
+        self.parquet_compression = self.envvar.get('parquet_compression', DEFAULT_PARQUET_COMPRESSION)
+        self.parquet_row_group_size = self.envvar.get('parquet_row_group_size', DEFAULT_ROW_GROUP_SIZE)
+        self.compact_files = self.envvar.get('compact_files', DEFAULT_COMPACT_FILES)
+        self.max_estimated_rows = self.envvar.get('max_estimated_rows')
+        self.max_estimated_cost = self.envvar.get('max_estimated_cost')
+        self.query_timeout = self.envvar.get('query_timeout')
+        self.partitions = self.envvar.get('partitions', DEFAULT_PARTITIONS)
         self.validate()
 
     
@@ -33,15 +67,59 @@ class Config:
             raise ConfigurationError("Environment is required for running SQL queries")
         if not self.envvar:
             raise ConfigurationError(f"Environment '{self.env}' not found in profiles.yml")
+        if not isinstance(self.pool_size, int) or self.pool_size <= 0:
+            raise ConfigurationError(f"Invalid pool_size for environment '{self.env}': {self.pool_size}")
+        if not isinstance(self.pool_recycle, int) or self.pool_recycle < -1:
+            raise ConfigurationError(f"Invalid pool_recycle for environment '{self.env}': {self.pool_recycle}")
+        if not isinstance(self.pool_pre_ping, bool):
+            raise ConfigurationError(f"Invalid pool_pre_ping for environment '{self.env}': {self.pool_pre_ping}")
+        if not isinstance(self.chunk_size, int) or self.chunk_size <= 0:
+            raise ConfigurationError(f"Invalid chunk_size for environment '{self.env}': {self.chunk_size}")
+        if not isinstance(self.optimize_dtypes, bool):
+            raise ConfigurationError(f"Invalid optimize_dtypes for environment '{self.env}': {self.optimize_dtypes}")
+        if not isinstance(self.category_threshold, (int, float)) or not 0 <= self.category_threshold <= 1:
+            raise ConfigurationError(f"Invalid category_threshold for environment '{self.env}': {self.category_threshold}")
+        if not isinstance(self.output_workers, int) or self.output_workers <= 0:
+            raise ConfigurationError(f"Invalid output_workers for environment '{self.env}': {self.output_workers}")
+        if self.in_list_strategy not in IN_LIST_STRATEGY_NAMES:
+            raise ConfigurationError(f"Invalid in_list_strategy for environment '{self.env}': {self.in_list_strategy}")
+        if self.sweep is not None and (
+            not isinstance(self.sweep, dict) or not self.sweep
+            or not all(isinstance(values, list) and values for values in self.sweep.values())
+        ):
+            raise ConfigurationError(f"'{SWEEP_KEY}' in params.yml must map parameter names to non-empty lists of values")
+        if self.sweep_output not in SWEEP_OUTPUTS:
+            raise ConfigurationError(f"Invalid {SWEEP_OUTPUT_KEY} in params.yml: {self.sweep_output} (expected one of {SWEEP_OUTPUTS})")
+        if not isinstance(self.concurrency, int) or self.concurrency <= 0:
+            raise ConfigurationError(f"Invalid concurrency for environment '{self.env}': {self.concurrency}")
+        if not isinstance(self.cache_ttl, int) or self.cache_ttl < 0:
+            raise ConfigurationError(f"Invalid cache_ttl for environment '{self.env}': {self.cache_ttl}")
+        if not isinstance(self.cache_max_size_mb, int) or self.cache_max_size_mb <= 0:
+            raise ConfigurationError(f"Invalid cache_max_size_mb for environment '{self.env}': {self.cache_max_size_mb}")
+        if self.compress is not None and self.compress not in CSV_COMPRESSIONS:
+            raise ConfigurationError(f"Invalid compress for environment '{self.env}': {self.compress}")
+        if self.json_date_format not in JSON_DATE_FORMATS:
+            raise ConfigurationError(f"Invalid json_date_format for environment '{self.env}': {self.json_date_format}")
+        if self.parquet_compression not in PARQUET_COMPRESSIONS:
+            raise ConfigurationError(f"Invalid parquet_compression for environment '{self.env}': {self.parquet_compression}")
+        if not isinstance(self.parquet_row_group_size, int) or self.parquet_row_group_size <= 0:
+            raise ConfigurationError(f"Invalid parquet_row_group_size for environment '{self.env}': {self.parquet_row_group_size}")
+        if not isinstance(self.compact_files, int) or self.compact_files < 2:
+            raise ConfigurationError(f"Invalid compact_files for environment '{self.env}': {self.compact_files}")
+        if self.max_estimated_rows is not None and (not isinstance(self.max_estimated_rows, int) or self.max_estimated_rows <= 0):
+            raise ConfigurationError(f"Invalid max_estimated_rows for environment '{self.env}': {self.max_estimated_rows}")
+        if self.max_estimated_cost is not None and (not isinstance(self.max_estimated_cost, (int, float)) or self.max_estimated_cost <= 0):
+            raise ConfigurationError(f"Invalid max_estimated_cost for environment '{self.env}': {self.max_estimated_cost}")
+        if self.query_timeout is not None and (not isinstance(self.query_timeout, int) or self.query_timeout <= 0):
+            raise ConfigurationError(f"Invalid query_timeout for environment '{self.env}': {self.query_timeout}")
+        if not isinstance(self.partitions, int) or self.partitions <= 0:
+            raise ConfigurationError(f"Invalid partitions for environment '{self.env}': {self.partitions}")
 
 
     def _load_profiles(self):
         try:
             profiles_path = AppPaths.get_valid_profiles_path()
-
-            with open(profiles_path, 'r') as file:
-                profile = yaml.safe_load(file)
-            return profile
+            return ConfigSnapshot(profiles_path)
 
         except FileNotFoundError as e:
             raise ConfigurationError(profiles_path) from None
@@ -57,13 +135,8 @@ class Config:
         params_path = AppPaths.get_queries_lib_dir().joinpath(env, 'params.yml')
 
         try:
-            if params_path.exists():
-                with open(params_path, 'r') as file:
-                    parameters = yaml.safe_load(file) or {}
-                return parameters
-            else:
-                # No params file found, return empty dict
-                return {}
+            # Empty if no params file is found
+            return self.snapshot.get_params(env)
         except FileNotFoundError as e:
             raise ConfigurationError(params_path) from None
         except yaml.YAMLError as e:
@@ -3,9 +3,97 @@
 OUTPUT_DIR_NAME = 'output'
 QUERIES_LIBRARY_NAME = 'queries_library'
 LOG_DIR_NAME = "log"
+CACHE_DIR_NAME = 'cache'
+STATE_DIR_NAME = 'state'
 
 PROFILES_FILE_NAME = 'profiles.yml'
 LOG_FILE_NAME = 'flexquery.log'
 LOG_FILE_NAME_ARCHIVE = 'flexquery_archive.log'
 
+# log files: the daily log keeps LOG_BACKUP_DAYS days, the archive rolls over into
+# gzip-compressed files of LOG_ARCHIVE_MAX_BYTES and keeps LOG_ARCHIVE_BACKUP_COUNT of them
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+DEFAULT_LOG_LEVEL = 'INFO'
+LOG_BACKUP_DAYS = 30
+LOG_ARCHIVE_MAX_BYTES = 10 * 1024 ** 2
+LOG_ARCHIVE_BACKUP_COUNT = 10
 
+# connection pool
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_RECYCLE = 1800
+POOL_MAX_OVERFLOW = 10  # connections opened beyond pool_size under load, SQLAlchemy's default
+
+# streaming execution
+DEFAULT_CHUNK_SIZE = 100_000
+
+# rows per fetchmany call of the columnar MSSQL fetch
+DEFAULT_FETCH_SIZE = 10_000
+
+# statement timeouts: a query's "-- @timeout <seconds>" directive overrides query_timeout
+TIMEOUT_DIRECTIVE = 'timeout'
+
+# Ctrl-C: how often the main thread checks for it while a query runs on a worker thread,
+# and how long an interrupted query gets to release its connection and output files
+INTERRUPT_POLL_SECONDS = 0.2
+INTERRUPT_GRACE_SECONDS = 5
+
+# batch mode
+DEFAULT_CONCURRENCY = 4
+
+# diff: number of sample rows shown per kind of difference
+DEFAULT_DIFF_SAMPLE = 10
+
+# partitioned extraction: number of key ranges fetched concurrently, and chunks each
+# range may buffer ahead of the one being written when the output is in key order
+DEFAULT_PARTITIONS = 4
+PARTITION_BUFFER_CHUNKS = 4
+
+# multi-environment runs: maximum number of environments run at the same time
+MAX_CONCURRENT_ENVIRONMENTS = 4
+
+# parameter sweeps (reserved keys in params.yml)
+SWEEP_KEY = 'sweep'
+SWEEP_OUTPUT_KEY = 'sweep_output'
+SWEEP_OUTPUTS = ['partitioned', 'combined']
+
+# dtype optimization: maximum ratio of distinct values to rows for a categorical column
+DEFAULT_CATEGORY_THRESHOLD = 0.5
+
+# output writers
+DEFAULT_OUTPUT_WORKERS = 4
+
+# csv output compression
+CSV_COMPRESSIONS = ['gzip', 'zstd']
+CSV_COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+GZIP_COMPRESSION_LEVEL = 6
+ZSTD_COMPRESSION_LEVEL = 3
+COMPRESSION_QUEUE_SIZE = 8  # encoded chunks waiting for the compression thread
+
+# json output
+JSON_DATE_FORMATS = ['epoch', 'iso']
+DEFAULT_JSON_DATE_FORMAT = 'epoch'
+JSON_BATCH_ROWS = 10_000  # rows serialized per to_json call
+
+# excel output: rows per worksheet, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+
+# parquet output
+DEFAULT_PARQUET_COMPRESSION = 'snappy'
+DEFAULT_ROW_GROUP_SIZE = 100_000
+PARQUET_COMPRESSIONS = ['snappy', 'gzip', 'zstd', 'brotli', 'lz4', 'none']
+
+# result cache
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_CACHE_MAX_SIZE_MB = 1024
+
+# incremental extraction: a query with a "-- @watermark <column>" directive binds the
+# last high-water mark as :watermark; its dataset is compacted into a single file once
+# it holds compact_files part files
+WATERMARK_DIRECTIVE = 'watermark'
+WATERMARK_PARAMETER = 'watermark'
+DEFAULT_COMPACT_FILES = 30
+
+# large IN-list binding
+IN_LIST_STRATEGY_NAMES = ['auto', 'expand', 'json', 'unnest']
+IN_LIST_EXPAND_LIMIT = 500
+MSSQL_MAX_BIND_PARAMETERS = 2100
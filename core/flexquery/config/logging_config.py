@@ -1,8 +1,19 @@
+import atexit
 import click
+import gzip
 import logging
+import os
+import queue
+import shutil
 from functools import wraps
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from flexquery.config.pathconfig import  AppPaths
+from flexquery.config.constants import (
+    DEFAULT_LOG_LEVEL, LOG_ARCHIVE_BACKUP_COUNT, LOG_ARCHIVE_MAX_BYTES, LOG_BACKUP_DAYS
+)
+
+# Background thread writing the log files, replaced on every initialize_logging call
+_listener = None
 
 
 class ClickEchoHandler(logging.StreamHandler):
@@ -25,8 +36,38 @@ class ClickEchoHandler(logging.StreamHandler):
         except Exception:
             self.handleError(record)
 
-def initialize_logging():
-    """Initialize the logging system with console, file, and archive handlers."""
+def _gzip_namer(name):
+    return f"{name}.gz"
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as source_file, gzip.open(dest, 'wb') as dest_file:
+        shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+def _stop_listener():
+    """Flush queued records to the log files and stop the background writer."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(_stop_listener)
+
+def initialize_logging(log_level=None):
+    """
+    Initialize the logging system with console, file, and archive handlers.
+
+    Console output is written inline so it keeps its order with prompts and other
+    terminal output. Records for the log files are put on a queue and written by a
+    background thread, so query and writer threads never wait on file I/O.
+
+    Args:
+        log_level (str, optional): Lowest level written to the log files, INFO by default
+    """
+    global _listener
 
     root_logger = logging.getLogger()
     
@@ -34,19 +75,26 @@ def initialize_logging():
     if root_logger.handlers:
         for handler in root_logger.handlers[:]:
             root_logger.removeHandler(handler)
+    _stop_listener()
     
-    # Set the root logger level to DEBUG to capture all messages
-    root_logger.setLevel(logging.DEBUG)
+    # The root logger level is the lowest level any handler needs, so records below it
+    # are never created and isEnabledFor() gates can skip building expensive messages
+    file_level = logging.getLevelName(log_level or DEFAULT_LOG_LEVEL)
+    root_logger.setLevel(min(file_level, logging.INFO))
     
     # File handler - rotates daily
-    file_handler = TimedRotatingFileHandler(AppPaths.get_log_filepath(), when='midnight', interval=1)
+    file_handler = TimedRotatingFileHandler(AppPaths.get_log_filepath(), when='midnight', interval=1, backupCount=LOG_BACKUP_DAYS)
     file_formatter = logging.Formatter("%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
     file_handler.setFormatter(file_formatter)
-    file_handler.setLevel(logging.DEBUG) # Log all messages to file
+    file_handler.setLevel(file_level)
     
-    # Archive handler - this accumulates all logs
-    archive_handler = logging.FileHandler(AppPaths.get_log_archive_filepath(), mode='a')
-    archive_handler.setLevel(logging.DEBUG) # Log all messages to archive
+    # Archive handler - accumulates all logs, rolled over into gzip-compressed files
+    archive_handler = RotatingFileHandler(
+        AppPaths.get_log_archive_filepath(), mode='a', maxBytes=LOG_ARCHIVE_MAX_BYTES, backupCount=LOG_ARCHIVE_BACKUP_COUNT
+    )
+    archive_handler.namer = _gzip_namer
+    archive_handler.rotator = _gzip_rotator
+    archive_handler.setLevel(file_level)
     archive_formatter = logging.Formatter("%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
     archive_handler.setFormatter(archive_formatter)
 
@@ -55,11 +103,17 @@ def initialize_logging():
     console_formatter = logging.Formatter("%(message)s")  
     console_handler.setFormatter(console_formatter)
     console_handler.setLevel(logging.INFO)  
+
+    # Queue handler - hands records for the log files to the background listener
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setLevel(file_level)
+    _listener = QueueListener(log_queue, file_handler, archive_handler, respect_handler_level=True)
+    _listener.start()
     
     # Add handlers to the root logger
     root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(archive_handler)
+    root_logger.addHandler(queue_handler)
     
     # Avoid propagation to default handlers
     logging.basicConfig(handlers=[])
@@ -72,15 +126,19 @@ def get_logger(name=None):
         return logging.getLogger(name)
     return logging.getLogger()
 
-def _log_message(message):
+def _log_message(message, *args):
     """Helper function for logging messages."""
     logger = get_logger()
-    logger.debug(message)
+    logger.debug(message, *args)
 
 def log_execution(func):
     """Decorator to log the execution of a function."""
     @wraps(func)
     def wrapper(*args, **kwargs):
+        # Called on hot paths: skip building the messages when debug logging is off
+        if not get_logger().isEnabledFor(logging.DEBUG):
+            return func(*args, **kwargs)
+
         try:
             className = args[0].__class__.__name__ if args else ''
         except (IndexError, AttributeError):
@@ -88,14 +146,14 @@ def log_execution(func):
             
         functionName = func.__name__
 
-        _log_message(f"Launching {className}.{functionName}")
+        _log_message("Launching %s.%s", className, functionName)
 
         try:
             result = func(*args, **kwargs)
-            _log_message(f"Completed {className}.{functionName}")
+            _log_message("Completed %s.%s", className, functionName)
             return result
         except Exception as e:
-            _log_message(f"Error in {className}.{functionName}: {e.__class__.__name__}")
+            _log_message("Error in %s.%s: %s", className, functionName, e.__class__.__name__)
             raise e
     return wrapper
 
@@ -1,10 +1,11 @@
 import os
 import importlib.util
+from functools import lru_cache
 from pathlib import Path
 from flexquery.config.exceptions import ConfigurationError
-import yaml
 from flexquery.config.constants import (
-    OUTPUT_DIR_NAME, PROFILES_FILE_NAME, QUERIES_LIBRARY_NAME, LOG_DIR_NAME, LOG_FILE_NAME, LOG_FILE_NAME_ARCHIVE
+    CACHE_DIR_NAME, OUTPUT_DIR_NAME, PROFILES_FILE_NAME, QUERIES_LIBRARY_NAME, LOG_DIR_NAME, LOG_FILE_NAME, LOG_FILE_NAME_ARCHIVE,
+    STATE_DIR_NAME
 )
 
 class AppPaths:
@@ -12,8 +13,14 @@ class AppPaths:
     
     PACKAGE_NAME = 'flexquery'
 
+    # Resolved on first use by initialize_class_vars(), which probes the filesystem
+    secrets_dir = None
+    outside_profiles_filepath = None
+    _class_vars_initialized = False
+
 
     @classmethod
+    @lru_cache(maxsize=None)
     def is_installed_package(cls):
         spec = importlib.util.find_spec(cls.PACKAGE_NAME)
         if not spec:
@@ -22,6 +29,7 @@ class AppPaths:
         return 'site-packages' in str(package_path) or 'dist-packages' in str(package_path)
 
     @classmethod
+    @lru_cache(maxsize=None)
     def get_package_path(cls):
         """Get the package path."""
         package = importlib.import_module(cls.PACKAGE_NAME)
@@ -29,6 +37,7 @@ class AppPaths:
         return package_path
 
     @classmethod
+    @lru_cache(maxsize=None)
     def get_project_root(cls):
         """Get the root directory of the project."""
         package_path = cls.get_package_path()
@@ -52,6 +61,16 @@ class AppPaths:
         """Get the queries library directory."""
         return cls.get_project_root() / QUERIES_LIBRARY_NAME
     
+    @classmethod
+    def get_cache_dir(cls):
+        """Get the result cache directory."""
+        return cls.get_project_root() / CACHE_DIR_NAME
+    
+    @classmethod
+    def get_state_dir(cls):
+        """Get the directory of incremental extraction state."""
+        return cls.get_project_root() / STATE_DIR_NAME
+    
     @classmethod
     def get_log_dir(cls, create: bool = False):
         """Get the log directory."""
@@ -94,8 +113,11 @@ class AppPaths:
         Try multiple profile locations in order of preference.
         Returns the first valid profile path or raises ConfigurationError if none are valid.
         """
+        import yaml
+        from flexquery.config.snapshot import load_yaml
+
         profile_locations = [
-            (cls.outside_profiles_filepath, "secrets directory"),
+            (cls.get_outside_profiles_filepath(), "secrets directory"),
             (cls.get_profiles_filepath(), "project root"),
         ]
         
@@ -107,8 +129,7 @@ class AppPaths:
                 continue
                 
             try:
-                with open(path, 'r') as file:
-                    yaml.safe_load(file)
+                load_yaml(path)
                 return path
             except yaml.YAMLError as e:
                 errors.append(f"Invalid YAML in {location_name} ({path}): {str(e)}")
@@ -161,7 +182,21 @@ class AppPaths:
         """Initialize class variables that depend on methods."""
         cls.secrets_dir = cls._get_secrets_directory()
         cls.outside_profiles_filepath = Path(cls.secrets_dir) / PROFILES_FILE_NAME if cls.secrets_dir else None
+        cls._class_vars_initialized = True
+
+    @classmethod
+    def clear_cache(cls):
+        """Forget resolved paths, so they are probed again on next use."""
+        cls.is_installed_package.cache_clear()
+        cls.get_package_path.cache_clear()
+        cls.get_project_root.cache_clear()
+        cls._class_vars_initialized = False
 
+    @classmethod
+    def get_outside_profiles_filepath(cls):
+        """Get the profiles file path in the secrets directory, or None if there is no secrets directory."""
+        if not cls._class_vars_initialized:
+            cls.initialize_class_vars()
+        return cls.outside_profiles_filepath
 
-AppPaths.initialize_class_vars()
 
@@ -0,0 +1,69 @@
+import copy
+import os
+from functools import lru_cache
+
+import yaml
+
+from flexquery.config.pathconfig import AppPaths
+
+# libyaml's C loader parses several times faster than the pure Python one
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+@lru_cache(maxsize=64)
+def _load_yaml(path: str, mtime_ns: int, size: int):
+    with open(path, 'r') as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+def load_yaml(path):
+    """
+    Parse a YAML file once per process and reuse the result until the file changes.
+
+    Parsed files are cached per path, modification time and size. Each call returns a
+    copy, so callers may modify the result.
+
+    Args:
+        path (str | Path): Path to the YAML file
+    Returns:
+        The parsed content, None for an empty file
+    Raises:
+        FileNotFoundError: If the file does not exist
+        yaml.YAMLError: If the file is not valid YAML
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return copy.deepcopy(_load_yaml(path, stat.st_mtime_ns, stat.st_size))
+
+
+class ConfigSnapshot:
+    """
+    Resolved configuration: the profiles.yml in use and the params.yml of each environment.
+
+    Files are parsed through load_yaml, so any number of snapshots, Config objects and
+    batch queries in one process share a single parse of each file, and an edited file
+    is picked up by the next snapshot without restarting.
+    """
+
+    def __init__(self, profiles_path=None):
+        self.profiles_path = profiles_path or AppPaths.get_valid_profiles_path()
+        self.profiles = load_yaml(self.profiles_path)
+
+    def get_environments(self) -> list:
+        """Names of the environments defined in profiles.yml, in file order."""
+        return list(self.profiles['flexquery']['outputs'])
+
+    def get_profile(self, env: str):
+        """Output settings of an environment in profiles.yml, or None if it is not defined."""
+        return self.profiles['flexquery']['outputs'].get(env)
+
+    def get_params(self, env: str) -> dict:
+        """Parameters from the environment's params.yml, empty if the file does not exist."""
+        if not env:
+            return {}
+        params_path = AppPaths.get_queries_lib_dir().joinpath(env, 'params.yml')
+        if not params_path.exists():
+            return {}
+        return load_yaml(params_path) or {}
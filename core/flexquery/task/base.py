@@ -1,6 +1,8 @@
 from typing import Any, Dict, Optional
 from flexquery.config.logging_config import get_logger, initialize_logging, log_separator
 from flexquery.config.exceptions import TaskExecutionError
+from flexquery.utils.cancel import cancel_on_interrupt
+from flexquery.utils.profiler import RunProfile
 
 logger = get_logger(__name__)
 
@@ -12,13 +14,16 @@ class Task:
     """
     
     def __init__(self, *args, **kwargs):
-        initialize_logging()
-        log_separator()
+        # A nested task runs inside another task, which has already set up logging
+        if not kwargs.get('nested', False):
+            initialize_logging(kwargs.get('log_level'))
+            log_separator()
         
         self._args = args
         self._kwargs = kwargs
         self._status = "initialized"
         self._result = None
+        self.profile = RunProfile()
         
     @property
     def status(self) -> str:
@@ -66,6 +71,10 @@ class Task:
     def cleanup(self) -> None:
         """Cleanup resources after task execution."""
         pass
+
+    def report_profile(self) -> None:
+        """Report the run profile once the task has finished, successfully or not."""
+        pass
         
     def execute(self) -> Any:
         """
@@ -83,7 +92,9 @@ class Task:
             logger.debug(f"Validating task {self.__class__.__name__}")
             
             # Validate
-            if not self.validate():
+            with self.profile.phase('validate'):
+                is_valid = self.validate()
+            if not is_valid:
                 self._status = "invalid"
                 logger.error(f"Task {self.__class__.__name__} validation failed")
                 raise TaskExecutionError("Task validation failed")
@@ -91,7 +102,9 @@ class Task:
             # Setup
             self._status = "setting_up"
             logger.debug(f"Setting up task {self.__class__.__name__}")
-            if not self.setup():
+            with self.profile.phase('setup'):
+                is_set_up = self.setup()
+            if not is_set_up:
                 self._status = "setup_failed"
                 logger.error(f"Task {self.__class__.__name__} setup failed")
                 raise TaskExecutionError("Task setup failed")
@@ -99,11 +112,17 @@ class Task:
             # Execute
             self._status = "executing"
             logger.debug(f"Executing task {self.__class__.__name__}")
-            self._result = self._execute()
+            with self.profile.phase('run'), cancel_on_interrupt():
+                self._result = self._execute()
             self._status = "completed"
             logger.debug(f"Task {self.__class__.__name__} completed successfully")
             
             return self._result
+
+        except KeyboardInterrupt:
+            self._status = "interrupted"
+            logger.error(f"Task {self.__class__.__name__} interrupted")
+            raise
             
         except Exception as e:
             self._status = "failed"
@@ -113,4 +132,9 @@ class Task:
         finally:
             # Always perform cleanup
             logger.debug(f"Cleaning up task {self.__class__.__name__}")
-            self.cleanup()
\ No newline at end of file
+            with self.profile.phase('cleanup'):
+                self.cleanup()
+            try:
+                self.report_profile()
+            except Exception as e:
+                logger.debug(f"Could not report the run profile: {e}")
\ No newline at end of file
@@ -0,0 +1,161 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from flexquery.task.base import Task
+from flexquery.config.config import Config
+from flexquery.config.exceptions import ConfigurationError
+from flexquery.config.logging_config import get_logger
+from flexquery.config.pathconfig import AppPaths
+from flexquery.utils.connection import create_connection_manager
+from flexquery.utils.diff import DiffResult, ResultHashes, changed_columns, compare_hashes, hash_rows, sample_rows
+from flexquery.utils.processor import FlexQuery
+
+logger = get_logger(__name__)
+
+
+class DiffEnvironment:
+    """One side of a diff: the query file, parameters and connection pool of an environment."""
+
+    def __init__(self, env, query_file, profile, win_auth=False, username=None, password=None):
+        self.env = env
+        self.profile = profile
+        self.config = Config(env, win_auth=win_auth, username=username, password=password)
+        if self.config.sweep:
+            raise ConfigurationError(f"Parameter sweeps are not supported by diff (params.yml of {env})")
+        self.query_path = AppPaths.get_queries_lib_dir().joinpath(env, f"{query_file}.sql")
+        if not self.query_path.exists():
+            raise FileNotFoundError(f"Query file not found: {self.query_path}")
+        self.connection_manager = create_connection_manager(self.config)
+
+    @contextmanager
+    def stream(self, chunk_size=None):
+        """Run the query on a pooled connection and yield its result as an iterator of chunks."""
+        with self.connection_manager.checkout() as connection:
+            query_executor = FlexQuery(connection, self.config, profile=self.profile)
+            yield query_executor.stream_sql_query_with_params(
+                self.query_path, self.config.params, chunk_size or self.config.chunk_size
+            )
+
+
+class DiffTask(Task):
+    """
+    Task for comparing the result of a query in two environments.
+
+    Both results are streamed at the same time and reduced to row hashes, so memory
+    stays bounded however large they are. Sample rows of each kind of difference are
+    fetched with a second, early-stopping pass, only when there are differences.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.query_file = kwargs.get('query')
+        self.key_columns = list(kwargs.get('keys') or ())
+        self.sample_size = kwargs.get('sample', 0)
+        self.chunk_size = kwargs.get('chunk_size')
+        credentials = dict(
+            win_auth=kwargs.get('win_auth', False), username=kwargs.get('username'), password=kwargs.get('password')
+        )
+        with self.profile.phase('config_load'):
+            self.left = DiffEnvironment(kwargs.get('left'), self.query_file, self.profile, **credentials)
+            self.right = DiffEnvironment(kwargs.get('right'), self.query_file, self.profile, **credentials)
+
+    def validate(self):
+        """Validate diff requirements."""
+        if self.left.env == self.right.env:
+            raise ConfigurationError("diff needs two different environments")
+        return True
+
+    def setup(self):
+        """Create the engines of both environments."""
+        logger.info(f"Comparing {self.query_file} in {self.left.env} and {self.right.env}")
+        with self.profile.phase('engine_create'):
+            self.left.connection_manager.create_engine()
+            self.right.connection_manager.create_engine()
+        return True
+
+    def _execute(self):
+        """Hash both results, compare them and report the differences."""
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="flexquery-diff") as executor:
+            left_hashes, right_hashes = executor.map(self._hash_result, (self.left, self.right))
+            with self.profile.phase('compare'):
+                plan = compare_hashes(left_hashes, right_hashes, self.left.env, self.right.env)
+            result = plan.result
+            if not result.identical and self.sample_size:
+                self._fetch_samples(executor, plan)
+
+        self._log_diff(result)
+        return result
+
+    def cleanup(self):
+        self.left.connection_manager.close()
+        self.right.connection_manager.close()
+
+    def _hash_result(self, environment):
+        """Stream the query result of one environment and hash its rows."""
+        hashes = ResultHashes(self.key_columns)
+        with environment.stream(self.chunk_size) as chunks:
+            for chunk in chunks:
+                with self.profile.phase('hash'):
+                    hashes.add(chunk)
+        logger.info(f"{environment.env}: {hashes.rows} rows")
+        return hashes
+
+    def _fetch_samples(self, executor, plan):
+        """Fetch sample rows of the added, removed and changed rows from the sides that have them."""
+        limit = self.sample_size
+        result = plan.result
+        left_wanted = [hashes[:limit] for hashes in (plan.removed, plan.changed) if len(hashes)]
+        right_wanted = [hashes[:limit] for hashes in (plan.added, plan.changed) if len(hashes)]
+
+        def sample(environment, wanted):
+            if not wanted:
+                return None
+            with environment.stream(self.chunk_size) as chunks:
+                return sample_rows(chunks, self.key_columns, np.concatenate(wanted), limit * len(wanted))
+
+        logger.info("Fetching sample rows of the differences")
+        left_rows, right_rows = executor.map(sample, (self.left, self.right), (left_wanted, right_wanted))
+        result.removed_sample = self._select(left_rows, plan.removed[:limit])
+        result.added_sample = self._select(right_rows, plan.added[:limit])
+        if len(plan.changed):
+            left_changed = self._select(left_rows, plan.changed[:limit])
+            right_changed = self._select(right_rows, plan.changed[:limit])
+            if left_changed is not None and right_changed is not None:
+                result.changed_sample = changed_columns(
+                    left_changed, right_changed, self.key_columns, self.left.env, self.right.env
+                )
+
+    def _select(self, rows, wanted):
+        """The sample rows whose key hash (or row hash, without key columns) is in `wanted`."""
+        if rows is None or not len(wanted):
+            return None
+        columns = self.key_columns or sorted(rows.columns)
+        selected = rows[np.isin(hash_rows(rows, columns), wanted)]
+        return selected.drop_duplicates().reset_index(drop=True) if len(selected) else None
+
+    def _log_diff(self, result: DiffResult):
+        left, right = result.left_env, result.right_env
+        width = max(len('unchanged'), len(left) + len(' only'), len(right) + len(' only'))
+        lines = [
+            f"{left + ' rows':<{width}}  {result.left_rows:>12}",
+            f"{right + ' rows':<{width}}  {result.right_rows:>12}",
+            f"{'unchanged':<{width}}  {result.unchanged:>12}",
+        ]
+        if self.key_columns:
+            lines.append(f"{'changed':<{width}}  {result.changed:>12}")
+        lines.append(f"{right + ' only':<{width}}  {result.added:>12}")
+        lines.append(f"{left + ' only':<{width}}  {result.removed:>12}")
+        logger.info(f"\nDiff of {self.query_file}:\n" + "\n".join(lines))
+
+        if result.identical:
+            logger.info("The results are identical")
+            return
+        for title, sample in (
+            (f"Changed rows ({left} vs {right})", result.changed_sample),
+            (f"Rows only in {right}", result.added_sample),
+            (f"Rows only in {left}", result.removed_sample),
+        ):
+            if sample is not None and len(sample):
+                logger.info(f"\n{title}, first {len(sample)}:\n{sample.to_string(index=False, max_colwidth=40)}")
@@ -1,85 +1,602 @@
+import gzip
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from io import StringIO
+from typing import Iterable, Iterator, List, Optional, Union
 import pandas as pd
 
-from flexquery.utils.calculations import CommsCalculations
-
+from flexquery.config.constants import (
+    COMPRESSION_QUEUE_SIZE, CSV_COMPRESSION_SUFFIXES, DEFAULT_JSON_DATE_FORMAT, DEFAULT_OUTPUT_WORKERS,
+    DEFAULT_PARQUET_COMPRESSION, DEFAULT_ROW_GROUP_SIZE, EXCEL_MAX_ROWS, GZIP_COMPRESSION_LEVEL, JSON_BATCH_ROWS,
+    ZSTD_COMPRESSION_LEVEL
+)
+from flexquery.config.exceptions import DataProcessorError
+from flexquery.utils.dtypes import stable_dtypes
 from flexquery.config.logging_config import log_execution, get_logger
 logger = get_logger(__name__)
 
+ResultData = Union[pd.DataFrame, Iterable[pd.DataFrame], None]
+
+# Day zero of Excel serial dates
+EXCEL_EPOCH = pd.Timestamp('1899-12-31')
+
+
 def capture_dataframe_info(df: pd.DataFrame) -> str:
-    """ Capture and return the info() output for a DataFrame """
+    """ Capture and return the info() output for a DataFrame, with deep memory usage """
     buffer = StringIO()
-    df.info(buf=buffer)
+    df.info(buf=buffer, memory_usage='deep')
     info_str = buffer.getvalue()
     return info_str
 
-@log_execution    
-def write_to_csv( df: pd.DataFrame, file_name: str, output_dir: str) -> str:
+def iter_chunks(data: ResultData) -> Iterator[pd.DataFrame]:
+    """
+    Yield the DataFrames of a query result, whether it is a single DataFrame or a stream
+    of chunks. The chunks of a stream keep the same dtypes throughout.
+    """
+    if data is None:
+        return
+    if isinstance(data, pd.DataFrame):
+        yield data
+        return
+    yield from stable_dtypes(data)
+
+
+class ResultWriter:
+    """
+    Base class for output writers that append query results chunk by chunk.
+
+    The output file is only created once the first non-empty chunk arrives, so an
+    empty result never leaves an empty file behind, and it is deleted again when the
+    write fails, so a failed run never leaves a truncated file behind either.
+    Subclasses implement _open, _write_chunk and _close.
+    """
+
+    extension = None
+
+    def __init__(self, file_name: str, output_dir: str):
+        self.file_name = file_name
+        self.output_file = os.path.join(str(output_dir), f"{file_name}.{self.extension}")
+        self.rows_written = 0
+        self.elapsed = 0.0
+        self._is_open = False
+        self._created = False
+
+    @property
+    def name(self) -> str:
+        return self.extension.upper()
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Append a chunk of rows to the output file."""
+        if df is None or df.empty:
+            return
+        started = time.perf_counter()
+        if not self._is_open:
+            self._created = True
+            self._open(df)
+            self._is_open = True
+        self._write_chunk(df)
+        self.rows_written += len(df)
+        self.elapsed += time.perf_counter() - started
+
+    def close(self) -> Optional[str]:
+        """
+        Finalize the output file.
+
+        Returns:
+            str: Full path to the saved file, or None if no data was saved
+        """
+        if not self._is_open:
+            logger.warning(f"No data to save for {self.file_name}")
+            return None
+        started = time.perf_counter()
+        self._close()
+        self._is_open = False
+        self.elapsed += time.perf_counter() - started
+        logger.info(f"\nData written to: {self.output_file}")
+        return self.output_file
+
+    def abort(self) -> None:
+        """Release and delete the output file after a failure, so no truncated output is left behind."""
+        if not self._created:
+            return
+        if self._is_open:
+            self._is_open = False
+            try:
+                self._close()
+            except Exception as e:
+                logger.debug(f"Error closing {self.output_file}: {e}")
+        try:
+            os.remove(self.output_file)
+            logger.warning(f"Incomplete output removed: {self.output_file}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove incomplete output {self.output_file}: {e}")
+
+    def _open(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def _write_chunk(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def _close(self) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
+
+
+class CompressedFile:
+    """
+    Binary output file that is compressed on a background thread.
+
+    write() only queues the data, so compressing and writing to disk overlap with
+    fetching and encoding the next chunk. zlib and zstandard release the GIL
+    while they compress. The queue is bounded to keep memory use flat when the
+    disk is slower than the query.
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, path: str, compression: str, queue_size: int = COMPRESSION_QUEUE_SIZE):
+        self.path = path
+        self._raw = open(path, 'wb')
+        try:
+            self._stream = self._open_stream(self._raw, compression)
+        except BaseException:
+            self._raw.close()
+            raise
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="flexquery-compressor", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _open_stream(raw, compression: str):
+        if compression == 'gzip':
+            return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_COMPRESSION_LEVEL)
+        if compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise DataProcessorError("zstd compression requires zstandard: pip install flex_query[zstd]") from None
+            return zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).stream_writer(raw, closefd=False)
+        raise DataProcessorError(f"Unsupported compression: {compression}")
+
+    def _run(self):
+        try:
+            while True:
+                data = self._queue.get()
+                if data is self._SENTINEL:
+                    break
+                self._stream.write(data)
+        except BaseException as e:
+            self._error = e
+            # Keep draining so a blocked write() can notice the failure
+            while self._queue.get() is not self._SENTINEL:
+                pass
+
+    def write(self, data: bytes) -> None:
+        if self._error is not None:
+            raise DataProcessorError(f"Compression of {self.path} failed: {self._error}")
+        self._queue.put(data)
+
+    def close(self) -> None:
+        """Flush the queue, finish the compressed stream and close the file."""
+        self._queue.put(self._SENTINEL)
+        self._thread.join()
+        try:
+            if self._error is None:
+                self._stream.close()
+        finally:
+            self._raw.close()
+        if self._error is not None:
+            raise DataProcessorError(f"Compression of {self.path} failed: {self._error}")
+
+
+class CsvResultWriter(ResultWriter):
     """
-    Save query results DataFrame to a CSV file.
-    
+    Writes query results to a CSV file, header first, then rows as they arrive.
+
+    With compression set to gzip or zstd, the file gets a .gz or .zst suffix and is
+    compressed on a background thread while the next chunk is fetched.
+    """
+
+    extension = "csv"
+
+    def __init__(self, file_name: str, output_dir: str, compression: Optional[str] = None):
+        super().__init__(file_name, output_dir)
+        self.compression = compression
+        if compression:
+            self.output_file += CSV_COMPRESSION_SUFFIXES[compression]
+
+    def _open(self, df):
+        if self.compression:
+            self._file = CompressedFile(self.output_file, self.compression)
+        else:
+            self._file = open(self.output_file, 'w', newline='', encoding='utf-8')
+
+    def _write_chunk(self, df):
+        if self.compression:
+            self._file.write(df.to_csv(index=False, header=self.rows_written == 0).encode('utf-8'))
+        else:
+            df.to_csv(self._file, index=False, header=self.rows_written == 0)
+
+    def _close(self):
+        self._file.close()
+
+
+class JsonResultWriter(ResultWriter):
+    """
+    Writes query results as JSON lines, one record per line.
+
+    Rows are serialized in batches of batch_rows with pandas' C JSON encoder, so a
+    large DataFrame is never turned into one string in memory. Every batch goes
+    through the same column encoders first: datetimes and dates become epoch
+    milliseconds (or ISO 8601 strings with date_format='iso'), decimals become
+    numbers and missing values become null.
+    """
+
+    extension = "json"
+
+    def __init__(self, file_name: str, output_dir: str, date_format: str = DEFAULT_JSON_DATE_FORMAT,
+                 batch_rows: int = JSON_BATCH_ROWS):
+        super().__init__(file_name, output_dir)
+        self.date_format = date_format
+        self.batch_rows = batch_rows
+
+    def _open(self, df):
+        self._file = open(self.output_file, 'wb')
+        self._encoders = {}
+        self._undetermined = set(range(len(df.columns)))
+
+    def _update_encoders(self, df):
+        """
+        Choose the encoder of each column whose type is not known yet, for the columns
+        pandas would not encode consistently on its own. A column of None values gives
+        no type, so it is looked at again in the next chunk.
+        """
+        for position in sorted(self._undetermined):
+            column = df.iloc[:, position]
+            if pd.api.types.is_datetime64_any_dtype(column.dtype):
+                self._encoders[position] = self._encode_datetime
+            elif pd.api.types.is_object_dtype(column.dtype):
+                inferred = pd.api.types.infer_dtype(column, skipna=True)
+                if inferred == 'empty':
+                    continue
+                if inferred in ('date', 'datetime', 'datetime64'):
+                    self._encoders[position] = self._encode_date_objects
+                elif inferred == 'decimal':
+                    self._encoders[position] = self._encode_decimal
+            self._undetermined.discard(position)
+
+    def _encode_datetime(self, column: pd.Series) -> pd.Series:
+        if column.dt.tz is not None:
+            column = column.dt.tz_convert('UTC').dt.tz_localize(None)
+        if self.date_format == 'iso':
+            return column
+        milliseconds = pd.Series(
+            column.to_numpy(dtype='datetime64[ms]').astype('int64'), index=column.index, dtype='Int64'
+        )
+        return milliseconds.mask(column.isna())
+
+    def _encode_date_objects(self, column: pd.Series) -> pd.Series:
+        # utc=True: datetimes with different UTC offsets fit no single timezone
+        return self._encode_datetime(pd.to_datetime(column, utc=True))
+
+    @staticmethod
+    def _encode_decimal(column: pd.Series) -> pd.Series:
+        return column.astype('float64')
+
+    def _write_chunk(self, df):
+        if self._undetermined:
+            self._update_encoders(df)
+        for start in range(0, len(df), self.batch_rows):
+            batch = df.iloc[start:start + self.batch_rows]
+            if self._encoders:
+                batch = batch.copy(deep=False)
+                for position, encode in self._encoders.items():
+                    batch.isetitem(position, encode(batch.iloc[:, position]))
+            lines = batch.to_json(orient='records', lines=True, date_format='iso', date_unit='ms')
+            if not lines.endswith('\n'):
+                lines += '\n'
+            self._file.write(lines.encode('utf-8'))
+
+    def _close(self):
+        self._file.close()
+
+
+class ExcelResultWriter(ResultWriter):
+    """
+    Writes query results to the All_Records sheet of an Excel workbook.
+
+    Rows are written with xlsxwriter in constant memory mode, so each row is flushed
+    to disk as soon as the next one starts and memory use does not grow with the
+    result. When a sheet reaches Excel's row limit, writing continues on
+    All_Records_2, All_Records_3 and so on, each with its own header row.
+    """
+
+    extension = "xlsx"
+    sheet_name = 'All_Records'
+    datetime_format = 'YYYY-MM-DD HH:MM:SS'
+    date_format = 'YYYY-MM-DD'
+
+    def __init__(self, file_name: str, output_dir: str, max_rows: int = EXCEL_MAX_ROWS):
+        super().__init__(file_name, output_dir)
+        self.max_rows = max_rows  # rows per sheet, including the header row
+
+    def _open(self, df):
+        import xlsxwriter
+        self._workbook = xlsxwriter.Workbook(self.output_file, {'constant_memory': True})
+        self._header_format = self._workbook.add_format(
+            {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+        )
+        self._datetime_cell = self._workbook.add_format({'num_format': self.datetime_format})
+        self._date_cell = self._workbook.add_format({'num_format': self.date_format})
+        self._headers = [str(column) for column in df.columns]
+        self._formats = [None] * len(df.columns)
+        self._undetermined = set(range(len(df.columns)))
+        self._sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheets += 1
+        name = self.sheet_name if self._sheets == 1 else f"{self.sheet_name}_{self._sheets}"
+        self._worksheet = self._workbook.add_worksheet(name)
+        self._worksheet.write_row(0, 0, self._headers, self._header_format)
+        # Add filtering capability
+        self._worksheet.autofilter(0, 0, 0, len(self._headers) - 1)
+        # Freeze top row
+        self._worksheet.freeze_panes(1, 0)
+        self._row = 1
+        if self._sheets > 1:
+            logger.info(f"Excel row limit reached, continuing on sheet {name}")
+
+    def _update_formats(self, df):
+        """
+        Choose the number format of each column whose type is not known yet: dates and
+        datetimes are formatted as pandas' to_excel writes them. A column of None values
+        gives no type, so it is looked at again in the next chunk.
+        """
+        for position in sorted(self._undetermined):
+            column = df.iloc[:, position]
+            if pd.api.types.is_datetime64_any_dtype(column.dtype):
+                self._formats[position] = self._datetime_cell
+            elif pd.api.types.is_object_dtype(column.dtype):
+                inferred = pd.api.types.infer_dtype(column, skipna=True)
+                if inferred == 'empty':
+                    continue
+                if inferred in ('datetime', 'datetime64'):
+                    self._formats[position] = self._datetime_cell
+                elif inferred == 'date':
+                    self._formats[position] = self._date_cell
+            self._undetermined.discard(position)
+
+    @staticmethod
+    def _cell_values(column: pd.Series, is_date: bool) -> list:
+        """Plain Python values of a column, with None for missing values, which xlsxwriter writes as blank cells."""
+        if is_date:
+            # Excel serial dates, computed for the whole column instead of cell by cell
+            # Excel has no timezones: timezone-aware values are written in UTC
+            days = (pd.to_datetime(column, utc=True).dt.tz_localize(None) - EXCEL_EPOCH) / pd.Timedelta(days=1)
+            # Excel treats 1900 as a leap year, so serials from March 1900 on are shifted by one day
+            column = days.where(days <= 59, days + 1)
+        return column.astype(object).where(column.notna(), None).tolist()
+
+    def _write_chunk(self, df):
+        if self._undetermined:
+            self._update_formats(df)
+        formats = self._formats
+        columns = [
+            self._cell_values(column, cell_format is not None)
+            for (_, column), cell_format in zip(df.items(), formats)
+        ]
+        worksheet, row_number = self._worksheet, self._row
+        for row in zip(*columns):
+            if row_number == self.max_rows:
+                self._new_sheet()
+                worksheet, row_number = self._worksheet, self._row
+            for position, value in enumerate(row):
+                if value is not None:
+                    worksheet.write(row_number, position, value, formats[position])
+            row_number += 1
+        self._row = row_number
+
+    def _close(self):
+        self._workbook.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    """
+    Writes query results to a Parquet file one row group at a time.
+
+    Incoming chunks are buffered as Arrow tables and flushed as soon as a full row
+    group is available, so a streamed result is written while it is still being fetched.
+    """
+
+    extension = "parquet"
+
+    def __init__(self, file_name: str, output_dir: str, compression: str = DEFAULT_PARQUET_COMPRESSION,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        super().__init__(file_name, output_dir)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise DataProcessorError("Parquet output requires pyarrow: pip install flex_query[arrow]") from None
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def _open(self, df):
+        schema = self._pa.Schema.from_pandas(df, preserve_index=False)
+        # Columns that are entirely null in the first chunk have no type yet, assume text
+        self._schema = self._pa.schema(
+            [field.with_type(self._pa.string()) if self._pa.types.is_null(field.type) else field for field in schema]
+        )
+        self._writer = self._pq.ParquetWriter(self.output_file, self._schema, compression=self.compression)
+
+    def _write_chunk(self, df):
+        table = self._pa.Table.from_pandas(df, preserve_index=False)
+        if not table.schema.equals(self._schema):
+            try:
+                table = table.cast(self._schema)
+            except (self._pa.ArrowInvalid, self._pa.ArrowNotImplementedError, ValueError) as e:
+                raise DataProcessorError(f"Chunk schema does not match the Parquet file schema: {e}") from None
+        self._buffer.append(table)
+        self._buffered_rows += table.num_rows
+        while self._buffered_rows >= self.row_group_size:
+            self._flush(self.row_group_size)
+
+    def _flush(self, rows):
+        table = self._pa.concat_tables(self._buffer)
+        self._writer.write_table(table.slice(0, rows), row_group_size=rows)
+        remainder = table.slice(rows)
+        self._buffer = [remainder] if remainder.num_rows else []
+        self._buffered_rows = remainder.num_rows
+
+    def _close(self):
+        try:
+            if self._buffered_rows:
+                self._flush(self._buffered_rows)
+        finally:
+            self._writer.close()
+
+
+def write_results(writers: List[ResultWriter], data: ResultData, max_workers: int = DEFAULT_OUTPUT_WORKERS) -> int:
+    """
+    Feed query results to every writer chunk by chunk and finalize the output files.
+
+    Only one chunk is held in memory at a time, so a streamed result never has to
+    be materialized in full. When several writers are requested they run
+    concurrently on a bounded thread pool, all reading the same chunk, and the next
+    chunk is fetched while the current one is being written.
+
+    Args:
+        writers (List[ResultWriter]): Writers to append each chunk to
+        data (ResultData): A DataFrame or an iterable of DataFrame chunks
+        max_workers (int): Maximum number of writers running at the same time
+    Returns:
+        int: Total number of rows in the result
+    Raises:
+        DataProcessorError: If any writer fails; all output files are released
+    """
+    workers = min(max_workers, len(writers))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flexquery-writer") if workers > 1 else None
+    total_rows = 0
+    pending = []
+    try:
+        for chunk in iter_chunks(data):
+            _wait_for_writers(pending)
+            pending = _dispatch(executor, writers, 'write', chunk)
+            total_rows += len(chunk)
+            logger.debug("Processed chunk of %d rows (%d total)", len(chunk), total_rows)
+        _wait_for_writers(pending)
+        _wait_for_writers(_dispatch(executor, writers, 'close'))
+    except BaseException:
+        # Let in-flight writes finish before the files are released
+        wait([future for _, future in pending])
+        for writer in writers:
+            writer.abort()
+        raise
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+
+    for writer in writers:
+        if writer.rows_written:
+            logger.info(f"{writer.name} writer: {writer.rows_written} rows in {writer.elapsed:.2f}s")
+    return total_rows
+
+def _dispatch(executor: Optional[ThreadPoolExecutor], writers: List[ResultWriter], method: str, *args) -> list:
+    """Call the given method on every writer, on the executor when there is one."""
+    jobs = []
+    for writer in writers:
+        if executor:
+            future = executor.submit(getattr(writer, method), *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(getattr(writer, method)(*args))
+            except Exception as e:
+                future.set_exception(e)
+        jobs.append((writer, future))
+    return jobs
+
+def _wait_for_writers(jobs: list) -> None:
+    """Wait for dispatched writer calls and raise a single error naming every writer that failed."""
+    errors = []
+    for writer, future in jobs:
+        try:
+            future.result()
+        except Exception as e:
+            errors.append(f"{writer.name} writer failed: {e}")
+    if errors:
+        raise DataProcessorError("; ".join(errors))
+
+def _write_single(writer: ResultWriter, data: ResultData) -> Optional[str]:
+    write_results([writer], data)
+    return writer.output_file if writer.rows_written else None
+
+@log_execution
+def write_to_csv(df: ResultData, file_name: str, output_dir: str, compression: Optional[str] = None) -> str:
+    """
+    Save query results to a CSV file.
+
     Args:
-        df (pd.DataFrame): DataFrame to save
+        df (ResultData): DataFrame, or iterable of DataFrame chunks, to save
         file_name (str): Base name for the output file (without extension)
         output_dir (str): Directory to save the file in
-        query_file (str): Path to the original query file (for metadata)
+        compression (str, optional): gzip or zstd to compress the file while it is written
     Returns:
         str: Full path to the saved CSV file, or None if no data was saved
     """
-    if df is None or df.empty:
-        logger.warning(f"No data to save for {file_name}")
-        return None
-    
-    output_file = f"{output_dir}\{file_name}.csv"
-    df.to_csv(output_file, index=False)
-    logger.info(f"\nData written to: {output_file}")
-    
-    return output_file
+    return _write_single(CsvResultWriter(file_name, output_dir, compression), df)
 
 @log_execution
-def write_to_excel(df: pd.DataFrame, file_name: str, output_dir: str) -> str:
+def write_to_excel(df: ResultData, file_name: str, output_dir: str) -> str:
     """
-    Save query results DataFrame to an Excel file.
-    
+    Save query results to an Excel file.
+
     Args:
-        df (pd.DataFrame): DataFrame to save
+        df (ResultData): DataFrame, or iterable of DataFrame chunks, to save
         file_name (str): Base name for the output file (without extension)
         output_dir (str): Directory to save the file in
-        query_file (str): Path to the original query file (for metadata)
     Returns:
         str: Full path to the saved Excel file, or None if no data was saved
     """
+    return _write_single(ExcelResultWriter(file_name, output_dir), df)
 
-    if df is None or df.empty:
-        logger.warning(f"No data to save for {file_name}")
-        return None
-
-    spc = CommsCalculations(df)
+def write_to_json(df: ResultData, file_name: str, output_dir: str, date_format: str = DEFAULT_JSON_DATE_FORMAT) -> str:
+    """
+    Save query results to a JSON lines file.
 
-    output_file = f"{output_dir}\{file_name}.xlsx"
-    spc.save_to_excel( output_file)
-    logger.info(f"\nData written to: {output_file}")
-    
-    return output_file
+    Args:
+        df (ResultData): DataFrame, or iterable of DataFrame chunks, to save
+        file_name (str): Base name for the output file (without extension)
+        output_dir (str): Directory to save the file in
+        date_format (str): epoch for epoch milliseconds or iso for ISO 8601 dates
+    Returns:
+        str: Full path to the saved JSON file, or None if no data was saved
+    """
+    return _write_single(JsonResultWriter(file_name, output_dir, date_format), df)
 
-def write_to_json(df: pd.DataFrame, file_name: str, output_dir: str) -> str:
+@log_execution
+def write_to_parquet(df: ResultData, file_name: str, output_dir: str, compression: str = DEFAULT_PARQUET_COMPRESSION,
+                     row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> str:
     """
-    Save query results DataFrame to a JSON file.
-    
+    Save query results to a Parquet file.
+
     Args:
-        df (pd.DataFrame): DataFrame to save
+        df (ResultData): DataFrame, or iterable of DataFrame chunks, to save
         file_name (str): Base name for the output file (without extension)
         output_dir (str): Directory to save the file in
-        query_file (str): Path to the original query file (for metadata)
+        compression (str): Parquet compression codec
+        row_group_size (int): Maximum number of rows per row group
     Returns:
-        str: Full path to the saved JSON file, or None if no data was saved
+        str: Full path to the saved Parquet file, or None if no data was saved
     """
-    if df is None or df.empty:
-        logger.warning(f"No data to save for {file_name}")
-        return None
-    
-    output_file = f"{output_dir}\{file_name}.json"
-    df.to_json(output_file, orient='records', lines=True)
-    logger.info(f"\nData written to: {output_file}")
-    
-    return output_file
+    return _write_single(ParquetResultWriter(file_name, output_dir, compression, row_group_size), df)
@@ -1,14 +1,35 @@
 from flexquery.task.base import Task
-from flexquery.utils.connection import DuckDBConnectionManager, MSSQLWindowsAuthConnectionManager, MSSQLUsernamePasswordConnectionManager
-from flexquery.utils.processor import FlexQuery
-from flexquery.config.exceptions import ConfigurationError, DatabaseConnectionError, DataProcessorError
+from flexquery.utils.connection import create_connection_manager
+from flexquery.utils.processor import FlexQuery, QueryProcessor
+from flexquery.utils.cache import ResultCache
+from flexquery.utils.dtypes import memory_usage, optimize_dtypes
+from flexquery.utils.partition import key_slices, merge_streams
+from flexquery.utils.cancel import StatementGroup, run_interruptibly
+from flexquery.utils.incremental import (
+    WatermarkState, WatermarkTracker, clear_dataset, compact_dataset, list_parts, part_file_name
+)
+from flexquery.utils.template import load_template
+from flexquery.config.exceptions import ConfigurationError, DatabaseConnectionError, DataProcessorError, TaskExecutionError
 from flexquery.utils import skeleton
 from flexquery.config.config import Config
-from flexquery.task.io import write_to_csv, write_to_excel, write_to_json ,capture_dataframe_info
+from flexquery.config.constants import MAX_CONCURRENT_ENVIRONMENTS, POOL_MAX_OVERFLOW, WATERMARK_DIRECTIVE, WATERMARK_PARAMETER
+from flexquery.config.snapshot import ConfigSnapshot
+from flexquery.task.io import (
+    CsvResultWriter, ExcelResultWriter, JsonResultWriter, ParquetResultWriter, write_results, capture_dataframe_info
+)
 from flexquery.config.logging_config import get_logger
 from flexquery.config.pathconfig import  AppPaths
 
+import asyncio
 import click
+import fnmatch
+import logging
+import os
+import sys
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 from datetime import datetime
 
@@ -26,20 +47,37 @@ class RunTask(Task):
         self.write_csv = kwargs.get('write_csv', False)
         self.write_excel = kwargs.get('write_excel', False)
         self.write_json = kwargs.get('write_json', False)
+        self.write_parquet = kwargs.get('write_parquet', False)
         self.win_auth = kwargs.get('win_auth', False)
         self.username = kwargs.get('username', None)
         self.password = kwargs.get('password', None)
-        self.config = Config(self._env, win_auth=self.win_auth, username=self.username, password=self.password)
+        with self.profile.phase('config_load'):
+            self.config = Config(self._env, win_auth=self.win_auth, username=self.username, password=self.password)
+        self.stream = kwargs.get('stream') or self.config.stream
+        self.chunk_size = kwargs.get('chunk_size') or self.config.chunk_size
+        self.output_workers = kwargs.get('output_workers') or self.config.output_workers
+        self.compress = kwargs.get('compress') or self.config.compress
+        self.parquet_compression = kwargs.get('parquet_compression') or self.config.parquet_compression
+        self.row_group_size = kwargs.get('row_group_size') or self.config.parquet_row_group_size
+        self.queries = kwargs.get('queries') or ()
+        self.all_queries = kwargs.get('all_queries', False)
+        self.concurrency = kwargs.get('concurrency') or self.config.concurrency
+        self.show_profile = kwargs.get('profile', False)
+        self.full_refresh = kwargs.get('full_refresh', False)
+        self.explain = kwargs.get('explain', False)
+        self.force = kwargs.get('force', False)
+        self.timeout = kwargs.get('timeout')
+        self.partition_by = kwargs.get('partition_by')
+        self.partitions = kwargs.get('partitions') or self.config.partitions
+        self.ordered = not kwargs.get('unordered', False)
+        self._concurrent_queries = 1  # queries of this run sharing the connection pool
+        # Batch queries and nested runs go on unattended, so they never prompt
+        self.interactive = not (self.queries or self.all_queries or kwargs.get('nested', False))
         self.query_parameters = self.config.params
+        self._cache = self._create_cache(kwargs.get('no_cache', False), kwargs.get('refresh', False))
         self.env_dir = AppPaths.get_queries_lib_dir().joinpath(self._env)
-        if self.config.db_type == "duckdb":
-            self._connection_manager = DuckDBConnectionManager(self.config)
-        elif self.config.db_type == "mssql" and self.config.win_auth:
-            self._connection_manager = MSSQLWindowsAuthConnectionManager(self.config)
-        elif self.config.db_type == "mssql":
-            self._connection_manager = MSSQLUsernamePasswordConnectionManager(self.config)
-        else:
-            raise ConfigurationError(f"Unsupported database type: {self.config.db_type}")
+        self.output_dir = AppPaths.get_output_dir().joinpath(self._env)
+        self._connection_manager = create_connection_manager(self.config)
 
 
     def validate(self):
@@ -52,66 +90,26 @@ class RunTask(Task):
         """Prepare for building."""
         logger.info(f"Executing SQL query for environment: {self._env}")
         skeleton.initialize_env_directories(self._env)
-        self._connection_manager.create_engine()
+        with self.profile.phase('engine_create'):
+            self._connection_manager.create_engine()
         return True
 
 
     def _execute(self):
         """Execute the SQL query logic."""
         try:
+            sql_files = self._get_sql_files(self.env_dir)
+            if not sql_files:
+                raise ConfigurationError(f"No SQL files found in environment: {self.env_dir}")
+
+            if self.queries or self.all_queries:
+                return self._execute_batch(self._resolve_batch_queries(sql_files))
             
-            with self._connection_manager as conn:
-                self._query_executor = FlexQuery(conn.connection, self.config)
-
-                sql_files = self._get_sql_files(self.env_dir)
-                if not sql_files:
-                    raise ConfigurationError(f"No SQL files found in environment: {self.env_dir}")
-                
-                self._display_available_queries(sql_files, self._env)
-
-                query_file = self._select_query(sql_files)
-                query_path = self._get_query_path(self._env, query_file)
-
-                if not query_path:
-                    raise FileNotFoundError(f"Query file not found: {query_path}")
-                self._log_query_content(query_path)
-
-                result = self._query_executor.process_sql_query_with_params(query_path, self.query_parameters)
-
-                if result is not None and not result.empty:
-                    base_name = Path(query_file).stem
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    extract_params = '_'.join([str(v) for v in self.query_parameters.values()])
-                    clean_params = extract_params.replace(' ', '_').replace("'", '').replace("[", '').replace("]", '').replace(",", '')
-                    short_params = clean_params[:50] if len(clean_params) > 50 else clean_params
-                    file_name = f"{base_name}_{short_params}_created_at_{timestamp}"
-                    output_direnv = AppPaths.get_output_dir().joinpath(self._env)
-                    summary = capture_dataframe_info(result)
-                    logger.debug(f"Query results summary:\n{summary}")
-
-                    if self.write_csv:
-                            try:
-                                csv_file = write_to_csv(result, file_name, output_direnv)
-                            except DataProcessorError as e:
-                                raise DataProcessorError(f"Error writing CSV file: {e}") from None
-
-                    if self.write_excel:
-                        try:
-                            excel_file = write_to_excel(result, file_name, output_direnv)
-                        except DataProcessorError as e:
-                            raise DataProcessorError(f"Error writing Excel file {e}") from None
-                        
-                    if self.write_json:
-                        try:
-                            json_file = write_to_json(result, file_name, output_direnv)
-                        except DataProcessorError as e:
-                            raise DataProcessorError(f"Error writing JSON file {e}") from None
-                else:
-                    logger.warning("No results returned from the SQL query.")
-                    return False        
-                if not self.write_csv and not self.write_excel and not self.write_json:
-                    logger.warning("Results displayed in log file only. Use --write-csv or --write-excel to save to save your results.")
-                return True
+            self._display_available_queries(sql_files, self._env)
+
+            query_file = self._select_query(sql_files)
+            # On a worker thread, so Ctrl-C can cancel the statement while the driver blocks
+            return run_interruptibly(self._run_query, query_file) > 0
             
         except DatabaseConnectionError as e:
             raise DatabaseConnectionError(f"Workflow failed due to database connection issue: {e}")
@@ -122,9 +120,478 @@ class RunTask(Task):
         
         
     def cleanup(self):
-        pass
+        self._connection_manager.close()
+
+    def report_profile(self):
+        """With --profile, print the run profile and save it as JSON in the log directory."""
+        if not self.show_profile:
+            return
+        logger.info(f"\nRun profile for {self._env}:\n" + self.profile.format_table())
+        started_at = self.profile.started_at.strftime('%Y%m%d_%H%M%S')
+        profile_file = AppPaths.get_log_dir(create=True).joinpath(f"profile_{self._env}_{started_at}.json")
+        self.profile.write(profile_file)
+        logger.debug(f"Run profile written to: {profile_file}")
+
+    @contextmanager
+    def _checkout(self):
+        """Check out a pooled connection, timing the checkout as the connect phase."""
+        with ExitStack() as stack:
+            with self.profile.phase('connect'):
+                connection = stack.enter_context(self._connection_manager.checkout())
+            yield connection
         
 
+    def _run_query(self, query_file):
+        """Run a single query file and write its outputs. Returns the number of rows."""
+        query_path = self._get_query_path(self._env, query_file)
+
+        if not query_path:
+            raise FileNotFoundError(f"Query file not found: {query_path}")
+        self._log_query_content(query_path)
+
+        watermark = load_template(query_path).directives.get(WATERMARK_DIRECTIVE)
+        if watermark and self.config.sweep:
+            raise ConfigurationError(f"Incremental query {query_file} cannot be combined with a parameter sweep")
+        if self.explain:
+            return self._explain_query(query_file, query_path, watermark)
+        if self.partition_by and (watermark or self.config.sweep):
+            raise ConfigurationError(f"--partition-by cannot be combined with an incremental query or a parameter sweep ({query_file})")
+        if self.partition_by:
+            return self._run_partitioned(query_file, query_path)
+        if watermark:
+            column, _, initial = watermark.partition(' ')
+            return self._run_incremental(query_file, query_path, column, initial.strip() or None)
+
+        if self.config.sweep:
+            return self._run_sweep(query_file, query_path)
+
+        writers = self._create_writers(self._output_file_name(query_file, self.query_parameters), self.output_dir)
+
+        query_executor = FlexQuery(None, self.config, self._cache, self.profile, self.timeout)
+        chunk_size = self.chunk_size if self.stream else None
+
+        # A cache hit is served without opening a database connection
+        result = query_executor.cached_sql_query_with_params(query_path, self.query_parameters, chunk_size)
+        if result is not None:
+            return self._write_output(writers, result, query_file)
+
+        with self._checkout() as connection:
+            self._check_estimates(connection, query_file, query_path, [(None, self.query_parameters)])
+            query_executor.connection = connection
+            if self.stream:
+                logger.info(f"Streaming results in chunks of {self.chunk_size} rows")
+                result = query_executor.stream_sql_query_with_params(query_path, self.query_parameters, self.chunk_size)
+            else:
+                result = query_executor.process_sql_query_with_params(query_path, self.query_parameters)
+            return self._write_output(writers, result, query_file)
+
+    def _run_incremental(self, query_file, query_path, column, initial=None):
+        """
+        Fetch the rows added since the last run and append them to the query's dataset.
+
+        The query compares its watermark column with :watermark, which is bound to the
+        high-water mark saved by the previous run. On the first run it is bound to the
+        initial value given in the directive ("-- @watermark <column> <initial>"), or
+        else to the watermark in params.yml. The new rows are appended as a part file to the
+        Parquet dataset in output/<ENV>/<query>/, and to any other requested outputs.
+        The new mark is saved only after every output has been written. Once the dataset
+        holds compact_files part files, they are merged into one.
+        """
+        if WATERMARK_PARAMETER not in load_template(query_path).parameters:
+            raise ConfigurationError(f"Incremental query {query_file} must compare {column} with :{WATERMARK_PARAMETER}")
+        state = WatermarkState(AppPaths.get_state_dir(), self._env, query_file, column)
+        dataset_dir = self.output_dir.joinpath(query_file)
+        if self.full_refresh:
+            logger.info(f"Full refresh of {query_file}: clearing its watermark and dataset")
+            state.clear()
+            clear_dataset(dataset_dir)
+
+        watermark = self._resolve_watermark(query_file, state, initial)
+        logger.info(f"Fetching rows of {query_file} past the {column} watermark {watermark}")
+        parameters = {**self.query_parameters, WATERMARK_PARAMETER: watermark}
+
+        writers = self._create_writers(self._output_file_name(query_file, parameters), self.output_dir)
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+        writers.append(ParquetResultWriter(part_file_name(), dataset_dir, self.parquet_compression, self.row_group_size))
+        tracker = WatermarkTracker(column)
+
+        # Deltas are never served from the result cache
+        query_executor = FlexQuery(None, self.config, None, self.profile, self.timeout)
+        with self._checkout() as connection:
+            self._check_estimates(connection, query_file, query_path, [(None, parameters)])
+            query_executor.connection = connection
+            if self.stream:
+                result = tracker.track(query_executor.stream_sql_query_with_params(query_path, parameters, self.chunk_size))
+            else:
+                result = query_executor.process_sql_query_with_params(query_path, parameters)
+                tracker.update(result)
+            rows = self._write_output(writers, result, query_file)
+
+        if tracker.value is not None:
+            state.save(tracker.value)
+            logger.info(f"Watermark of {query_file} advanced to {tracker.value}")
+        if len(list_parts(dataset_dir)) >= self.config.compact_files:
+            with self.profile.phase('compact'):
+                compact_dataset(dataset_dir, self.row_group_size, self.parquet_compression)
+        return rows
+
+    def _run_partitioned(self, query_file, query_path):
+        """
+        Split a query into key ranges of the partition column and fetch them concurrently.
+
+        The range of the column is read first, then split into equal-width slices, each
+        fetched on its own pooled connection. No more slices run at once than the pool can
+        serve alongside the other queries of a batch. The slices are written in key order,
+        or as they arrive with --unordered. When one slice fails, the statements of the
+        others are cancelled on the server. Partitioned runs skip the result cache.
+        """
+        query_executor = FlexQuery(None, self.config, None, self.profile, self.timeout)
+        with self._checkout() as connection:
+            self._check_estimates(connection, query_file, query_path, [(None, self.query_parameters)])
+            query_executor.connection = connection
+            low, high = query_executor.key_range_with_params(query_path, self.query_parameters, self.partition_by)
+        slices = key_slices(self.partition_by, low, high, self.partitions, self.ordered)
+        logger.info(
+            f"Fetching {query_file} in {len(slices)} ranges of {self.partition_by} from {low} to {high} "
+            f"({'key order' if self.ordered else 'unordered'})"
+        )
+
+        workers = self._slice_workers(len(slices))
+        group = StatementGroup()
+        writers = self._create_writers(self._output_file_name(query_file, self.query_parameters), self.output_dir)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flexquery-range") as executor:
+            if self.stream:
+                producers = [lambda key_slice=key_slice: self._stream_slice(query_path, key_slice, group) for key_slice in slices]
+                result = merge_streams(executor, producers, self.ordered)
+            else:
+                futures = [executor.submit(self._fetch_slice, query_path, key_slice, group) for key_slice in slices]
+                result = (future.result() for future in (futures if self.ordered else as_completed(futures)))
+            try:
+                return self._write_output(writers, result, query_file)
+            except BaseException:
+                cancelled = group.abandon()
+                if cancelled:
+                    logger.warning(f"Cancelled {cancelled} running range(s) of {query_file}")
+                raise
+            finally:
+                # Stops the slices still running when writing fails
+                result.close()
+                for future in ([] if self.stream else futures):
+                    future.cancel()
+
+    def _slice_workers(self, slices):
+        """How many key ranges to fetch at once: one per range, within the capacity of the connection pool."""
+        capacity = self.config.pool_size + POOL_MAX_OVERFLOW
+        workers = min(slices, max(1, capacity // self._concurrent_queries))
+        if workers < slices:
+            shared = f", shared by {self._concurrent_queries} concurrent queries" if self._concurrent_queries > 1 else ""
+            logger.warning(
+                f"Fetching {slices} ranges {workers} at a time: the connection pool of {self._env} "
+                f"holds {capacity} connections (pool_size + {POOL_MAX_OVERFLOW} overflow){shared}"
+            )
+        return workers
+
+    def _fetch_slice(self, query_path, key_slice, group):
+        """Fetch one key range of a partitioned query as a DataFrame."""
+        query_executor = FlexQuery(None, self.config, None, self.profile, self.timeout)
+        with self._checkout() as connection, group.member(connection):
+            query_executor.connection = connection
+            result = query_executor.process_partition_with_params(query_path, self.query_parameters, key_slice)
+        logger.info(f"Range {key_slice}: {len(result)} rows")
+        return result
+
+    def _stream_slice(self, query_path, key_slice, group):
+        """Stream one key range of a partitioned query in chunks, on its own connection."""
+        query_executor = FlexQuery(None, self.config, None, self.profile, self.timeout)
+        with self._checkout() as connection, group.member(connection):
+            query_executor.connection = connection
+            yield from query_executor.stream_partition_with_params(query_path, self.query_parameters, key_slice, self.chunk_size)
+
+    def _resolve_watermark(self, query_file, state=None, initial=None):
+        """The watermark to bind: the saved high-water mark, else the directive's initial value or params.yml."""
+        watermark = state.load() if state is not None else None
+        if watermark is None:
+            watermark = initial if initial is not None else self.query_parameters.get(WATERMARK_PARAMETER)
+            if watermark is None:
+                raise ConfigurationError(
+                    f"No watermark saved for {query_file} yet: give an initial value in its @{WATERMARK_DIRECTIVE} "
+                    f"directive or set {WATERMARK_PARAMETER} in params.yml"
+                )
+        return watermark
+
+    def _explain_query(self, query_file, query_path, watermark=None):
+        """Log the estimated rows and cost of a query, per sweep partition, without running it. Returns 0 rows."""
+        if watermark:
+            column, _, initial = watermark.partition(' ')
+            # With --full-refresh the query would start again from the initial watermark
+            state = None if self.full_refresh else WatermarkState(AppPaths.get_state_dir(), self._env, query_file, column)
+            value = self._resolve_watermark(query_file, state, initial.strip() or None)
+            parameter_sets = [(None, {**self.query_parameters, WATERMARK_PARAMETER: value})]
+        else:
+            parameter_sets = self._parameter_sets()
+
+        query_executor = FlexQuery(None, self.config, None, self.profile, self.timeout)
+        with self._checkout() as connection:
+            query_executor.connection = connection
+            for label, parameters in parameter_sets:
+                estimate = query_executor.explain_sql_query_with_params(query_path, parameters)
+                exceeded = estimate.exceeds(self.config.max_estimated_rows, self.config.max_estimated_cost)
+                name = f"{query_file} ({label})" if label else query_file
+                logger.info(f"{name}: {estimate}" + (f" - exceeds {', '.join(exceeded)}" if exceeded else ""))
+                logger.debug(f"Estimated plan of {name}:\n{estimate.plan}")
+        return 0
+
+    def _parameter_sets(self):
+        """The parameters a query runs with, once per sweep partition, each with its partition label."""
+        if not self.config.sweep:
+            return [(None, self.query_parameters)]
+        return [
+            (self._partition_label(partition), {**self.query_parameters, **partition})
+            for partition in QueryProcessor.expand_sweep(self.config.sweep)
+        ]
+
+    @property
+    def _guarded(self):
+        """Whether queries are checked against the estimate thresholds of the environment before they run."""
+        return not self.force and (self.config.max_estimated_rows is not None or self.config.max_estimated_cost is not None)
+
+    def _check_estimates(self, connection, query_file, query_path, parameter_sets):
+        """
+        Refuse to run a query whose estimated plan exceeds the thresholds of the environment.
+
+        In an interactive run the user is asked for confirmation instead.
+
+        Raises:
+            TaskExecutionError: If an estimate exceeds a threshold and the run is not confirmed
+        """
+        if not self._guarded:
+            return
+        query_executor = FlexQuery(connection, self.config, None, self.profile)
+        exceeded = []
+        for label, parameters in parameter_sets:
+            estimate = query_executor.explain_sql_query_with_params(query_path, parameters)
+            name = f"{query_file} ({label})" if label else query_file
+            logger.info(f"Estimate for {name}: {estimate}")
+            exceeded.extend(f"{name}: {limit}" for limit in estimate.exceeds(
+                self.config.max_estimated_rows, self.config.max_estimated_cost
+            ))
+        if not exceeded:
+            return
+        message = f"The estimated plan exceeds the limits of {self._env} ({'; '.join(exceeded)})"
+        if self.interactive and sys.stdin.isatty():
+            if click.confirm(f"{message}. Run the query anyway?", default=False):
+                return
+        raise TaskExecutionError(f"{message}. Use --force to run the query anyway")
+
+    def _run_sweep(self, query_file, query_path):
+        """
+        Run a query once per combination of the sweep dimensions in params.yml.
+
+        Partitions run concurrently, each on its own pooled connection. With the
+        partitioned output every partition gets its own files. With the combined output
+        the partitions are appended to a single set of files, in sweep order, with one
+        column per sweep dimension telling which partition each row came from.
+        """
+        partitions = QueryProcessor.expand_sweep(self.config.sweep)
+        workers = min(self.concurrency, len(partitions))
+        logger.info(
+            f"Sweeping {query_file} over {len(partitions)} partitions "
+            f"({self.config.sweep_output} output, concurrency {workers})"
+        )
+
+        if self._guarded:
+            # Every partition is checked before any of them runs
+            with self._checkout() as connection:
+                self._check_estimates(connection, query_file, query_path, self._parameter_sets())
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flexquery-partition") as executor:
+            if self.config.sweep_output == 'combined':
+                fixed_parameters = {k: v for k, v in self.query_parameters.items() if k not in self.config.sweep}
+                file_name = self._output_file_name(query_file, fixed_parameters, label='sweep')
+                writers = self._create_writers(file_name, self.output_dir)
+                results = executor.map(
+                    lambda partition: self._with_sweep_columns(self._fetch_partition(query_path, partition), partition),
+                    partitions,
+                )
+                return self._write_output(writers, results, query_file)
+
+            rows = executor.map(lambda partition: self._run_partition(query_file, query_path, partition), partitions)
+            return sum(rows)
+
+    def _run_partition(self, query_file, query_path, partition):
+        """Run one sweep partition and write it to its own output files."""
+        parameters = {**self.query_parameters, **partition}
+        writers = self._create_writers(self._output_file_name(query_file, parameters), self.output_dir)
+        return self._write_output(writers, self._fetch_partition(query_path, partition), query_file)
+
+    def _fetch_partition(self, query_path, partition):
+        """Fetch the result of one sweep partition as a DataFrame."""
+        parameters = {**self.query_parameters, **partition}
+        query_executor = FlexQuery(None, self.config, self._cache, self.profile, self.timeout)
+        result = query_executor.cached_sql_query_with_params(query_path, parameters)
+        if result is None:
+            with self._checkout() as connection:
+                query_executor.connection = connection
+                result = query_executor.process_sql_query_with_params(query_path, parameters)
+        logger.info(f"Partition {self._partition_label(partition)}: {len(result)} rows")
+        return result
+
+    @staticmethod
+    def _with_sweep_columns(result, partition):
+        """
+        Prepend one column per sweep dimension holding the partition's value. A dimension
+        named like a column of the result gets the column name sweep_<name>.
+        """
+        if result is None:
+            return None
+        result = result.copy(deep=False)
+        for position, (name, value) in enumerate(partition.items()):
+            column = f"sweep_{name}" if name in result.columns else name
+            if isinstance(value, list):
+                value = ', '.join(str(item) for item in value)
+            result.insert(position, column, [value] * len(result))
+        return result
+
+    @staticmethod
+    def _partition_label(partition):
+        return ', '.join(f"{name}={value}" for name, value in partition.items())
+
+    def _output_file_name(self, query_file, parameters, label=None):
+        """Build the output file name from the query name, its parameter values and a timestamp."""
+        base_name = Path(query_file).stem
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        extract_params = '_'.join([str(v) for v in parameters.values()])
+        clean_params = extract_params.replace(' ', '_').replace("'", '').replace("[", '').replace("]", '').replace(",", '')
+        short_params = clean_params[:50] if len(clean_params) > 50 else clean_params
+        if label:
+            short_params = f"{short_params}_{label}" if short_params else label
+        return f"{base_name}_{short_params}_created_at_{timestamp}"
+
+    def _execute_batch(self, query_files):
+        """Run several query files concurrently without prompting and print a per-query summary."""
+        workers = min(self.concurrency, len(query_files))
+        self._concurrent_queries = workers
+        logger.info(f"Running {len(query_files)} queries for {self._env} with concurrency {workers}")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flexquery-query") as executor:
+            summaries = list(executor.map(self._run_batch_query, query_files))
+
+        self._log_batch_summary(summaries)
+        failed = [summary for summary in summaries if summary['status'] == 'failed']
+        if failed:
+            raise TaskExecutionError(f"{len(failed)} of {len(summaries)} queries failed: {', '.join(s['query'] for s in failed)}")
+        return True
+
+    def _run_batch_query(self, query_file):
+        """Run one query of a batch, capturing its outcome instead of raising."""
+        started = time.perf_counter()
+        try:
+            rows = self._run_query(query_file)
+            status, error = ('explain' if self.explain else 'ok' if rows else 'empty'), None
+        except Exception as e:
+            logger.error(f"Query {query_file} failed: {e}")
+            rows, status, error = 0, 'failed', str(e)
+        return {
+            'query': query_file,
+            'status': status,
+            'rows': rows,
+            'duration': time.perf_counter() - started,
+            'error': error,
+        }
+
+    def _log_batch_summary(self, summaries):
+        width = max(len('Query'), *(len(summary['query']) for summary in summaries))
+        lines = [f"{'Query':<{width}}  {'Status':<7} {'Rows':>12} {'Duration':>10}"]
+        for summary in summaries:
+            lines.append(
+                f"{summary['query']:<{width}}  {summary['status']:<7} {summary['rows']:>12} {summary['duration']:>9.2f}s"
+            )
+        logger.info("\nBatch summary:\n" + "\n".join(lines))
+
+    def _resolve_batch_queries(self, sql_files):
+        """Resolve --all and --query names or glob patterns to query files, in a stable order."""
+        if self.all_queries:
+            return sorted(sql_files)
+        selected = []
+        for pattern in self.queries:
+            pattern = pattern[:-len('.sql')] if pattern.endswith('.sql') else pattern
+            matches = sorted(fnmatch.filter(sql_files, pattern))
+            if not matches:
+                raise ConfigurationError(f"No query in {self._env} matches '{pattern}'")
+            selected.extend(match for match in matches if match not in selected)
+        return selected
+
+    def _write_output(self, writers, result, query_file):
+        """Write a query result, either a DataFrame or a stream of chunks, to the requested outputs. Returns the row count."""
+        if isinstance(result, pd.DataFrame):
+            if result.empty:
+                logger.warning("No results returned from the SQL query.")
+                return 0
+            if self.config.optimize_dtypes:
+                with self.profile.phase('optimize_dtypes'):
+                    result = self._optimize_dtypes(result)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Query results summary:\n{capture_dataframe_info(result)}")
+
+        try:
+            total_rows = write_results(writers, result, self.output_workers)
+        except DataProcessorError as e:
+            raise DataProcessorError(f"Error writing output files: {e}") from None
+        finally:
+            # Also records the partial output of a failed, timed out or interrupted run
+            self._profile_writers(writers)
+        self.profile.count('rows_written', total_rows)
+
+        if total_rows == 0:
+            logger.warning("No results returned from the SQL query.")
+            return 0
+        logger.info(f"Query {query_file} returned {total_rows} rows")
+        if not writers:
+            logger.warning("Results displayed in log file only. Use --write-csv, --write-excel, --write-json or --write-parquet to save your results.")
+        return total_rows
+
+    def _profile_writers(self, writers):
+        """Record the time and output size of each writer in the run profile."""
+        for writer in writers:
+            if not writer.rows_written:
+                continue
+            self.profile.add(f"write_{writer.name.lower()}", writer.elapsed)
+            if os.path.exists(writer.output_file):
+                self.profile.count(f"bytes_written_{writer.name.lower()}", os.path.getsize(writer.output_file))
+
+    def _optimize_dtypes(self, df):
+        """Downcast the dtypes of a fetched result and log the memory saved."""
+        before = memory_usage(df)
+        df = optimize_dtypes(df, self.config.category_threshold)
+        after = memory_usage(df)
+        saved = (1 - after / before) * 100 if before else 0
+        logger.info(f"Optimized dtypes: {before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB ({saved:.0f}% saved)")
+        return df
+
+    def _create_cache(self, no_cache, refresh):
+        """Create the result cache for this environment, unless it is disabled."""
+        if no_cache or not self.config.cache:
+            return None
+        if not ResultCache.is_available():
+            logger.debug("pyarrow is not installed, result cache disabled")
+            return None
+        return ResultCache(
+            AppPaths.get_cache_dir(), self._env, self.config.cache_ttl, self.config.cache_max_size_mb, refresh=refresh
+        )
+
+    def _create_writers(self, file_name, output_dir):
+        """Create an output writer for each requested output format."""
+        writers = []
+        if self.write_csv:
+            writers.append(CsvResultWriter(file_name, output_dir, self.compress))
+        if self.write_excel:
+            writers.append(ExcelResultWriter(file_name, output_dir))
+        if self.write_json:
+            writers.append(JsonResultWriter(file_name, output_dir, self.config.json_date_format))
+        if self.write_parquet:
+            writers.append(ParquetResultWriter(file_name, output_dir, self.parquet_compression, self.row_group_size))
+        return writers
+
     def _get_sql_files(self, env_dir):
         """Get the list of SQL files in the environment directory."""
         sql_files = [entry.name.replace('.sql', '') for entry in env_dir.iterdir()
@@ -133,12 +600,14 @@ class RunTask(Task):
             raise ConfigurationError(f"No SQL files found in environment: {env_dir}")
         return sql_files
 
-    def _display_available_queries(self, sql_files, env):
+    @staticmethod
+    def _display_available_queries(sql_files, env):
         print(f"\nAvailable queries for {env} environment:")
         for i, file in enumerate(sql_files, 1):
             print(f"{i}. {file}")
 
-    def _select_query(self, sql_files):
+    @staticmethod
+    def _select_query(sql_files):
         selection = None
         while selection not in range(1, len(sql_files) + 1):
             selection = click.prompt("Select a query to run (number)", type=int)
@@ -155,5 +624,103 @@ class RunTask(Task):
         return query_path
 
     def _log_query_content(self, query_path):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         with open(query_path, 'r') as file:
-            logger.debug(f"SQL query:\n{file.read()}")
\ No newline at end of file
+            logger.debug(f"SQL query:\n{file.read()}")
+
+class MultiEnvRunTask(Task):
+    """
+    Task for running the same queries against several environments at once.
+
+    Each environment runs as a nested RunTask with its own configuration, connection
+    pool, output directory and run profile. An asyncio scheduler hands the blocking
+    runs to a bounded thread pool, so the total time approaches that of the slowest
+    environment rather than the sum of all of them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.envs = self._resolve_environments(kwargs.get('env'), kwargs.get('all_envs', False))
+        self.queries = kwargs.get('queries') or ()
+        self.all_queries = kwargs.get('all_queries', False)
+
+    def validate(self):
+        """Validate run requirements."""
+        if not self.envs:
+            raise ConfigurationError("At least one environment is required for running SQL queries.")
+        return True
+
+    def setup(self):
+        """Choose the query up front, since the environments run without prompting."""
+        logger.info(f"Executing SQL query for environments: {', '.join(self.envs)}")
+        if not self.queries and not self.all_queries:
+            sql_files = self._get_common_sql_files()
+            RunTask._display_available_queries(sql_files, ', '.join(self.envs))
+            self.queries = (RunTask._select_query(sql_files),)
+        return True
+
+    def _execute(self):
+        """Run every environment concurrently and print a per-environment summary."""
+        summaries = asyncio.run(self._run_environments())
+
+        self._log_environment_summary(summaries)
+        failed = [summary for summary in summaries if summary['status'] == 'failed']
+        if failed:
+            raise TaskExecutionError(f"{len(failed)} of {len(summaries)} environments failed: {', '.join(s['env'] for s in failed)}")
+        return True
+
+    async def _run_environments(self):
+        """Schedule one blocking run per environment on a bounded thread pool and wait for all of them."""
+        loop = asyncio.get_running_loop()
+        workers = min(MAX_CONCURRENT_ENVIRONMENTS, len(self.envs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flexquery-env") as executor:
+            runs = [loop.run_in_executor(executor, self._run_environment, env) for env in self.envs]
+            return await asyncio.gather(*runs)
+
+    def _run_environment(self, env):
+        """Run the queries against one environment, capturing its outcome instead of raising."""
+        started = time.perf_counter()
+        task = None
+        try:
+            task = RunTask(**{**self._kwargs, 'env': env, 'queries': self.queries, 'nested': True})
+            task.execute()
+            status, error = 'ok', None
+        except Exception as e:
+            logger.error(f"Environment {env} failed: {e}")
+            status, error = 'failed', str(e)
+        return {
+            'env': env,
+            'status': status,
+            'rows': task.profile.counters.get('rows_written', 0) if task else 0,
+            'duration': time.perf_counter() - started,
+            'error': error,
+        }
+
+    def _log_environment_summary(self, summaries):
+        width = max(len('Environment'), *(len(summary['env']) for summary in summaries))
+        lines = [f"{'Environment':<{width}}  {'Status':<7} {'Rows':>12} {'Duration':>10}"]
+        for summary in summaries:
+            lines.append(
+                f"{summary['env']:<{width}}  {summary['status']:<7} {summary['rows']:>12} {summary['duration']:>9.2f}s"
+            )
+        logger.info("\nEnvironment summary:\n" + "\n".join(lines))
+
+    def _get_common_sql_files(self):
+        """Get the names of the SQL files present in every environment directory."""
+        common = None
+        for env in self.envs:
+            env_dir = AppPaths.get_queries_lib_dir().joinpath(env)
+            names = {entry.stem for entry in env_dir.glob('*.sql') if entry.is_file()} if env_dir.is_dir() else set()
+            common = names if common is None else common & names
+        if not common:
+            raise ConfigurationError(f"No SQL query is present in every environment: {', '.join(self.envs)}")
+        return sorted(common)
+
+    @staticmethod
+    def _resolve_environments(env, all_envs):
+        """Resolve --all-envs or a comma-separated --env list to environment names, in order."""
+        if all_envs:
+            return ConfigSnapshot().get_environments()
+        return list(dict.fromkeys(name.strip() for name in (env or '').split(',') if name.strip()))
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from flexquery.config.exceptions import DataProcessorError
+from flexquery.config.logging_config import get_logger
+from flexquery.utils.template import normalize_sql
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+class ResultCache:
+    """
+    Disk-backed cache of query results, stored as Parquet files.
+
+    Entries are keyed on the environment, the hash of the normalized SQL and the
+    final bound parameters. Each entry is a <key>.parquet file with a <key>.json
+    metadata sidecar. Entries expire after ttl seconds. When the cache grows beyond
+    max_size_mb, the least recently used entries are evicted first. A result larger
+    than max_size_mb on its own is not cached at all. A hit refreshes the
+    modification time of the entry.
+    """
+
+    def __init__(self, cache_dir, env: str, ttl: int, max_size_mb: int, refresh: bool = False):
+        self.root_dir = Path(cache_dir)
+        self.cache_dir = self.root_dir / env
+        self.env = env
+        self.ttl = ttl
+        self.max_size = max_size_mb * 1024 * 1024
+        self.refresh = refresh
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """The cache stores results as Parquet and needs pyarrow."""
+        return pq is not None
+
+    def make_key(self, query: str, parameters: dict) -> str:
+        """Hash the environment, normalized SQL and bound parameters into a cache key."""
+        payload = json.dumps(
+            {'env': self.env, 'sql': normalize_sql(query), 'params': parameters},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, query: str, parameters: dict, chunk_size: Optional[int] = None):
+        """
+        Look up a cached result.
+
+        Args:
+            query (str): Final SQL text, after parameter expansion
+            parameters (dict): Bound parameter values
+            chunk_size (int, optional): Yield the result in chunks of this many rows
+        Returns:
+            A DataFrame, an iterator of DataFrames when chunk_size is given, or None on a miss
+        """
+        key = self.make_key(query, parameters)
+        data_path, meta_path = self._paths(key)
+        if self.refresh:
+            logger.info("Cache refresh requested, re-running query")
+            return None
+        if not data_path.exists() or not meta_path.exists():
+            logger.info(f"Cache miss for {self.env} query {key[:12]}")
+            return None
+
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            logger.debug(f"Discarding unreadable cache entry {key[:12]}")
+            self._remove(key)
+            return None
+
+        age = time.time() - meta['created_at']
+        if age > self.ttl:
+            logger.info(f"Cache entry for {self.env} query {key[:12]} expired ({age:.0f}s old), re-running query")
+            self._remove(key)
+            return None
+
+        os.utime(data_path)
+        logger.info(f"Cache hit for {self.env} query {key[:12]} ({meta['rows']} rows, {age:.0f}s old)")
+        if chunk_size:
+            return self._read_chunks(data_path, chunk_size)
+        return pq.read_table(data_path).to_pandas()
+
+    def store(self, query: str, parameters: dict, result):
+        """
+        Store a query result in the cache.
+
+        A DataFrame is written immediately. An iterator of DataFrames is wrapped so that
+        chunks are written as they stream past. The entry is only committed once the
+        stream is fully consumed.
+
+        Returns:
+            The result, or an equivalent iterator of DataFrames when a stream was given
+        """
+        if result is None:
+            return None
+        key = self.make_key(query, parameters)
+        if isinstance(result, pd.DataFrame):
+            if result.empty:
+                return result
+            self._write_entry(key, [result])
+            return result
+        return self._write_entry_through(key, result)
+
+    def _paths(self, key: str):
+        return self.cache_dir / f"{key}.parquet", self.cache_dir / f"{key}.json"
+
+    def _read_chunks(self, data_path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+        for batch in pq.ParquetFile(data_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+    def _write_entry_through(self, key: str, chunks) -> Iterator[pd.DataFrame]:
+        writer = _EntryWriter(self, key)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.discard()
+            raise
+        writer.commit()
+
+    def _write_entry(self, key: str, chunks) -> None:
+        writer = _EntryWriter(self, key)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.commit()
+
+    def _remove(self, key: str) -> None:
+        self._unlink_entry(self._paths(key)[0])
+
+    def evict(self) -> None:
+        """Remove expired entries of this environment, then least recently used ones until the cache fits."""
+        now = time.time()
+        entries = []
+        for data_path in self.root_dir.glob('*/*.parquet'):
+            meta_path = data_path.with_suffix('.json')
+            try:
+                stat = data_path.stat()
+                meta_stat = meta_path.stat()
+            except FileNotFoundError:
+                self._unlink_entry(data_path)
+                continue
+            if data_path.parent == self.cache_dir and now - meta_stat.st_mtime > self.ttl:
+                self._unlink_entry(data_path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size + meta_stat.st_size, data_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, data_path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._unlink_entry(data_path)
+            total -= size
+            logger.debug(f"Evicted cache entry {data_path.stem[:12]} ({size} bytes)")
+
+    @staticmethod
+    def _unlink_entry(data_path: Path) -> None:
+        for path in (data_path, data_path.with_suffix('.json')):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _EntryWriter:
+    """
+    Writes one cache entry to a temporary file and moves it into place on commit.
+
+    Caching is best effort. The entry is abandoned when the temporary file outgrows the
+    cache size limit or a chunk cannot be written, for example when it has mixed types
+    or a schema the earlier chunks do not share: the file is deleted, the rest of the
+    result is not written, and the query goes on uncached.
+    """
+
+    def __init__(self, cache: ResultCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.data_path, self.meta_path = cache._paths(key)
+        self.tmp_path = self.data_path.with_suffix(f".{os.getpid()}.tmp")
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._abandoned = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._abandoned or df is None or df.empty:
+            return
+        try:
+            self._write(df)
+        except Exception as e:
+            self._abandon(f"could not be cached: {e}", logging.WARNING)
+            return
+        if self.tmp_path.stat().st_size > self.cache.max_size:
+            self._abandon(f"exceeds cache_max_size_mb ({self.cache.max_size // (1024 * 1024)} MB), not caching it")
+
+    def _write(self, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self.cache.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._schema = pa.schema(
+                [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema],
+                metadata=table.schema.metadata,
+            )
+            self._writer = pq.ParquetWriter(self.tmp_path, self._schema)
+        if not table.schema.equals(self._schema):
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError) as e:
+                raise DataProcessorError(f"Chunk schema does not match the cached result schema: {e}") from None
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def _abandon(self, reason: str, level: int = logging.INFO) -> None:
+        self.discard()
+        self._abandoned = True
+        logger.log(level, f"Result of {self.cache.env} query {self.key[:12]} {reason}")
+
+    def commit(self) -> None:
+        if self._writer is None or self._abandoned:
+            return
+        try:
+            self._writer.close()
+            with open(self.meta_path, 'w') as file:
+                json.dump({'created_at': time.time(), 'rows': self.rows, 'env': self.cache.env}, file)
+            os.replace(self.tmp_path, self.data_path)
+        except Exception as e:
+            self._abandon(f"could not be cached: {e}", logging.WARNING)
+            self.cache._unlink_entry(self.data_path)
+            return
+        logger.info(f"Cached {self.rows} rows for {self.cache.env} query {self.key[:12]}")
+        self.cache.evict()
+
+    def discard(self) -> None:
+        if self._writer is not None and not self._abandoned:
+            try:
+                self._writer.close()
+            except Exception as e:
+                logger.debug(f"Could not close the cache entry being discarded: {e}")
+        try:
+            self.tmp_path.unlink()
+        except FileNotFoundError:
+            pass
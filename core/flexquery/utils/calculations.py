@@ -1,4 +1,6 @@
-import pandas as pd
+import os
+
+from flexquery.task.io import ExcelResultWriter, write_results
 
 
 class CommsCalculations:
@@ -17,19 +19,8 @@ class CommsCalculations:
         return policy_numbers
 
     def save_to_excel(self, output_file):
-        """Save query results DataFrame to an Excel file."""
-
-        with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
-            # All data
-            all_data = self.all_tab()
-            all_data.to_excel(writer, sheet_name='All_Records', index=False)
-
-            # Format the Excel file
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-                # Add filtering capability
-                worksheet.autofilter(0, 0, 0, len(all_data.columns) - 1)
-                # Freeze top row
-                worksheet.freeze_panes(1, 0)
-                
-        return output_file
+        """Save query results DataFrame to an Excel file, streaming rows with the constant-memory Excel writer."""
+        output_dir, file_name = os.path.split(output_file)
+        writer = ExcelResultWriter(os.path.splitext(file_name)[0], output_dir)
+        write_results([writer], self.all_tab())
+        return writer.output_file
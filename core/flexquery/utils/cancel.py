@@ -0,0 +1,244 @@
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from flexquery.config.constants import INTERRUPT_GRACE_SECONDS, INTERRUPT_POLL_SECONDS
+from flexquery.config.exceptions import SQLQueryError
+from flexquery.utils.profiler import RunProfile
+
+from flexquery.config.logging_config import get_logger
+logger = get_logger(__name__)
+
+
+class RunningStatement:
+    """
+    A statement running on a connection, which can be cancelled from any thread.
+
+    SQL Server statements are cancelled on their pyodbc cursor, which sends an
+    attention to the server, so the server stops working on the statement instead
+    of running it to completion. DuckDB statements are interrupted on the connection.
+    """
+
+    def __init__(self, connection, timeout: Optional[int] = None):
+        self.connection = connection
+        self.timeout = timeout
+        self.started = time.perf_counter()
+        self.cursor = None
+        self.reason = None
+        self._lock = threading.Lock()
+
+    def on_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """before_cursor_execute listener that keeps the DBAPI cursor the statement runs on."""
+        self.cursor = cursor
+
+    def cancel(self, reason: str) -> bool:
+        """Cancel the statement on the database. Returns False if it was already cancelled."""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+        try:
+            if self.connection.dialect.name == 'duckdb':
+                self.connection.connection.driver_connection.interrupt()
+            elif self.cursor is not None:
+                self.cursor.cancel()
+        except Exception as e:
+            logger.warning(f"Could not cancel the running statement: {e}")
+        return True
+
+    def close_cursor(self) -> None:
+        if self.cursor is None:
+            return
+        try:
+            self.cursor.close()
+        except Exception as e:
+            logger.debug(f"Could not close the cursor of the cancelled statement: {e}")
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class StatementTracker:
+    """
+    Process-wide registry of running statements.
+
+    Statements are registered for as long as their result is being fetched, so a
+    statement timeout or Ctrl-C cancels them on the server, whichever thread they run on.
+    """
+
+    def __init__(self):
+        self._statements = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, connection, timeout: Optional[int] = None, profile: Optional[RunProfile] = None):
+        """
+        Register the statement run on `connection` within the block.
+
+        With a timeout, the statement is cancelled once it has been running for that many
+        seconds. A cancelled statement is counted in the profile, next to the rows it
+        fetched before it was cancelled.
+
+        Raises:
+            SQLQueryError: If the statement was cancelled for exceeding its timeout
+            KeyboardInterrupt: If the statement was cancelled by Ctrl-C
+        """
+        # Imported here, so tasks can install cancel_on_interrupt without loading SQLAlchemy
+        from sqlalchemy import event
+
+        profile = profile or RunProfile()
+        statement = RunningStatement(connection, timeout)
+        event.listen(connection, 'before_cursor_execute', statement.on_cursor_execute)
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, statement.cancel, args=('timed_out',))
+            timer.daemon = True
+            timer.start()
+        with self._lock:
+            self._statements.add(statement)
+        try:
+            yield statement
+        except BaseException:
+            if statement.reason is None:
+                raise
+            # The driver error of a cancelled statement is replaced below
+        else:
+            return
+        finally:
+            if timer is not None:
+                timer.cancel()
+            with self._lock:
+                self._statements.discard(statement)
+            event.remove(connection, 'before_cursor_execute', statement.on_cursor_execute)
+
+        statement.close_cursor()
+        profile.count(f"statements_{statement.reason}", 1)
+        profile.add('cancelled_statement', statement.elapsed)
+        logger.warning(f"Statement {statement.reason.replace('_', ' ')} after {statement.elapsed:.1f}s, cancelled on the server")
+        if statement.reason == 'interrupted':
+            raise KeyboardInterrupt
+        if statement.reason == 'abandoned':
+            raise SQLQueryError("Query cancelled because another statement of the same run failed")
+        raise SQLQueryError(f"Query cancelled after exceeding its timeout of {statement.timeout}s")
+
+    def cancel_all(self, reason: str = 'interrupted', connections=None) -> int:
+        """
+        Cancel every running statement, or only those running on `connections`.
+        Returns the number of statements cancelled.
+        """
+        with self._lock:
+            statements = [
+                statement for statement in self._statements
+                if connections is None or statement.connection in connections
+            ]
+        return sum(statement.cancel(reason) for statement in statements)
+
+
+statement_tracker = StatementTracker()
+
+
+class StatementGroup:
+    """
+    Connections that run the statements of one piece of work concurrently, such as the
+    key ranges of a partitioned query, so they can be abandoned together.
+
+    Once the group is abandoned, the statements running on its connections are cancelled
+    on the server and connections joining it later are refused.
+    """
+
+    def __init__(self):
+        self._connections = set()
+        self._abandoned = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def member(self, connection):
+        """
+        Add a connection to the group within the block.
+
+        Raises:
+            SQLQueryError: If the group has already been abandoned
+        """
+        with self._lock:
+            if self._abandoned:
+                raise SQLQueryError("Query not started because another statement of the same run failed")
+            self._connections.add(connection)
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                self._connections.discard(connection)
+
+    def abandon(self) -> int:
+        """Cancel the statements running on the group's connections. Returns the number cancelled."""
+        with self._lock:
+            self._abandoned = True
+            connections = set(self._connections)
+        return statement_tracker.cancel_all('abandoned', connections)
+
+
+@contextmanager
+def cancel_on_interrupt():
+    """
+    Cancel every running statement on the server when Ctrl-C is pressed within the block.
+
+    Without this, an interrupted run leaves its statements running on the server until
+    their connections are closed, and worker threads keep fetching until they finish.
+    Only the main thread can install signal handlers; elsewhere the block runs unchanged.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def interrupt(signum, frame):
+        cancelled = statement_tracker.cancel_all('interrupted')
+        if cancelled:
+            logger.warning(f"Interrupted, cancelling {cancelled} running statement(s)")
+        raise KeyboardInterrupt
+
+    previous = signal.signal(signal.SIGINT, interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def run_interruptibly(function: Callable, *args):
+    """
+    Run function on a worker thread and return its result, while the main thread waits.
+
+    Python runs signal handlers on the main thread only, between bytecodes, so Ctrl-C is not
+    handled while the main thread is blocked in a driver call such as pyodbc's execute or
+    fetchmany. Waiting in short timeouts instead lets cancel_on_interrupt cancel the running
+    statements on the server. The worker is a daemon thread, so a worker still waiting
+    for input at a prompt does not keep the process alive after Ctrl-C.
+    Only the main thread receives signals; elsewhere function runs directly.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return function(*args)
+
+    outcome = {}
+    done = threading.Event()
+
+    def work():
+        try:
+            outcome['result'] = function(*args)
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=work, name="flexquery-main", daemon=True).start()
+    try:
+        while not done.wait(INTERRUPT_POLL_SECONDS):
+            pass
+    except KeyboardInterrupt:
+        # The statements were cancelled: let the worker release its connection and output files
+        done.wait(INTERRUPT_GRACE_SECONDS)
+        raise
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
@@ -1,15 +1,95 @@
-import pyodbc
+import atexit
+import threading
+from contextlib import contextmanager
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from urllib.parse import quote_plus
 
-from flexquery.config.exceptions import DatabaseConnectionError
+from flexquery.config.constants import POOL_MAX_OVERFLOW
+from flexquery.config.exceptions import ConfigurationError, DatabaseConnectionError
 
 from flexquery.config.logging_config import  get_logger
 logger = get_logger(__name__)
 
+# Pool sizing options only a QueuePool accepts
+_QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow')
+
+
+class EngineRegistry:
+    """
+    Process-wide registry of SQLAlchemy engines, one per environment and connection settings.
+
+    Engines are created on first use and kept until the process exits, so every
+    execution in the same process checks connections out of the same pool instead of
+    opening a new one.
+    """
+
+    def __init__(self):
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def get(self, env: str, connection_string: str, **pool_options):
+        """
+        Return the engine for an environment, creating it on first use.
+
+        pool_size and max_overflow only apply to a QueuePool. They are dropped for
+        dialects that use another pool, such as the SingletonThreadPool of in-memory
+        DuckDB and SQLite databases, which would reject them.
+
+        Returns:
+            Tuple[Engine, bool]: The engine and whether it was created by this call
+        """
+        key = (env, connection_string, tuple(sorted(pool_options.items())))
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                return engine, False
+            if not self._uses_queue_pool(connection_string):
+                pool_options = {name: value for name, value in pool_options.items() if name not in _QUEUE_POOL_OPTIONS}
+            engine = create_engine(connection_string, **pool_options)
+            self._engines[key] = engine
+            return engine, True
+
+    @staticmethod
+    def _uses_queue_pool(connection_string: str) -> bool:
+        url = make_url(connection_string)
+        return issubclass(url.get_dialect().get_pool_class(url), QueuePool)
+
+    def dispose_all(self):
+        """Close every pooled connection of every engine."""
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+        if engines:
+            logger.debug(f"Disposed {len(engines)} database engine(s)")
+
+
+engine_registry = EngineRegistry()
+atexit.register(engine_registry.dispose_all)
+
+
 class BaseConnectionManager:
     def __init__(self, config):
         self.config = config
+        self.engine = None
+        self.connection = None
+
+    def _get_engine(self, connection_string):
+        """Get the pooled engine for this environment from the registry."""
+        self.engine, created = engine_registry.get(
+            self.config.env,
+            connection_string,
+            pool_size=self.config.pool_size,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_recycle=self.config.pool_recycle,
+            pool_pre_ping=self.config.pool_pre_ping,
+        )
+        if not created:
+            logger.debug(f"Reusing pooled {self.config.db_type} engine for environment {self.config.env}")
+        return created
 
     def connect(self):
         """Create and return a connection to the database using the engine."""
@@ -21,16 +101,30 @@ class BaseConnectionManager:
         except Exception as e:
             raise DatabaseConnectionError(f"Database connection failed: {e}") from e
 
+    @contextmanager
+    def checkout(self):
+        """
+        Check a connection out of the engine's pool for the duration of the block.
+
+        Connections are opened lazily, so the first checkout is also the connection test.
+        """
+        logger.debug(f"Checking out {self.config.db_type} connection")
+        try:
+            connection = self.engine.connect()
+        except Exception as e:
+            raise DatabaseConnectionError(f"Database connection failed: {e}") from e
+        try:
+            yield connection
+        finally:
+            connection.close()
+
     def close(self):
-        """Close the database connection."""
+        """Close the database connection. The engine and its pool stay in the registry for reuse."""
         if self.connection:
             self.connection.close()
             logger.debug("Database connection closed")
             self.connection = None
-        if self.engine:
-            self.engine.dispose()
-            logger.debug("Database engine disposed")
-            self.engine = None
+        self.engine = None
 
     def validate_connection(self):
         """Validate that an existing connection is still working."""
@@ -58,8 +152,8 @@ class DuckDBConnectionManager(BaseConnectionManager):
         """Create a SQLAlchemy engine for DuckDB."""
         try:
             connection_string = f"duckdb:///{self.config.db_path}"
-            self.engine = create_engine(connection_string, pool_pre_ping=True)
-            logger.info("DuckDB engine created successfully")
+            if self._get_engine(connection_string):
+                logger.info("DuckDB engine created successfully")
         except Exception as e:
             raise DatabaseConnectionError(f"Failed to create DuckDB engine: {e}")
         
@@ -69,15 +163,6 @@ class MSSQLConnectionManager(BaseConnectionManager):
         """Return the application intent (ReadOnly or ReadWrite)."""
         return self.config.application_intent or "ReadOnly"
 
-    def test_connection(self, conn_str):
-        """Test the MSSQL connection."""
-        try:
-            test_conn = pyodbc.connect(conn_str, timeout=5)
-            test_conn.close()
-            logger.info("MSSQL connection test successful")
-        except Exception as e:
-            raise DatabaseConnectionError(f"MSSQL connection test failed: {e}")
-        
 
 class MSSQLWindowsAuthConnectionManager(MSSQLConnectionManager):
     def create_engine(self):
@@ -92,15 +177,8 @@ class MSSQLWindowsAuthConnectionManager(MSSQLConnectionManager):
                 f"connect_timeout=30&"
                 f"timeout=30"
             )
-            self.test_connection(
-                f"DRIVER={{SQL Server}};"
-                f"SERVER={self.config.server};"
-                f"DATABASE={self.config.database};"
-                f"Trusted_Connection=yes;"
-                f"ApplicationIntent={self._application_intent()};"
-            )
-            self.engine = create_engine(connection_string, pool_pre_ping=True)
-            logger.info("MSSQL engine with Windows Authentication created successfully")
+            if self._get_engine(connection_string):
+                logger.info("MSSQL engine with Windows Authentication created successfully")
         except Exception as e:
             raise DatabaseConnectionError(f"Failed to create MSSQL engine: {e}")
         
@@ -120,21 +198,18 @@ class MSSQLUsernamePasswordConnectionManager(MSSQLConnectionManager):
                 f"connect_timeout=30&"
                 f"timeout=30"
             )
-            self.test_connection(
-                f"DRIVER={{SQL Server}};"
-                f"SERVER={self.config.server};"
-                f"DATABASE={self.config.database};"
-                f"UID={self.config.username};"
-                f"PWD={self.config.password};"
-                f"ApplicationIntent={self._application_intent()};"
-            )
-            self.engine = create_engine(connection_string, pool_pre_ping=True)
-            logger.info("MSSQL engine with username/password created successfully")
+            if self._get_engine(connection_string):
+                logger.info("MSSQL engine with username/password created successfully")
         except Exception as e:
             raise DatabaseConnectionError(f"Failed to create MSSQL engine: {e}")
 
 
-
-
-
-
+def create_connection_manager(config) -> BaseConnectionManager:
+    """Pick the connection manager for the configured database type and authentication."""
+    if config.db_type == "duckdb":
+        return DuckDBConnectionManager(config)
+    if config.db_type == "mssql" and config.win_auth:
+        return MSSQLWindowsAuthConnectionManager(config)
+    if config.db_type == "mssql":
+        return MSSQLUsernamePasswordConnectionManager(config)
+    raise ConfigurationError(f"Unsupported database type: {config.db_type}")
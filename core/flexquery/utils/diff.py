@@ -0,0 +1,289 @@
+import decimal
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from flexquery.config.exceptions import DataProcessorError
+
+
+class ResultHashes:
+    """
+    Row hashes of one side of a diff, built chunk by chunk.
+
+    Only two 64-bit hashes per row are kept: the hash of the key columns (or of the
+    whole row without key columns) and the hash of the whole row, so memory stays at
+    16 bytes per row however wide the result is.
+    """
+
+    def __init__(self, key_columns: Optional[List[str]] = None):
+        self.key_columns = list(key_columns or [])
+        self.columns = None
+        self.rows = 0
+        self._key_hashes = []
+        self._row_hashes = []
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        """Hash the rows of a result chunk."""
+        if self.columns is None:
+            self.columns = sorted(chunk.columns)
+            missing = [column for column in self.key_columns if column not in chunk.columns]
+            if missing:
+                raise DataProcessorError(f"Key columns not found in the query result: {', '.join(missing)}")
+        row_hashes = hash_rows(chunk, self.columns)
+        self._row_hashes.append(row_hashes)
+        if self.key_columns:
+            self._key_hashes.append(hash_rows(chunk, self.key_columns))
+        self.rows += len(chunk)
+
+    @property
+    def row_hashes(self) -> np.ndarray:
+        return _concatenate(self._row_hashes)
+
+    @property
+    def key_hashes(self) -> np.ndarray:
+        return _concatenate(self._key_hashes) if self.key_columns else self.row_hashes
+
+
+class DiffResult:
+    """Counts and sample rows of the differences between two query results."""
+
+    def __init__(self, left_env: str, right_env: str, left_rows: int, right_rows: int):
+        self.left_env = left_env
+        self.right_env = right_env
+        self.left_rows = left_rows
+        self.right_rows = right_rows
+        self.added = 0       # rows only in the right result
+        self.removed = 0     # rows only in the left result
+        self.changed = 0     # keys in both results with different values
+        self.unchanged = 0
+        self.added_sample = None
+        self.removed_sample = None
+        self.changed_sample = None
+
+    @property
+    def identical(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+class DiffPlan:
+    """The hashes that differ between two results, and the ones to fetch sample rows for."""
+
+    def __init__(self, result: DiffResult, added: np.ndarray, removed: np.ndarray, changed: np.ndarray):
+        self.result = result
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+
+def hash_rows(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Hash each row of a DataFrame over the given columns, in a vectorized way.
+
+    Values are brought to a canonical form first, so equal values hash the same
+    whatever dtype the driver or the chunk produced them in: an integer column that
+    comes back as float in a chunk with nulls, datetimes of different resolutions,
+    Decimals and floats, or Python and Arrow-backed strings. Numbers are never
+    rounded to float64 on the way, so distinct integers beyond 2**53 and Decimals
+    with more digits than a float holds still hash differently.
+    """
+    canonical = pd.DataFrame({position: _canonical_column(df[column]) for position, column in enumerate(columns)})
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+def _canonical_column(column: pd.Series) -> pd.Series:
+    """The hash of each value of a column; NULLs hash the same in columns of any dtype."""
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        column = column.astype(object)
+        dtype = column.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        return _number_hashes(column)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return _datetime_values(column)
+    if pd.api.types.is_object_dtype(dtype):
+        inferred = pd.api.types.infer_dtype(column, skipna=True)
+        if inferred in ('integer', 'floating', 'mixed-integer-float', 'decimal', 'boolean'):
+            return _number_hashes(column)
+        if inferred in ('datetime', 'datetime64', 'date'):
+            return _datetime_values(pd.to_datetime(column, utc=True))
+    values = column.astype(object).where(column.notna(), None).to_numpy()
+    return pd.Series(pd.util.hash_array(values), index=column.index)
+
+def _number_hashes(column: pd.Series) -> pd.Series:
+    """
+    Hash a column of numbers so that equal numbers hash the same whatever their type.
+
+    Integer-valued numbers that fit in int64 are hashed as int64, whether they are
+    integers, floats or Decimals. Other floats are hashed as float64. Other Decimals
+    are hashed as the float they print as when that float is exactly their value, and
+    by their exact normalized text otherwise.
+    """
+    dtype = column.dtype
+    nulls = column.isna().to_numpy()
+    hashes = np.full(len(column), _NULL_HASH, dtype=np.uint64)
+    if pd.api.types.is_bool_dtype(dtype) and dtype != object:
+        values = column.to_numpy(dtype='int64', na_value=0)
+        hashes[~nulls] = _hash_integers(values[~nulls])
+    elif pd.api.types.is_signed_integer_dtype(dtype) or (pd.api.types.is_unsigned_integer_dtype(dtype) and dtype.itemsize < 8):
+        values = column.to_numpy(dtype='int64', na_value=0)
+        hashes[~nulls] = _hash_integers(values[~nulls])
+    elif pd.api.types.is_float_dtype(dtype) and not isinstance(dtype, pd.ArrowDtype):
+        values = column.to_numpy(dtype='float64', na_value=np.nan)
+        hashes[~nulls] = _hash_floats(values[~nulls])
+    else:
+        # Decimals, Python numbers of mixed types, uint64 and Arrow-backed numbers are
+        # brought to their canonical form once per distinct value. Values are told apart
+        # by their text, which is much faster to hash than Decimals are
+        values = column.astype(object).to_numpy()
+        codes, uniques = pd.factorize(column.astype(str).where(~nulls, None), use_na_sentinel=True)
+        present = codes >= 0
+        positions = np.flatnonzero(present)
+        first = np.empty(len(uniques), dtype=np.int64)
+        first[codes[positions[::-1]]] = positions[::-1]
+        keys = [_number_key(value) for value in values[first]]
+        unique_hashes = np.empty(len(keys), dtype=np.uint64)
+        for kind, hasher in ((int, _hash_integers), (float, _hash_floats), (str, _hash_text)):
+            positions = [i for i, key in enumerate(keys) if type(key) is kind]
+            if positions:
+                values = [keys[i] for i in positions]
+                unique_hashes[positions] = hasher(np.array(values, dtype=object if kind is str else kind))
+        hashes[present] = unique_hashes[codes[present]]
+    return pd.Series(hashes, index=column.index)
+
+def _number_key(value):
+    """The canonical form of one number: an int within int64, a float, or exact decimal text."""
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            return float(value)
+        if value == value.to_integral_value():
+            value = int(value)
+        else:
+            as_float = float(value)
+            return as_float if decimal.Decimal(repr(as_float)) == value else str(value.normalize())
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if not value.is_integer() or abs(value) >= 2 ** 63:
+            return value
+    value = int(value)
+    if -2 ** 63 <= value < 2 ** 63:
+        return value
+    return float(value) if float(value) == value else str(value)
+
+def _hash_integers(values: np.ndarray) -> np.ndarray:
+    return pd.util.hash_array(values.astype('int64'))
+
+def _hash_floats(values: np.ndarray) -> np.ndarray:
+    """Integer-valued floats hash as integers; the others are tagged apart from integer hashes."""
+    values = values.astype('float64')
+    integral = np.isfinite(values) & (np.trunc(values) == values) & (np.abs(values) < 2.0 ** 63)
+    hashes = np.empty(len(values), dtype=np.uint64)
+    hashes[integral] = _hash_integers(values[integral])
+    hashes[~integral] = pd.util.hash_array(values[~integral]) ^ _FLOAT_TAG
+    return hashes
+
+def _hash_text(values: np.ndarray) -> np.ndarray:
+    return pd.util.hash_array(values) ^ _TEXT_TAG
+
+_NULL_HASH = pd.util.hash_array(np.array([None], dtype=object))[0]
+_FLOAT_TAG = np.uint64(0x9E3779B97F4A7C15)
+_TEXT_TAG = np.uint64(0xC2B2AE3D27D4EB4F)
+
+def _datetime_values(column: pd.Series) -> pd.Series:
+    if column.dt.tz is not None:
+        column = column.dt.tz_convert('UTC').dt.tz_localize(None)
+    nulls = column.isna().to_numpy()
+    hashes = pd.util.hash_array(column.to_numpy('datetime64[ns]').view('int64'))
+    hashes[nulls] = _NULL_HASH
+    return pd.Series(hashes, index=column.index)
+
+def _concatenate(arrays: list) -> np.ndarray:
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.uint64)
+
+
+def compare_hashes(left: ResultHashes, right: ResultHashes, left_env: str, right_env: str) -> DiffPlan:
+    """
+    Compare the row hashes of two results.
+
+    With key columns, rows are matched by key: keys on one side only are added or
+    removed rows, and matched keys whose row hashes differ are changed rows. Without
+    key columns, the results are compared as multisets of rows, so a changed row
+    shows up as one removed and one added row.
+
+    Raises:
+        DataProcessorError: If the results have different columns, or the key columns
+            do not identify rows uniquely
+    """
+    if left.columns is not None and right.columns is not None and left.columns != right.columns:
+        only_left = [column for column in left.columns if column not in right.columns]
+        only_right = [column for column in right.columns if column not in left.columns]
+        raise DataProcessorError(
+            f"The results have different columns (only in {left_env}: {', '.join(only_left) or '-'}; "
+            f"only in {right_env}: {', '.join(only_right) or '-'})"
+        )
+
+    result = DiffResult(left_env, right_env, left.rows, right.rows)
+    if left.key_columns:
+        left_rows = _keyed_hashes(left, left_env)
+        right_rows = _keyed_hashes(right, right_env)
+        added = right_rows.index.difference(left_rows.index, sort=False)
+        removed = left_rows.index.difference(right_rows.index, sort=False)
+        common = left_rows.index.intersection(right_rows.index, sort=False)
+        differs = left_rows.reindex(common).to_numpy() != right_rows.reindex(common).to_numpy()
+        changed = common[differs]
+        result.added, result.removed, result.changed = len(added), len(removed), len(changed)
+        result.unchanged = len(common) - len(changed)
+        return DiffPlan(result, added.to_numpy(), removed.to_numpy(), changed.to_numpy())
+
+    left_counts = pd.Series(left.row_hashes).value_counts()
+    right_counts = pd.Series(right.row_hashes).value_counts()
+    left_counts, right_counts = left_counts.align(right_counts, fill_value=0)
+    delta = right_counts - left_counts
+    result.added = int(delta[delta > 0].sum())
+    result.removed = int(-delta[delta < 0].sum())
+    result.unchanged = int(np.minimum(left_counts, right_counts).sum())
+    return DiffPlan(result, delta.index[delta > 0].to_numpy(), delta.index[delta < 0].to_numpy(), np.empty(0, dtype=np.uint64))
+
+def _keyed_hashes(hashes: ResultHashes, env: str) -> pd.Series:
+    rows = pd.Series(hashes.row_hashes, index=pd.Index(hashes.key_hashes))
+    if not rows.index.is_unique:
+        duplicates = int(rows.index.duplicated().sum())
+        raise DataProcessorError(
+            f"Key columns {', '.join(hashes.key_columns)} do not identify rows uniquely in {env}: {duplicates} duplicate keys"
+        )
+    return rows
+
+
+def sample_rows(chunks: Iterable[pd.DataFrame], key_columns: List[str], wanted: np.ndarray, limit: int) -> pd.DataFrame:
+    """
+    Collect up to `limit` rows whose key hash (or row hash, without key columns) is in `wanted`.
+
+    Stops reading the result as soon as enough rows are found.
+    """
+    samples = []
+    found = 0
+    for chunk in chunks:
+        columns = key_columns or sorted(chunk.columns)
+        matches = chunk[np.isin(hash_rows(chunk, columns), wanted)]
+        if len(matches):
+            samples.append(matches.head(limit - found))
+            found += len(samples[-1])
+        if found >= limit:
+            break
+    return pd.concat(samples, ignore_index=True) if samples else None
+
+def changed_columns(left: pd.DataFrame, right: pd.DataFrame, key_columns: List[str], left_env: str, right_env: str) -> pd.DataFrame:
+    """
+    Put the two sides of changed rows next to each other, matched by key.
+
+    Only the key columns and the columns whose values differ in the sample are kept.
+    """
+    merged = left.merge(right, on=key_columns, suffixes=(f"_{left_env}", f"_{right_env}"))
+    columns = list(key_columns)
+    for column in left.columns:
+        if column in key_columns:
+            continue
+        left_column, right_column = merged[f"{column}_{left_env}"], merged[f"{column}_{right_env}"]
+        both_null = left_column.isna() & right_column.isna()
+        if not ((left_column == right_column) | both_null).all():
+            columns.extend([left_column.name, right_column.name])
+    return merged[columns]
@@ -0,0 +1,114 @@
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from flexquery.config.constants import DEFAULT_CATEGORY_THRESHOLD
+from flexquery.config.logging_config import get_logger
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def optimize_dtypes(df: pd.DataFrame, category_threshold: float = DEFAULT_CATEGORY_THRESHOLD) -> pd.DataFrame:
+    """
+    Shrink the in-memory representation of a query result without changing its values.
+
+    - Integer columns are downcast to the smallest integer type that holds them
+    - String columns with few distinct values become categoricals; the Parquet writer
+      stores them dictionary encoded
+    - Other string columns use Arrow-backed strings when pyarrow is installed
+
+    Args:
+        df (pd.DataFrame): Query result to optimize
+        category_threshold (float): Maximum ratio of distinct values to rows for a
+            string column to become a categorical
+    Returns:
+        pd.DataFrame: A frame with the same values and smaller dtypes
+    """
+    columns = {}
+    for position, (name, column) in enumerate(df.items()):
+        converted = _optimize_column(column, category_threshold)
+        if converted is not column:
+            columns[position] = converted
+
+    if not columns:
+        return df
+    optimized = df.copy(deep=False)
+    for position, converted in columns.items():
+        optimized.isetitem(position, converted)
+    return optimized
+
+def _optimize_column(column: pd.Series, category_threshold: float) -> pd.Series:
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return column
+    if pd.api.types.is_integer_dtype(column.dtype) and isinstance(column.dtype, np.dtype):
+        return pd.to_numeric(column, downcast='integer')
+    if _is_string_column(column):
+        non_null = column.count()
+        if non_null and column.nunique(dropna=True) <= category_threshold * non_null:
+            return column.astype('category')
+        if pa is not None and _is_python_string_dtype(column.dtype):
+            return column.astype(pd.ArrowDtype(pa.string()))
+    return column
+
+def _is_string_column(column: pd.Series) -> bool:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return False
+    if pd.api.types.is_string_dtype(column.dtype) and not pd.api.types.is_object_dtype(column.dtype):
+        return True
+    return pd.api.types.is_object_dtype(column.dtype) and pd.api.types.infer_dtype(column, skipna=True) == 'string'
+
+def _is_python_string_dtype(dtype) -> bool:
+    """Strings stored as Python objects, as opposed to strings already held in Arrow arrays."""
+    return pd.api.types.is_object_dtype(dtype) or getattr(dtype, 'storage', None) == 'python'
+
+def stable_dtypes(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Keep the dtype of each column the same in every chunk of a streamed result.
+
+    Without this, a column's dtype depends on the rows of each chunk: an integer column
+    is int64 in a chunk without NULLs and float64 in a chunk with one, so a single output
+    file would switch from 100 to 101.0 partway through. Integer and boolean columns
+    become nullable (Int64, boolean), and a column whose dtype differs from the one the
+    earlier chunks established is cast to it. A column gets its dtype from the first
+    chunk in which it is not entirely NULL.
+    """
+    established = {}
+    for chunk in chunks:
+        converted = {}
+        for position, (name, column) in enumerate(chunk.items()):
+            target = nullable_dtype(column.dtype)
+            known = established.get(name)
+            if known is None:
+                if column.notna().any():
+                    established[name] = target
+            else:
+                target = known
+            if target != column.dtype:
+                try:
+                    converted[position] = column.astype(target)
+                except (TypeError, ValueError, OverflowError):
+                    pass  # e.g. fractional floats in a column the earlier chunks had as integers
+        if converted:
+            chunk = chunk.copy(deep=False)
+            for position, column in converted.items():
+                chunk.isetitem(position, column)
+        yield chunk
+
+def nullable_dtype(dtype):
+    """The nullable extension dtype of a NumPy integer or boolean dtype, else the dtype itself."""
+    if not isinstance(dtype, np.dtype):
+        return dtype
+    if dtype.kind in 'iu':
+        return pd.api.types.pandas_dtype(dtype.name.replace('uint', 'UInt').replace('int', 'Int'))
+    if dtype.kind == 'b':
+        return pd.BooleanDtype()
+    return dtype
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Deep memory usage of a DataFrame in bytes, including the contents of object columns."""
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,127 @@
+import json
+import xml.etree.ElementTree as ET
+from typing import Optional
+
+from sqlalchemy import text
+
+from flexquery.config.exceptions import SQLQueryError
+from flexquery.config.logging_config import get_logger
+logger = get_logger(__name__)
+
+SHOWPLAN_NAMESPACE = '{http://schemas.microsoft.com/sqlserver/2004/07/showplan}'
+
+
+class PlanEstimate:
+    """
+    The optimizer's estimate for a query, read from its estimated plan without running it.
+
+    For SQL Server the cost is the estimated subtree cost of the statements, in the
+    optimizer's cost units. DuckDB does not expose a cost, so its cost is the total
+    number of rows the plan's operators are estimated to process.
+    """
+
+    def __init__(self, rows: Optional[float], cost: Optional[float], plan: str):
+        self.rows = rows
+        self.cost = cost
+        self.plan = plan
+
+    def exceeds(self, max_rows=None, max_cost=None) -> list:
+        """Descriptions of the thresholds this estimate exceeds, empty if it is within all of them."""
+        exceeded = []
+        if max_rows is not None and self.rows is not None and self.rows > max_rows:
+            exceeded.append(f"estimated rows {self.rows:,.0f} > max_estimated_rows {max_rows:,}")
+        if max_cost is not None and self.cost is not None and self.cost > max_cost:
+            exceeded.append(f"estimated cost {self.cost:,.2f} > max_estimated_cost {max_cost:,}")
+        return exceeded
+
+    def __str__(self):
+        rows = f"{self.rows:,.0f}" if self.rows is not None else "unknown"
+        cost = f"{self.cost:,.2f}" if self.cost is not None else "unknown"
+        return f"estimated rows {rows}, estimated cost {cost}"
+
+
+def explain_query(connection, db_type: str, query: str, parameters: dict) -> PlanEstimate:
+    """
+    Fetch the estimated plan of a query with its bound parameters, without executing it.
+
+    Args:
+        connection: SQLAlchemy connection to the database
+        db_type (str): 'duckdb' or 'mssql'
+        query (str): The rendered SQL text
+        parameters (dict): The bind parameter values
+    Returns:
+        PlanEstimate: The estimated rows and cost
+    Raises:
+        SQLQueryError: If the plan cannot be fetched or read
+    """
+    try:
+        if db_type == 'mssql':
+            return _explain_mssql(connection, query, parameters)
+        return _explain_duckdb(connection, query, parameters)
+    except SQLQueryError:
+        raise
+    except Exception as e:
+        raise SQLQueryError(f"Error fetching the estimated plan: {e}") from None
+
+
+def _explain_duckdb(connection, query: str, parameters: dict) -> PlanEstimate:
+    rows = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}").bindparams(**parameters)).fetchall()
+    plan = rows[0][1]
+    roots = json.loads(plan)
+    if not roots:
+        raise SQLQueryError("DuckDB returned an empty plan")
+
+    # Operators such as ORDER BY and LIMIT report no (or a zero) cardinality, so the
+    # estimate is taken from the topmost operator that reports one
+    estimate = None
+    node = roots[0]
+    while node is not None:
+        cardinality = _cardinality(node)
+        if cardinality:
+            estimate = cardinality
+            break
+        if cardinality is not None and estimate is None:
+            estimate = cardinality
+        node = node['children'][0] if node.get('children') else None
+
+    processed = sum(_cardinality(node) or 0 for node in _walk(roots))
+    return PlanEstimate(estimate, processed, plan)
+
+def _cardinality(node: dict) -> Optional[float]:
+    value = (node.get('extra_info') or {}).get('Estimated Cardinality')
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _walk(nodes):
+    for node in nodes:
+        yield node
+        yield from _walk(node.get('children') or [])
+
+
+def _explain_mssql(connection, query: str, parameters: dict) -> PlanEstimate:
+    # SHOWPLAN_XML must be set in a batch of its own; while it is on, statements
+    # return their plan as XML instead of being executed
+    connection.exec_driver_sql("SET SHOWPLAN_XML ON")
+    try:
+        result = connection.execute(text(query).bindparams(**parameters))
+        cursor = result.cursor
+        plans = []
+        while True:
+            plans.extend(row[0] for row in cursor.fetchall())
+            if not cursor.nextset():
+                break
+    finally:
+        connection.exec_driver_sql("SET SHOWPLAN_XML OFF")
+    if not plans:
+        raise SQLQueryError("SQL Server returned no estimated plan")
+
+    rows, cost = None, 0.0
+    for plan in plans:
+        for statement in ET.fromstring(plan).iter(f"{SHOWPLAN_NAMESPACE}StmtSimple"):
+            cost += float(statement.get('StatementSubTreeCost', 0))
+            if statement.get('StatementEstRows') is not None:
+                # The rows of the last statement, the one that returns the result
+                rows = float(statement.get('StatementEstRows'))
+    return PlanEstimate(rows, cost, "\n".join(plans))
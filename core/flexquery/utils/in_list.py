@@ -0,0 +1,153 @@
+import datetime
+import decimal
+import json
+from typing import Tuple
+
+from flexquery.config.constants import IN_LIST_EXPAND_LIMIT, MSSQL_MAX_BIND_PARAMETERS
+from flexquery.config.exceptions import ConfigurationError
+
+
+class InListStrategy:
+    """
+    Binds a list parameter used as IN :param.
+
+    bind() returns the SQL that replaces "IN :param" and the bind parameter values it needs.
+    """
+
+    name = None
+    db_types = None  # database types the strategy works on, None for all
+
+    def bind(self, param: str, values: list) -> Tuple[str, dict]:
+        raise NotImplementedError("Subclasses must implement this method")
+
+
+class ExpandInList(InListStrategy):
+    """One bind parameter per item: IN (:param_0, :param_1, ...). Best for short lists."""
+
+    name = 'expand'
+
+    def bind(self, param, values):
+        binds = {f"{param}_{i}": item for i, item in enumerate(values)}
+        placeholders = ', '.join(f":{name}" for name in binds)
+        return f"IN ({placeholders})", binds
+
+
+class JsonInList(InListStrategy):
+    """
+    The whole list as a single JSON array parameter, unpacked server-side with OPENJSON.
+
+    Values are cast to a type inferred from the list so comparisons against indexed
+    columns stay sargable. Dates and datetimes are sent as ISO 8601 strings and
+    Decimals as their exact digits. Requires SQL Server 2016 or later (compatibility
+    level 130).
+    """
+
+    name = 'json'
+    db_types = ['mssql']
+
+    def bind(self, param, values):
+        sql_type = self._sql_server_type(values)
+        return f"IN (SELECT CAST([value] AS {sql_type}) FROM OPENJSON(:{param}))", {param: json.dumps(values, default=_json_value)}
+
+    @staticmethod
+    def _sql_server_type(values: list) -> str:
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, bool) for value in present):
+            return 'BIT'
+        if present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+            return 'BIGINT'
+        if present and all(isinstance(value, (int, decimal.Decimal)) and not isinstance(value, bool) for value in present):
+            decimal_type = _decimal_type(present)
+            if decimal_type:
+                return decimal_type
+        if present and all(isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool) for value in present):
+            return 'FLOAT'
+        if present and all(isinstance(value, datetime.datetime) for value in present):
+            # OPENJSON returns the ISO strings unchanged; DATETIMEOFFSET keeps their UTC offset
+            if any(value.tzinfo is not None for value in present):
+                return 'DATETIMEOFFSET'
+            return 'DATETIME2'
+        if present and all(isinstance(value, datetime.date) and not isinstance(value, datetime.datetime) for value in present):
+            return 'DATE'
+        if present and all(isinstance(value, str) for value in present):
+            length = max(len(value) for value in present) or 1
+            if all(value.isascii() for value in present):
+                return f"VARCHAR({length})" if length <= 8000 else 'VARCHAR(MAX)'
+            return f"NVARCHAR({length})" if length <= 4000 else 'NVARCHAR(MAX)'
+        return 'NVARCHAR(MAX)'
+
+
+def _json_value(value):
+    """json.dumps default for the list values JSON has no type for."""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        # Plain notation: SQL Server does not cast exponent notation such as 1E+3 to DECIMAL
+        return format(value, 'f')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decimal_type(values: list):
+    """DECIMAL(p,s) wide enough for every value exactly, None if SQL Server has no such type."""
+    digits, scale = 1, 0
+    for value in values:
+        value = decimal.Decimal(value)
+        if not value.is_finite():
+            return None
+        sign, value_digits, exponent = value.as_tuple()
+        scale = max(scale, -exponent)
+        digits = max(digits, len(value_digits) + exponent)
+    if digits + scale > 38:
+        return None
+    return f"DECIMAL({digits + scale},{scale})"
+
+
+class UnnestInList(InListStrategy):
+    """The whole list as a single LIST parameter, unpacked with UNNEST (DuckDB)."""
+
+    name = 'unnest'
+    db_types = ['duckdb']
+
+    def bind(self, param, values):
+        return f"IN (SELECT UNNEST(:{param}))", {param: list(values)}
+
+
+IN_LIST_STRATEGIES = {strategy.name: strategy for strategy in (ExpandInList(), JsonInList(), UnnestInList())}
+
+# Single-parameter strategy used by "auto" for lists too large to expand
+_LARGE_LIST_STRATEGY = {'mssql': 'json', 'duckdb': 'unnest'}
+
+
+def choose_in_list_strategies(db_type: str, lists: dict, preference: str = 'auto', reserved: int = 0) -> dict:
+    """
+    Choose how each list parameter is bound.
+
+    With preference "auto", lists of up to IN_LIST_EXPAND_LIMIT items are expanded into
+    individual bind parameters. Longer lists use the backend's single-parameter strategy.
+    On SQL Server the expanded lists must also stay within the 2100 bind parameter
+    limit, so the longest lists are switched first when the budget runs out.
+
+    Args:
+        db_type (str): Database type of the environment
+        lists (dict): Parameter names mapped to their list values
+        preference (str): "auto" or the name of a strategy to use for every list
+        reserved (int): Bind parameters already used by scalar parameters and by the query itself
+    Returns:
+        dict: Parameter names mapped to the InListStrategy to bind them with
+    """
+    if preference != 'auto':
+        strategy = IN_LIST_STRATEGIES[preference]
+        if strategy.db_types and db_type not in strategy.db_types:
+            raise ConfigurationError(f"in_list_strategy '{preference}' is not supported for {db_type} databases")
+        return {param: strategy for param in lists}
+
+    large = IN_LIST_STRATEGIES.get(_LARGE_LIST_STRATEGY.get(db_type), IN_LIST_STRATEGIES['expand'])
+    budget = MSSQL_MAX_BIND_PARAMETERS - reserved - len(lists) if db_type == 'mssql' else None
+    chosen = {}
+    # Shortest lists first, so the bind parameter budget goes to the lists that benefit most
+    for param, values in sorted(lists.items(), key=lambda item: len(item[1])):
+        expand = len(values) <= IN_LIST_EXPAND_LIMIT and (budget is None or len(values) <= budget)
+        chosen[param] = IN_LIST_STRATEGIES['expand'] if expand else large
+        if budget is not None and expand:
+            budget -= len(values) - 1
+    return chosen
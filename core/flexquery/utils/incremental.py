@@ -0,0 +1,181 @@
+import datetime
+import decimal
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from flexquery.config.exceptions import DataProcessorError
+from flexquery.config.logging_config import get_logger
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PART_PREFIX = 'part-'
+
+
+class WatermarkState:
+    """
+    The high-water mark of an incremental query, stored as <state_dir>/<env>/<query>.json.
+
+    The mark is only saved once the rows fetched up to it have been written, so a
+    failed run is fetched again in full by the next one.
+    """
+
+    def __init__(self, state_dir, env: str, query_name: str, column: str):
+        self.path = Path(state_dir) / env / f"{query_name}.json"
+        self.column = column
+
+    def load(self):
+        """The saved high-water mark, or None if the query has not run incrementally yet."""
+        try:
+            with open(self.path, 'r') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            raise DataProcessorError(f"Unreadable watermark state {self.path}: {e}") from None
+        if state.get('column') != self.column:
+            logger.warning(
+                f"Watermark column changed from {state.get('column')} to {self.column}, ignoring the saved watermark"
+            )
+            return None
+        return _decode(state['type'], state['value'])
+
+    def save(self, value) -> None:
+        """Save a new high-water mark, replacing the previous one atomically."""
+        kind, encoded = _encode(value)
+        state = {
+            'column': self.column,
+            'type': kind,
+            'value': encoded,
+            'updated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w') as file:
+            json.dump(state, file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _encode(value):
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return 'datetime', pd.Timestamp(value).isoformat()
+    if isinstance(value, datetime.date):
+        return 'date', value.isoformat()
+    if isinstance(value, (bool, np.bool_)):
+        raise DataProcessorError("A boolean column cannot be used as a watermark")
+    if isinstance(value, (int, np.integer)):
+        return 'int', int(value)
+    if isinstance(value, decimal.Decimal):
+        return 'decimal', str(value)
+    if isinstance(value, (float, np.floating)):
+        return 'float', float(value)
+    return 'str', str(value)
+
+def _decode(kind: str, value):
+    if kind == 'datetime':
+        return pd.Timestamp(value).to_pydatetime()
+    if kind == 'date':
+        return datetime.date.fromisoformat(value)
+    if kind == 'decimal':
+        return decimal.Decimal(value)
+    return value
+
+
+class WatermarkTracker:
+    """Passes result chunks through while keeping the highest value of the watermark column."""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.value = None
+
+    def track(self, data) -> Iterator[pd.DataFrame]:
+        """Yield the chunks of a result, a DataFrame or an iterable of DataFrames, updating the mark."""
+        for chunk in [data] if isinstance(data, pd.DataFrame) else data or ():
+            self.update(chunk)
+            yield chunk
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if chunk is None or chunk.empty:
+            return
+        if self.column not in chunk.columns:
+            raise DataProcessorError(f"Watermark column {self.column} is not in the query result")
+        chunk_max = chunk[self.column].max()
+        if pd.isna(chunk_max):
+            return
+        if self.value is None or chunk_max > self.value:
+            self.value = chunk_max
+
+
+def part_file_name() -> str:
+    """Name of a new part file of a dataset, sorting in the order the parts were written."""
+    return f"{PART_PREFIX}{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+def list_parts(dataset_dir) -> list:
+    return sorted(Path(dataset_dir).glob(f"{PART_PREFIX}*.parquet"))
+
+def compact_dataset(dataset_dir, row_group_size: int, compression: str) -> Optional[Path]:
+    """
+    Merge the part files of a dataset into a single file.
+
+    Parts are copied one row group at a time, so memory stays bounded by a row group.
+    The merged file is written under a temporary name and only replaces the parts once
+    it is complete.
+
+    Returns:
+        Path: The merged part file, or None if there was nothing to merge
+    """
+    if pq is None:
+        raise DataProcessorError("Incremental datasets require pyarrow: pip install flex_query[arrow]")
+    parts = list_parts(dataset_dir)
+    if len(parts) < 2:
+        return None
+
+    schema = pa.unify_schemas([pq.read_schema(part) for part in parts], promote_options='permissive')
+    target = parts[-1].with_name(f"{parts[-1].stem}-compacted.parquet")
+    temp_path = target.with_suffix('.tmp')
+    try:
+        with pq.ParquetWriter(temp_path, schema, compression=compression) as writer:
+            for part in parts:
+                for batch in pq.ParquetFile(part).iter_batches(batch_size=row_group_size):
+                    writer.write_table(_conform(pa.Table.from_batches([batch]), schema), row_group_size=row_group_size)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    os.replace(temp_path, target)
+    for part in parts:
+        if part != target:
+            part.unlink()
+    logger.info(f"Compacted {len(parts)} part files into {target}")
+    return target
+
+def _conform(table, schema):
+    """Cast a table to the dataset schema, adding the columns it does not have as nulls."""
+    if table.schema.equals(schema):
+        return table
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def clear_dataset(dataset_dir) -> None:
+    """Remove every part file of a dataset, for a full refresh."""
+    if Path(dataset_dir).is_dir():
+        shutil.rmtree(dataset_dir)
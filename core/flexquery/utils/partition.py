@@ -0,0 +1,207 @@
+import datetime
+import decimal
+import queue
+import threading
+from contextlib import closing
+from typing import Callable, Iterator, List
+
+from flexquery.config.constants import PARTITION_BUFFER_CHUNKS
+from flexquery.config.exceptions import ConfigurationError, DataProcessorError
+from flexquery.utils.template import sql_tokens
+
+LOWER_PARAMETER = '_partition_lower'
+UPPER_PARAMETER = '_partition_upper'
+
+
+class KeySlice:
+    """
+    One key range of a partitioned query: lower <= key < upper.
+
+    The first slice has no lower bound and also takes the rows whose key is NULL; the
+    last slice has no upper bound, so rows added after the range was read are not lost.
+    """
+
+    def __init__(self, column: str, lower=None, upper=None, ordered: bool = True):
+        self.column = column
+        self.lower = lower
+        self.upper = upper
+        self.ordered = ordered
+
+    @property
+    def parameters(self) -> dict:
+        parameters = {}
+        if self.lower is not None:
+            parameters[LOWER_PARAMETER] = self.lower
+        if self.upper is not None:
+            parameters[UPPER_PARAMETER] = self.upper
+        return parameters
+
+    def query(self, sql: str, quoted_column: str) -> str:
+        """Wrap a query so that it only returns the rows of this slice, in key order when ordered."""
+        conditions = []
+        if self.lower is not None:
+            conditions.append(f"{quoted_column} >= :{LOWER_PARAMETER}")
+        if self.upper is not None:
+            upper = f"{quoted_column} < :{UPPER_PARAMETER}"
+            conditions.append(f"({upper} OR {quoted_column} IS NULL)" if self.lower is None else upper)
+        where = f"\nWHERE {' AND '.join(conditions)}" if conditions else ""
+        order = f"\nORDER BY {quoted_column}" if self.ordered else ""
+        return f"SELECT * FROM (\n{_strip_statement(sql)}\n) AS partitioned{where}{order}"
+
+    def __str__(self):
+        lower = self.lower if self.lower is not None else ''
+        upper = self.upper if self.upper is not None else ''
+        return f"{self.column} [{lower}, {upper})"
+
+
+def bounds_query(sql: str, quoted_column: str) -> str:
+    """The minimum and maximum of a column over the result of a query."""
+    return f"SELECT MIN({quoted_column}), MAX({quoted_column}) FROM (\n{_strip_statement(sql)}\n) AS partitioned"
+
+
+# Tokens that are not SQL code, and the keywords with which ORDER BY selects rows
+_NOT_CODE = ('space', 'line_comment', 'block_comment')
+_ROW_LIMITS = ('TOP', 'OFFSET', 'FETCH', 'LIMIT')
+
+
+def subquery_sql(sql: str, db_type: str) -> str:
+    """
+    Make a query fit to be wrapped as the subquery of a partitioned query.
+
+    A final ORDER BY is dropped, since SQL Server rejects it in a subquery and every
+    slice is ordered by the key anyway. It is kept when it selects rows, together with
+    TOP, OFFSET, FETCH or LIMIT.
+
+    Raises:
+        ConfigurationError: If the query starts with WITH on SQL Server, which does not
+            accept common table expressions in a subquery
+    """
+    sql = _strip_statement(sql)
+    code = [(text.upper(), start) for kind, text, start in sql_tokens(sql) if kind not in _NOT_CODE]
+    first = next((text for text, _ in code if text != ';'), None)
+    if first == 'WITH' and db_type == 'mssql':
+        raise ConfigurationError(
+            "A query starting with WITH cannot be partitioned on SQL Server, which does not accept common "
+            "table expressions in a subquery. Rewrite them as derived tables, as in "
+            "SELECT ... FROM (SELECT ...) AS name, or move them into a view."
+        )
+
+    depth, order_by, selects_rows = 0, None, False
+    for position, (text, start) in enumerate(code):
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif depth == 0:
+            if text == 'ORDER' and position + 1 < len(code) and code[position + 1][0] == 'BY':
+                order_by = start
+            elif text in _ROW_LIMITS:
+                selects_rows = True
+    if order_by is None or selects_rows:
+        return sql
+    return sql[:order_by].rstrip()
+
+
+def _strip_statement(sql: str) -> str:
+    return sql.strip().rstrip(';').rstrip()
+
+
+def key_slices(column: str, low, high, partitions: int, ordered: bool = True) -> List[KeySlice]:
+    """
+    Split the key range [low, high] into at most `partitions` slices of equal width.
+
+    Numeric, date and datetime keys are supported. Integer and date boundaries are
+    rounded down, so a narrow range gives fewer slices rather than empty ones.
+
+    Raises:
+        DataProcessorError: If the key is not numeric or a date
+    """
+    points = split_points(low, high, partitions) if low is not None and high is not None else []
+    bounds = [None, *points, None]
+    return [KeySlice(column, bounds[i], bounds[i + 1], ordered) for i in range(len(bounds) - 1)]
+
+
+def split_points(low, high, partitions: int) -> list:
+    """The boundaries between the slices of [low, high], in ascending order."""
+    if isinstance(low, bool) or isinstance(high, bool):
+        raise DataProcessorError("A boolean column cannot be used as a partition key")
+    if isinstance(low, datetime.datetime):
+        step = (high - low) / partitions
+        points = [low + step * i for i in range(1, partitions)]
+    elif isinstance(low, datetime.date):
+        days = (high - low).days
+        points = [low + datetime.timedelta(days=days * i // partitions) for i in range(1, partitions)]
+    elif isinstance(low, int):
+        points = [low + (high - low) * i // partitions for i in range(1, partitions)]
+    elif isinstance(low, (float, decimal.Decimal)):
+        points = [low + (high - low) * i / partitions for i in range(1, partitions)]
+    else:
+        raise DataProcessorError(f"Partition key must be numeric or a date, got {type(low).__name__}")
+    return sorted({point for point in points if low < point <= high})
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+def merge_streams(executor, producers: List[Callable[[], Iterator]], ordered: bool = True,
+                  buffer: int = PARTITION_BUFFER_CHUNKS) -> Iterator:
+    """
+    Run several producers of chunks concurrently on `executor` and yield their chunks.
+
+    Unordered, chunks are yielded as soon as any producer has one. Ordered, all the
+    chunks of the first producer are yielded before those of the second, and so on;
+    the producers ahead of the one being read fetch up to `buffer` chunks each and
+    then wait, so memory stays bounded. The first error of a producer is raised to
+    the reader. Closing the returned iterator stops every producer.
+    """
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(maxsize=buffer) for _ in producers]
+    else:
+        queues = [queue.Queue(maxsize=buffer * len(producers))] * len(producers)
+
+    def put(target, item) -> bool:
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(producer, target):
+        try:
+            with closing(producer()) as chunks:
+                for chunk in chunks:
+                    if not put(target, chunk):
+                        return
+            put(target, _DONE)
+        except BaseException as e:
+            put(target, _Failure(e))
+
+    for producer, target in zip(producers, queues):
+        executor.submit(run, producer, target)
+    try:
+        if ordered:
+            for target in queues:
+                yield from _drain(target, 1)
+        elif producers:
+            yield from _drain(queues[0], len(producers))
+    finally:
+        stop.set()
+
+
+def _drain(source, producers: int) -> Iterator:
+    while producers:
+        item = source.get()
+        if item is _DONE:
+            producers -= 1
+        elif isinstance(item, _Failure):
+            raise item.error
+        else:
+            yield item
@@ -1,26 +1,315 @@
+import datetime
+import decimal
+import time
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 from sqlalchemy import text, bindparam
-import re
+import itertools
 
+from flexquery.config.constants import DEFAULT_FETCH_SIZE, TIMEOUT_DIRECTIVE
 from flexquery.config.exceptions import SQLQueryError
+from flexquery.utils.cancel import statement_tracker
+from flexquery.utils.dtypes import nullable_dtype, stable_dtypes
+from flexquery.utils.explain import PlanEstimate, explain_query
+from flexquery.utils.in_list import choose_in_list_strategies
+from flexquery.utils.partition import KeySlice, bounds_query, subquery_sql
+from flexquery.utils.profiler import RunProfile
+from flexquery.utils.template import compile_template, load_template
 
 from flexquery.config.logging_config import log_execution, get_logger
 logger = get_logger(__name__)
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
     
 
 class QueryExecutor:
-    def __init__(self, connection):
+    """
+    Executes queries with pd.read_sql.
+
+    pd.read_sql executes, fetches and converts in one call, so the run profile only
+    gets a fetch phase from this executor.
+
+    Statements are registered with the statement tracker until their result is fetched,
+    so they are cancelled on the server after timeout seconds or on Ctrl-C.
+    """
+
+    def __init__(self, connection, profile: Optional[RunProfile] = None, timeout: Optional[int] = None):
         self.connection = connection
+        self.profile = profile or RunProfile()
+        self.timeout = timeout
 
     def execute_query(self, query: str, parameters: dict) -> Optional[pd.DataFrame]:
         """ Execute a SQL query from a file with parameters from user_parameters."""
-        try:
-            query = text(query).bindparams(**parameters)
-            return pd.read_sql(query, self.connection)
-        except Exception as e:
-            raise SQLQueryError(f"Error executing query: {e}") from None
+        with self._statement():
+            try:
+                query = text(query).bindparams(**parameters)
+                with self.profile.phase('fetch'):
+                    df = pd.read_sql(query, self.connection)
+                self.profile.count('rows_fetched', len(df))
+                return df
+            except Exception as e:
+                raise SQLQueryError(f"Error executing query: {e}") from None
+
+    def execute_query_chunks(self, query: str, parameters: dict, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """ Execute a SQL query through a server-side cursor and yield DataFrames of at most chunk_size rows."""
+        with self._statement():
+            try:
+                query = text(query).bindparams(**parameters).execution_options(
+                    stream_results=True, max_row_buffer=chunk_size
+                )
+                for chunk in self._timed(pd.read_sql(query, self.connection, chunksize=chunk_size)):
+                    yield chunk
+            except Exception as e:
+                raise SQLQueryError(f"Error executing query: {e}") from None
+
+    def _statement(self):
+        return statement_tracker.track(self.connection, self.timeout, self.profile)
+
+    def _timed(self, chunks: Iterator[pd.DataFrame], started: Optional[float] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yield from an iterator of chunks, recording the time spent producing each one as fetch.
+
+        When started is given, the time from started to the first chunk is recorded as first_row.
+        """
+        chunks = iter(chunks)
+        while True:
+            fetch_started = time.perf_counter()
+            chunk = next(chunks, None)
+            fetched = time.perf_counter()
+            if chunk is None:
+                break
+            self.profile.add('fetch', fetched - fetch_started)
+            if started is not None:
+                self.profile.add('first_row', fetched - started)
+                started = None
+            self.profile.count('rows_fetched', len(chunk))
+            yield chunk
+
+
+class ArrowQueryExecutor(QueryExecutor):
+    """
+    Executes queries on the native DuckDB connection and fetches the results as Arrow
+    record batches, skipping the row-by-row materialization of the SQLAlchemy cursor.
+    """
+
+    def execute_query(self, query: str, parameters: dict) -> Optional[pd.DataFrame]:
+        """ Execute a SQL query and convert the Arrow result to a DataFrame in one pass."""
+        with self._statement():
+            try:
+                started = time.perf_counter()
+                reader = self._record_batch_reader(query, parameters)
+                batches = list(self._timed_batches(reader, started))
+                return self._to_pandas(pa.Table.from_batches(batches, schema=reader.schema))
+            except Exception as e:
+                raise SQLQueryError(f"Error executing query: {e}") from None
+
+    def execute_query_chunks(self, query: str, parameters: dict, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """ Execute a SQL query and yield one DataFrame per Arrow record batch of at most chunk_size rows."""
+        with self._statement():
+            try:
+                started = time.perf_counter()
+                for batch in self._timed_batches(self._record_batch_reader(query, parameters, chunk_size), started):
+                    yield self._to_pandas(pa.Table.from_batches([batch]), nullable=True)
+            except Exception as e:
+                raise SQLQueryError(f"Error executing query: {e}") from None
+
+    def _timed_batches(self, reader, started: float):
+        for batch in self._timed(reader, started):
+            self.profile.count('bytes_fetched', batch.nbytes)
+            yield batch
+
+    def _to_pandas(self, table, nullable: bool = False) -> pd.DataFrame:
+        """
+        Convert an Arrow table to a DataFrame, coercing decimals to float as pd.read_sql does.
+
+        With nullable, integer and boolean columns become Int64 and boolean whether or not
+        the table has NULLs in them, so every chunk of a stream gets the same dtypes.
+        """
+        with self.profile.phase('convert'):
+            for i, field in enumerate(table.schema):
+                if pa.types.is_decimal(field.type):
+                    table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+            types_mapper = _nullable_arrow_dtype if nullable else None
+            return table.to_pandas(split_blocks=True, self_destruct=True, types_mapper=types_mapper)
+
+    def _record_batch_reader(self, query: str, parameters: dict, batch_size: Optional[int] = None):
+        """ Compile the query for the DuckDB dialect and run it on the driver connection."""
+        statement = text(query).bindparams(**parameters).compile(dialect=self.connection.dialect)
+        if statement.positional:
+            values = [statement.params[name] for name in statement.positiontup]
+        else:
+            values = statement.params
+        driver_connection = self.connection.connection.driver_connection
+        with self.profile.phase('execute'):
+            result = driver_connection.execute(statement.string, values)
+        batch_args = (batch_size,) if batch_size else ()
+        if hasattr(result, 'to_arrow_reader'):
+            return result.to_arrow_reader(*batch_args)
+        return result.fetch_record_batch(*batch_args)
+
+
+class ColumnarQueryExecutor(QueryExecutor):
+    """
+    Executes queries through the DBAPI cursor and builds DataFrames column by column.
+
+    The column types come from cursor.description (pyodbc reports the Python type of
+    each column), so every fetchmany batch is transposed once and converted straight
+    into typed NumPy arrays instead of letting pandas infer types from row objects.
+    Decimals are coerced to float as pd.read_sql does.
+    """
+
+    def __init__(self, connection, profile: Optional[RunProfile] = None, timeout: Optional[int] = None,
+                 fetch_size: int = DEFAULT_FETCH_SIZE):
+        super().__init__(connection, profile, timeout)
+        self.fetch_size = fetch_size
+
+    def execute_query(self, query: str, parameters: dict) -> Optional[pd.DataFrame]:
+        """ Execute a SQL query and fetch the whole result in batches of fetch_size rows."""
+        with self._statement():
+            try:
+                started = time.perf_counter()
+                with self.profile.phase('execute'):
+                    result = self.connection.execute(text(query).bindparams(**parameters))
+                try:
+                    cursor = result.cursor
+                    if cursor is None or cursor.description is None:
+                        return None
+                    columns = [[] for _ in cursor.description]
+                    for rows in self._timed(self._fetch_batches(cursor, self.fetch_size), started):
+                        for buffer, array in zip(columns, self._to_arrays(cursor.description, rows)):
+                            buffer.append(array)
+                    with self.profile.phase('convert'):
+                        return self._to_frame(cursor.description, [self._concatenate(buffer) for buffer in columns])
+                finally:
+                    result.close()
+            except Exception as e:
+                raise SQLQueryError(f"Error executing query: {e}") from None
+
+    def execute_query_chunks(self, query: str, parameters: dict, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """ Execute a SQL query and yield one DataFrame per fetchmany batch of at most chunk_size rows."""
+        with self._statement():
+            try:
+                started = time.perf_counter()
+                with self.profile.phase('execute'):
+                    result = self.connection.execute(text(query).bindparams(**parameters))
+                try:
+                    cursor = result.cursor
+                    if cursor is None or cursor.description is None:
+                        return
+                    for rows in self._timed(self._fetch_batches(cursor, chunk_size), started):
+                        yield self._to_frame(cursor.description, self._to_arrays(cursor.description, rows, nullable=True))
+                finally:
+                    result.close()
+            except Exception as e:
+                raise SQLQueryError(f"Error executing query: {e}") from None
+
+    @staticmethod
+    def _fetch_batches(cursor, size: int):
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield rows
+
+    def _to_arrays(self, description, rows, nullable: bool = False) -> list:
+        """
+        Transpose a batch of rows and convert each column to an array of its cursor type.
+        With nullable, integer and boolean columns become Int64 and boolean arrays.
+        """
+        with self.profile.phase('convert'):
+            return [self._to_array(column[1], values, nullable) for column, values in zip(description, zip(*rows))]
+
+    @staticmethod
+    def _to_array(type_code, values: tuple, nullable: bool = False):
+        dtype = _COLUMN_DTYPES.get(type_code)
+        if nullable and dtype in ('int64', 'bool'):
+            try:
+                return pd.array(values, dtype='Int64' if dtype == 'int64' else 'boolean')
+            except (TypeError, ValueError, OverflowError):
+                dtype = None  # e.g. integers beyond int64
+        if dtype is not None:
+            has_nulls = None in values
+            if has_nulls and dtype in ('int64', 'bool'):
+                # Match pd.read_sql: integers with NULLs become float, booleans stay objects
+                dtype = 'float64' if dtype == 'int64' else None
+            elif dtype.startswith('datetime64') and _first_present(values).tzinfo is not None:
+                # numpy would silently drop the offsets of timezone-aware datetimes, and
+                # values with different offsets (DATETIMEOFFSET) fit no single timezone,
+                # so they are converted to UTC
+                try:
+                    return pd.array(pd.to_datetime(values, utc=True), dtype=f"{dtype[:-1]}, UTC]")
+                except (TypeError, ValueError, OverflowError):
+                    dtype = None
+            if dtype is not None:
+                try:
+                    return np.array(values, dtype=dtype)
+                except (TypeError, ValueError, OverflowError):
+                    pass  # e.g. integers beyond int64
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+    @staticmethod
+    def _concatenate(arrays: list) -> np.ndarray:
+        if not arrays:
+            return np.empty(0, dtype=object)
+        extension = next((array.dtype for array in arrays if not isinstance(array, np.ndarray)), None)
+        if extension is not None:
+            # Timezone-aware datetimes; batches where the column was all NULL take their dtype
+            arrays = [
+                pd.array([None] * len(array), dtype=extension) if isinstance(array, np.ndarray) and pd.isna(array).all() else array
+                for array in arrays
+            ]
+            return pd.concat([pd.Series(array, copy=False) for array in arrays], ignore_index=True).array
+        dtypes = {array.dtype for array in arrays}
+        if len(dtypes) > 1:
+            # Batches disagree, e.g. only some had NULLs in an integer column
+            if all(np.issubdtype(dtype, np.number) or dtype == np.bool_ for dtype in dtypes):
+                return np.concatenate([array.astype('float64') for array in arrays])
+            return np.concatenate([array.astype(object) for array in arrays])
+        return np.concatenate(arrays)
+
+    @staticmethod
+    def _to_frame(description, arrays: list) -> pd.DataFrame:
+        df = pd.DataFrame(dict(enumerate(arrays)), copy=False)
+        df.columns = [column[0] for column in description]
+        return df
+
+
+def _nullable_arrow_dtype(arrow_type):
+    """types_mapper for Table.to_pandas: nullable pandas dtypes for Arrow integers and booleans."""
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return nullable_dtype(np.dtype(arrow_type.to_pandas_dtype()))
+    return None
+
+def _first_present(values: tuple):
+    return next((value for value in values if value is not None), datetime.datetime.min)
+
+
+# Column dtypes for the Python types pyodbc reports in cursor.description
+_COLUMN_DTYPES = {
+    int: 'int64',
+    float: 'float64',
+    decimal.Decimal: 'float64',
+    bool: 'bool',
+    datetime.datetime: 'datetime64[us]',
+}
+
+
+def create_query_executor(connection, config, profile: Optional[RunProfile] = None, timeout: Optional[int] = None) -> QueryExecutor:
+    """Pick the fastest query executor available for the configured database type."""
+    if config.db_type == 'duckdb' and config.arrow_fetch:
+        if pa is not None:
+            return ArrowQueryExecutor(connection, profile, timeout)
+        logger.debug("pyarrow is not installed, falling back to pandas fetch for DuckDB")
+    if config.db_type == 'mssql' and config.columnar_fetch:
+        return ColumnarQueryExecutor(connection, profile, timeout)
+    return QueryExecutor(connection, profile, timeout)
     
 
 class QueryProcessor:
@@ -29,22 +318,34 @@ class QueryProcessor:
     def extract_parameters_from_sql(sql_content: str) -> list:
         """
         Extract parameter names from SQL content by looking for :parameter_name patterns.
+        Placeholders inside string literals, quoted identifiers and comments are ignored.
         Args:
             sql_content (str): The SQL query content
         Returns:
             list: List of parameter names found in the SQL
         """
-        param_pattern = re.compile(r':([a-zA-Z0-9_]+)')
-        params = param_pattern.findall(sql_content)
-        return list(set(params))
+        return list(compile_template(sql_content).parameters)
     
+    @staticmethod
+    def expand_sweep(sweep: dict) -> list:
+        """
+        Expand sweep dimensions into one parameter set per combination.
+
+        Args:
+            sweep (dict): Parameter names mapped to the list of values to sweep over
+        Returns:
+            list: One dict per combination, in the cartesian product order of the dimensions
+        """
+        names = list(sweep)
+        return [dict(zip(names, values)) for values in itertools.product(*(sweep[name] for name in names))]
+
     @staticmethod
     def validate_parameters(params_dict: dict):
         """
         Validate the types and values of parameters in a dictionary.
 
         This method checks if the values in the provided dictionary conform to
-        the allowed types: int, str, float, list, bool, or NoneType. If a value
+        the allowed types: int, str, float, Decimal, date, datetime, list, bool, or NoneType. If a value
         is a list, it further validates that all items in the list are of the
         allowed types.
 
@@ -56,33 +357,174 @@ class QueryProcessor:
             ValueError: If a parameter value or a list item has an invalid type.
         """
         for key, value in params_dict.items():
-            if not isinstance(value, (int, str, float, list, bool, type(None))):
+            if not isinstance(value, (int, str, float, decimal.Decimal, datetime.date, list, bool, type(None))):
                 raise ValueError(f"Invalid parameter type for {key}: {type(value)}")
             if isinstance(value, list):
                 for item in value:
-                    if not isinstance(item, (int, str, float, bool, type(None))):
+                    if not isinstance(item, (int, str, float, decimal.Decimal, datetime.date, bool, type(None))):
                         raise ValueError(f"Invalid list item type in {key}: {type(item)}")
 
 
 class FlexQuery:
-    def __init__(self, connection, config):
-        self._query_executor = QueryExecutor(connection)
+    def __init__(self, connection, config, cache=None, profile: Optional[RunProfile] = None, timeout: Optional[int] = None):
+        self.connection = connection
         self.config = config
+        self.cache = cache
+        self.profile = profile or RunProfile()
+        self.timeout = timeout
+
+    def _query_executor(self, query_file: str) -> QueryExecutor:
+        return create_query_executor(self.connection, self.config, self.profile, self.statement_timeout(query_file))
+
+    def statement_timeout(self, query_file: str) -> Optional[int]:
+        """
+        Seconds after which the query is cancelled: the timeout given on the command line,
+        else the query's "-- @timeout <seconds>" directive, else query_timeout in profiles.yml.
+        """
+        if self.timeout:
+            return self.timeout
+        directive = load_template(query_file).directives.get(TIMEOUT_DIRECTIVE)
+        if directive is None:
+            return self.config.query_timeout
+        try:
+            timeout = int(directive)
+        except ValueError:
+            timeout = 0
+        if timeout <= 0:
+            raise SQLQueryError(f"Invalid @{TIMEOUT_DIRECTIVE} in {query_file}: {directive}")
+        return timeout
 
     def process_sql_query_with_params(self, query_file: str, user_parameters: dict) -> Optional[pd.DataFrame]:
         """
         Executes a SQL query from a file with parameters from user_parameters.
+        The result is stored in the result cache when one is configured.
         Args:
             query_file (str): The path to the file containing the SQL query.
             user_parameters (dict): user_parameters dictionary containing parameter values.
         Returns:
             pd.DataFrame: A DataFrame containing the query results if successful, None otherwise.
         """
-            
-        with open(query_file, 'r') as file:
-            query_str = file.read()
-            
-        required_params = QueryProcessor.extract_parameters_from_sql(query_str)
+        query, parameters = self.prepare_query(query_file, user_parameters)
+        result = self._query_executor(query_file).execute_query(query, parameters)
+        if self.cache is not None:
+            result = self.cache.store(query, parameters, result)
+        return result
+
+    def stream_sql_query_with_params(self, query_file: str, user_parameters: dict, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Executes a SQL query from a file and yields the results chunk by chunk.
+        The chunks are written through to the result cache when one is configured.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+            chunk_size (int): Maximum number of rows per yielded DataFrame.
+        Returns:
+            Iterator[pd.DataFrame]: DataFrames of at most chunk_size rows, in result order.
+        """
+        query, parameters = self.prepare_query(query_file, user_parameters)
+        result = self._query_executor(query_file).execute_query_chunks(query, parameters, chunk_size)
+        if self.cache is not None:
+            # The cache entry is one Parquet file, so its chunks must share a schema
+            result = self.cache.store(query, parameters, stable_dtypes(result))
+        return result
+
+    def cached_sql_query_with_params(self, query_file: str, user_parameters: dict, chunk_size: Optional[int] = None):
+        """
+        Look up the result of a SQL query file in the result cache without touching the database.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+            chunk_size (int, optional): Return an iterator of DataFrames of at most chunk_size rows.
+        Returns:
+            The cached DataFrame (or iterator of DataFrames), or None if there is no usable entry.
+        """
+        if self.cache is None:
+            return None
+        query, parameters = self.prepare_query(query_file, user_parameters)
+        with self.profile.phase('cache_lookup'):
+            return self.cache.get(query, parameters, chunk_size)
+
+    def key_range_with_params(self, query_file: str, user_parameters: dict, column: str) -> Tuple:
+        """
+        Find the minimum and maximum of a column over the result of a SQL query file.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+            column (str): The column to partition the result by.
+        Returns:
+            Tuple: The minimum and maximum, both None if the result is empty.
+        """
+        query, parameters = self.prepare_query(query_file, user_parameters)
+        query = bounds_query(subquery_sql(query, self.config.db_type), self._quote(column))
+        with statement_tracker.track(self.connection, self.statement_timeout(query_file), self.profile):
+            try:
+                with self.profile.phase('key_range'):
+                    return tuple(self.connection.execute(text(query).bindparams(**parameters)).one())
+            except Exception as e:
+                raise SQLQueryError(f"Error finding the range of {column}: {e}") from None
+
+    def process_partition_with_params(self, query_file: str, user_parameters: dict, key_slice: KeySlice) -> Optional[pd.DataFrame]:
+        """
+        Executes the key range key_slice of a SQL query file and returns its rows.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+            key_slice (KeySlice): The key range to fetch.
+        Returns:
+            pd.DataFrame: A DataFrame containing the rows of the key range.
+        """
+        query, parameters = self._partition_query(query_file, user_parameters, key_slice)
+        return self._query_executor(query_file).execute_query(query, parameters)
+
+    def stream_partition_with_params(self, query_file: str, user_parameters: dict, key_slice: KeySlice, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Executes the key range key_slice of a SQL query file and yields its rows chunk by chunk.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+            key_slice (KeySlice): The key range to fetch.
+            chunk_size (int): Maximum number of rows per yielded DataFrame.
+        Returns:
+            Iterator[pd.DataFrame]: DataFrames of at most chunk_size rows.
+        """
+        query, parameters = self._partition_query(query_file, user_parameters, key_slice)
+        return self._query_executor(query_file).execute_query_chunks(query, parameters, chunk_size)
+
+    def _partition_query(self, query_file: str, user_parameters: dict, key_slice: KeySlice) -> Tuple[str, dict]:
+        query, parameters = self.prepare_query(query_file, user_parameters, reserved=len(key_slice.parameters))
+        query = subquery_sql(query, self.config.db_type)
+        return key_slice.query(query, self._quote(key_slice.column)), {**parameters, **key_slice.parameters}
+
+    def _quote(self, column: str) -> str:
+        return self.connection.dialect.identifier_preparer.quote(column)
+
+    def explain_sql_query_with_params(self, query_file: str, user_parameters: dict) -> PlanEstimate:
+        """
+        Fetch the estimated plan of a SQL query file with the parameters it would run with.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+        Returns:
+            PlanEstimate: The estimated rows and cost of the query.
+        """
+        query, parameters = self.prepare_query(query_file, user_parameters)
+        with self.profile.phase('explain'):
+            return explain_query(self.connection, self.config.db_type, query, parameters)
+
+    def prepare_query(self, query_file: str, user_parameters: dict, reserved: int = 0) -> Tuple[str, dict]:
+        """
+        Read a SQL query file and bind user_parameters to it.
+        The file is compiled into a template once and reused until it changes.
+        Args:
+            query_file (str): The path to the file containing the SQL query.
+            user_parameters (dict): user_parameters dictionary containing parameter values.
+            reserved (int): Bind parameters the caller adds to the query afterwards.
+        Returns:
+            Tuple[str, dict]: The rewritten SQL text and the bind parameter values.
+        """
+        with self.profile.phase('template_load'):
+            template = load_template(query_file)
+        required_params = template.parameters
         logger.debug(f"Required parameters: {required_params}")
 
         default_params = self.config.params or {}
@@ -94,36 +536,31 @@ class FlexQuery:
             raise SQLQueryError(f"Missing required parameters: {missing_params}")
 
         QueryProcessor.validate_parameters(user_parameters)
-            
-        modified_query = query_str
+
+        list_params = {
+            param: user_parameters[param] for param in required_params
+            if param in user_parameters and isinstance(user_parameters[param], list) and len(user_parameters[param]) > 1
+        }
+        strategies = choose_in_list_strategies(
+            self.config.db_type, list_params, self.config.in_list_strategy,
+            reserved=reserved + len([p for p in required_params if p in user_parameters and p not in list_params]),
+        )
 
         bind_params = []
+        replacements = {}
         for param in required_params:
             if param in user_parameters:
-                pattern = re.compile(fr"(in|IN)\s+:{param}\b", re.IGNORECASE) # Match IN :param
-
                 param_value = user_parameters[param]
-                if isinstance(param_value, list) and len(param_value) > 1:
-                    placeholder_list = []
-                    for i, item in enumerate(param_value):
-                        bind_name = f"{param}_{i}"
-                        placeholder_list.append(f":{bind_name}")
-                        bind_params.append(bindparam(bind_name, item))
-                    
-                    # Replace :param with (:param_0, :param_1, ...)
-                    placeholder_str = f"({', '.join(placeholder_list)})"
-                    
-                    # Replace the parameter in the query with the placeholder list
-                    modified_query = pattern.sub(f"IN {placeholder_str}", modified_query)
+                if param in list_params:
+                    strategy = strategies[param]
+                    # Replace IN :param with the strategy's SQL, e.g. IN (:param_0, :param_1, ...)
+                    replacements[param], binds = strategy.bind(param, param_value)
+                    logger.debug(f"Binding {len(param_value)} values of {param} with the {strategy.name} strategy")
+                    bind_params.extend(bindparam(name, value) for name, value in binds.items())
                 else:
                     if isinstance(param_value, list) and len(param_value) == 1:
                         param_value = param_value[0]  # Extract the single value from the list
                     bind_params.append(bindparam(param, param_value))
-                    if pattern.search(modified_query):
-                        modified_query = pattern.sub(f"= :{param}", modified_query) # Replace IN :param with = :param for single values
-
-        return self._query_executor.execute_query(modified_query, {param.key: param.value for param in bind_params})
-                        
-
+                    replacements[param] = f"= :{param}" # Replace IN :param with = :param for single values
 
-        
+        return template.render(replacements), {param.key: param.value for param in bind_params}
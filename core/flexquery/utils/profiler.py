@@ -0,0 +1,121 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class RunProfile:
+    """
+    Phase timings, counters and peak memory of one run.
+
+    A phase recorded several times, such as one fetch per chunk or one connect per
+    batch query, accumulates its total time and the number of times it ran. With
+    concurrent queries the phase totals add up the time spent by every thread, so
+    they can exceed the wall time of the run. All methods are thread-safe.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the block as one occurrence of a phase, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Record one occurrence of a phase that took the given number of seconds."""
+        with self._lock:
+            entry = self.phases.setdefault(name, {'seconds': 0.0, 'count': 0})
+            entry['seconds'] += seconds
+            entry['count'] += 1
+
+    def count(self, name: str, value: int) -> None:
+        """Add to a counter, such as rows fetched or bytes written."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            phases = {name: dict(entry) for name, entry in self.phases.items()}
+            counters = dict(self.counters)
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self._started, 6),
+            'peak_rss_bytes': peak_rss(),
+            'phases': {name: {'seconds': round(entry['seconds'], 6), 'count': entry['count']} for name, entry in phases.items()},
+            'counters': counters,
+        }
+
+    def write(self, path) -> None:
+        """Write the profile as JSON."""
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def format_table(self) -> str:
+        """Render the profile as a plain-text table for the console."""
+        profile = self.to_dict()
+        width = max([len('Phase'), *(len(name) for name in profile['phases']), *(len(name) for name in profile['counters'])])
+        lines = [f"{'Phase':<{width}}  {'Seconds':>10} {'Count':>7}"]
+        for name, entry in profile['phases'].items():
+            lines.append(f"{name:<{width}}  {entry['seconds']:>10.3f} {entry['count']:>7}")
+        lines.append(f"{'wall time':<{width}}  {profile['wall_seconds']:>10.3f}")
+        for name, value in profile['counters'].items():
+            lines.append(f"{name:<{width}}  {value:>18}")
+        if profile['peak_rss_bytes'] is not None:
+            lines.append(f"{'peak RSS (MB)':<{width}}  {profile['peak_rss_bytes'] / 1024 ** 2:>10.1f}")
+        return "\n".join(lines)
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes, or None where it cannot be measured."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        return _windows_peak_working_set()
+    return None
+
+def _windows_peak_working_set() -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize
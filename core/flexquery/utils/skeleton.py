@@ -1,6 +1,6 @@
 import os
 import shutil
-import pkg_resources
+from importlib import resources
 from typing import Tuple, Optional
 from flexquery.config.pathconfig import AppPaths
 
@@ -27,7 +27,7 @@ def initialize_env_directories(env: Optional[str] = None) -> None:
 def find_template_file(template_name: str) -> Optional[str]:
     """Find the path to a template file."""
     try:
-        template_path = pkg_resources.resource_filename("flexquery", os.path.join("docs", "templates", template_name))
+        template_path = str(resources.files("flexquery") / "docs" / "templates" / template_name)
         if os.path.exists(template_path):
             return template_path
         else:
@@ -0,0 +1,184 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flexquery.config.exceptions import SQLQueryError
+
+# One alternative per token kind, tried in order at each position of the SQL text.
+# Unterminated strings and comments run to the end of the text instead of failing.
+_TOKEN_PATTERN = re.compile(
+    r"""
+      (?P<string>'(?:[^']|'')*'?)
+    | (?P<identifier>"(?:[^"]|"")*"?)
+    | (?P<dollar>\$(?P<tag>[A-Za-z_]\w*)?\$.*?(?:\$(?P=tag)?\$|\Z))
+    | (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*.*?(?:\*/|\Z))
+    | (?P<cast>::)
+    | (?P<param>(?<![:\w\\]):(?P<name>\w+)(?![:\w]))
+    | (?P<word>\w+)
+    | (?P<space>\s+)
+    | (?P<other>.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+_LITERALS = ('string', 'identifier', 'dollar')
+_COMMENTS = ('line_comment', 'block_comment')
+
+# A line comment of the form "-- @name value" is a directive to FlexQuery, e.g. "-- @watermark updated_at"
+_DIRECTIVE_PATTERN = re.compile(r"--\s*@(?P<name>\w+)(?:\s+(?P<value>.*?))?\s*$")
+
+# SQLAlchemy's text() binds anything that looks like :name, even inside quotes and
+# comments. Such colons are escaped as \: so they reach the database unchanged.
+_TEXT_BIND_PATTERN = re.compile(r"(?<![:\w\\]):(\w+)(?![:\w$])")
+
+
+class ParameterSlot:
+    """A :name placeholder in a SQL template."""
+
+    def __init__(self, name: str, position: int, in_list: bool = False, prefix: str = ''):
+        self.name = name
+        self.position = position  # offset of the placeholder, or of its IN keyword, in the source
+        self.in_list = in_list    # the placeholder is the operand of IN, as in "IN :name"
+        self.prefix = prefix      # source text of "IN " preceding an in_list placeholder
+
+    def __repr__(self):
+        return f"ParameterSlot({self.name!r}, position={self.position}, in_list={self.in_list})"
+
+
+class CompiledTemplate:
+    """
+    A SQL query split into text segments and parameter slots.
+
+    Parameters are only recognized in SQL code: string literals, quoted identifiers,
+    comments, :: casts and values such as '12:30' are left alone. The template is
+    compiled once and rendered any number of times with different IN list bindings.
+    Directives given in "-- @name value" line comments are collected in `directives`.
+    """
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self._segments = []
+        self.slots: List[ParameterSlot] = []
+        self.directives: Dict[str, str] = {}
+        self.normalized_sql = self._compile(sql)
+        self.parameters: List[str] = list(dict.fromkeys(slot.name for slot in self.slots))
+        self.in_list_parameters: List[str] = list(dict.fromkeys(slot.name for slot in self.slots if slot.in_list))
+
+    def _compile(self, sql: str) -> str:
+        parts = []            # source text of the current segment, one item per token
+        last_code = None      # index in parts of the last token that is not whitespace
+        normalized = []
+
+        for match in _TOKEN_PATTERN.finditer(sql):
+            kind = match.lastgroup
+            token = match.group()
+
+            if kind == 'param':
+                name = match.group('name')
+                is_in = last_code is not None and parts[last_code].upper() == 'IN'
+                if is_in:
+                    prefix = ''.join(parts[last_code:])
+                    del parts[last_code:]
+                    position = match.start() - len(prefix)
+                else:
+                    prefix = ''
+                    position = match.start()
+                self._segments.append(''.join(parts))
+                slot = ParameterSlot(name, position, is_in, prefix)
+                self._segments.append(slot)
+                self.slots.append(slot)
+                parts, last_code = [], None
+                normalized.append(token)
+                continue
+
+            if kind == 'line_comment':
+                directive = _DIRECTIVE_PATTERN.match(token)
+                if directive:
+                    self.directives[directive.group('name').lower()] = directive.group('value') or ''
+            if kind in _LITERALS or kind in _COMMENTS:
+                token = _TEXT_BIND_PATTERN.sub(r"\\:\1", token)
+            if kind != 'space':
+                last_code = len(parts)
+            parts.append(token)
+
+            if kind in _COMMENTS or kind == 'space':
+                if normalized and normalized[-1] != ' ':
+                    normalized.append(' ')
+            else:
+                normalized.append(token)
+
+        self._segments.append(''.join(parts))
+        return ''.join(normalized).strip()
+
+    def render(self, replacements: Optional[Dict[str, str]] = None) -> str:
+        """
+        Build the SQL text to execute.
+
+        Args:
+            replacements (dict, optional): Parameter names mapped to the SQL that replaces
+                "IN :name" wherever the parameter is used as an IN operand
+        Returns:
+            str: SQL text for sqlalchemy.text(), with all other placeholders kept as :name
+        """
+        replacements = replacements or {}
+        parts = []
+        for segment in self._segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+            elif segment.in_list and segment.name in replacements:
+                parts.append(replacements[segment.name])
+            else:
+                parts.append(f"{segment.prefix}:{segment.name}")
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=256)
+def compile_template(sql: str) -> CompiledTemplate:
+    """Compile SQL text into a template. Templates of recently seen SQL are reused."""
+    return CompiledTemplate(sql)
+
+
+@lru_cache(maxsize=256)
+def _load_template(path: str, mtime_ns: int, size: int) -> CompiledTemplate:
+    with open(path, 'r') as file:
+        return CompiledTemplate(file.read())
+
+
+def load_template(query_file: str) -> CompiledTemplate:
+    """
+    Compile a SQL query file into a template.
+
+    Compiled templates are cached per file path, modification time and size, so a
+    file is parsed again only after it changes.
+
+    Args:
+        query_file (str): Path to the SQL query file
+    Returns:
+        CompiledTemplate: The compiled query
+    """
+    path = os.path.abspath(query_file)
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise SQLQueryError(f"Cannot read query file {query_file}: {e}") from None
+    return _load_template(path, stat.st_mtime_ns, stat.st_size)
+
+
+def sql_tokens(sql: str) -> Iterator[Tuple[str, str, int]]:
+    """
+    Split SQL text into tokens.
+
+    Returns:
+        Iterator[Tuple[str, str, int]]: The kind, text and offset of each token. Kinds are
+            string, identifier, dollar, line_comment, block_comment, cast, param, word,
+            space and other
+    """
+    for match in _TOKEN_PATTERN.finditer(sql):
+        yield match.lastgroup, match.group(), match.start()
+
+
+def normalize_sql(sql: str) -> str:
+    """Normalize SQL text: comments are dropped and whitespace outside literals is collapsed."""
+    return compile_template(sql).normalized_sql
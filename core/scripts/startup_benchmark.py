@@ -0,0 +1,73 @@
+"""
+FlexQuery startup benchmark
+
+Times `flexquery --version` in fresh interpreters and exits with status 1 when the
+median exceeds the budget, so slow imports are caught before they reach the wrapper
+scripts that call flexquery many times.
+
+Usage:
+    python core/scripts/startup_benchmark.py [--runs 10] [--budget 0.5] [--command --help]
+
+With --imports the modules imported at startup are listed, slowest first.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+CLI = "from flexquery.cli.main import cli; cli()"
+
+
+def time_startup(arguments, runs):
+    """Run the CLI in a new interpreter `runs` times and return the wall times in seconds."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", CLI, *arguments], check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def slowest_imports(arguments, limit=15):
+    """Cumulative import times in microseconds of the slowest modules, from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CLI, *arguments], check=True, capture_output=True, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time FlexQuery CLI startup")
+    parser.add_argument("--runs", type=int, default=10, help="Number of timed runs (default: 10)")
+    parser.add_argument("--budget", type=float, default=0.5, help="Maximum median startup time in seconds (default: 0.5)")
+    parser.add_argument("--command", nargs=argparse.REMAINDER, default=["--version"],
+                        help="CLI arguments to time (default: --version)")
+    parser.add_argument("--imports", action="store_true", help="List the slowest imports")
+    args = parser.parse_args()
+
+    # The first run warms the bytecode and file system caches
+    time_startup(args.command, 1)
+    timings = time_startup(args.command, args.runs)
+    median = statistics.median(timings)
+
+    print(f"flexquery {' '.join(args.command)}: median {median:.3f}s, "
+          f"min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs (budget {args.budget:.3f}s)")
+
+    if args.imports:
+        for cumulative, module in slowest_imports(args.command):
+            print(f"{cumulative / 1000:>10.1f} ms  {module}")
+
+    if median > args.budget:
+        print(f"Startup time exceeds the budget by {median - args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from flexquery.utils.cache import ResultCache
+
+pytest.importorskip('pyarrow')
+
+QUERY = "SELECT * FROM orders"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(tmp_path, 'TEST', ttl=3600, max_size_mb=16)
+
+
+def entries(cache):
+    return sorted(path.name for path in cache.cache_dir.glob('*')) if cache.cache_dir.exists() else []
+
+
+def test_dataframe_is_cached(cache):
+    df = pd.DataFrame({'id': [1, 2], 'name': ['a', 'b']})
+    assert cache.store(QUERY, {}, df) is df
+    pd.testing.assert_frame_equal(cache.get(QUERY, {}), df)
+
+
+def test_uncacheable_dataframe_is_returned_uncached(cache):
+    df = pd.DataFrame({'mixed': [1, 'two', 3.0]})
+    assert cache.store(QUERY, {}, df) is df
+    assert cache.get(QUERY, {}) is None
+    assert entries(cache) == []
+
+
+def test_stream_with_mismatched_chunks_is_yielded_uncached(cache):
+    chunks = [pd.DataFrame({'v': [1, 2]}), pd.DataFrame({'v': ['x', 'y']}), pd.DataFrame({'v': [3]})]
+    streamed = list(cache.store(QUERY, {}, iter(chunks)))
+    assert [len(chunk) for chunk in streamed] == [2, 2, 1]
+    assert cache.get(QUERY, {}) is None
+    assert entries(cache) == []
+
+
+def test_stream_larger_than_the_cache_is_not_cached(tmp_path):
+    cache = ResultCache(tmp_path, 'TEST', ttl=3600, max_size_mb=1)
+    chunks = (pd.DataFrame({'text': [f"{i:08d}" * 16 for i in range(start, start + 20000)]}) for start in range(0, 100000, 20000))
+    assert sum(len(chunk) for chunk in cache.store(QUERY, {}, chunks)) == 100000
+    assert cache.get(QUERY, {}) is None
+    assert entries(cache) == []
+
+
+def test_no_result_set_is_not_cached(cache):
+    assert cache.store(QUERY, {}, None) is None
+    assert cache.get(QUERY, {}) is None
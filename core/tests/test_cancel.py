@@ -0,0 +1,34 @@
+import os
+import signal
+import threading
+
+import pytest
+
+from flexquery.utils.cancel import cancel_on_interrupt, run_interruptibly
+
+
+def test_result_and_errors_are_returned_from_the_worker():
+    assert run_interruptibly(lambda a, b: (a + b, threading.current_thread().name), 1, 2) == (3, 'flexquery-main')
+
+    def fail():
+        raise ValueError('query failed')
+
+    with pytest.raises(ValueError, match='query failed'):
+        run_interruptibly(fail)
+
+
+def test_ctrl_c_is_handled_while_the_worker_blocks():
+    release = threading.Event()
+    finished = []
+
+    def blocked_query():
+        # Stands for a driver call: Ctrl-C cancels the statement, which then returns
+        release.wait(30)
+        finished.append(True)
+
+    threading.Timer(0.2, os.kill, args=(os.getpid(), signal.SIGINT)).start()
+    threading.Timer(0.6, release.set).start()
+    with pytest.raises(KeyboardInterrupt), cancel_on_interrupt():
+        run_interruptibly(blocked_query)
+    # The interrupted worker was given the time to finish
+    assert finished == [True]
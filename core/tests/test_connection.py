@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from flexquery.utils.connection import EngineRegistry
+
+pytest.importorskip('duckdb_engine')
+
+POOL_OPTIONS = {'pool_size': 2, 'max_overflow': 10, 'pool_recycle': 1800, 'pool_pre_ping': False}
+
+
+@pytest.fixture
+def registry():
+    registry = EngineRegistry()
+    yield registry
+    registry.dispose_all()
+
+
+def test_in_memory_database_ignores_pool_sizing(registry):
+    engine, created = registry.get('TEST', 'duckdb:///:memory:', **POOL_OPTIONS)
+    assert created
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_file_database_uses_a_sized_queue_pool(registry, tmp_path):
+    engine, _ = registry.get('TEST', f"duckdb:///{tmp_path / 'test.db'}", **POOL_OPTIONS)
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 2
+
+
+def test_engine_is_reused_per_environment(registry):
+    engine, _ = registry.get('TEST', 'duckdb:///:memory:', **POOL_OPTIONS)
+    assert registry.get('TEST', 'duckdb:///:memory:', **POOL_OPTIONS) == (engine, False)
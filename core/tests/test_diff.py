@@ -0,0 +1,64 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from flexquery.utils.diff import ResultHashes, compare_hashes, hash_rows
+
+
+def diff(left: pd.DataFrame, right: pd.DataFrame, key_columns=None):
+    left_hashes, right_hashes = ResultHashes(key_columns), ResultHashes(key_columns)
+    left_hashes.add(left)
+    right_hashes.add(right)
+    return compare_hashes(left_hashes, right_hashes, 'LEFT', 'RIGHT').result
+
+
+def test_integers_beyond_float_precision_differ():
+    big = 2 ** 53
+    left = pd.DataFrame({'id': [1, 2], 'amount': np.array([big, big + 2], dtype='int64')})
+    right = pd.DataFrame({'id': [1, 2], 'amount': np.array([big + 1, big + 3], dtype='int64')})
+    result = diff(left, right, ['id'])
+    assert result.changed == 2
+    assert not result.identical
+
+
+def test_integer_keys_beyond_float_precision_are_distinct():
+    big = 2 ** 62
+    left = pd.DataFrame({'id': np.array([big, big + 1], dtype='int64'), 'value': [1, 2]})
+    right = pd.DataFrame({'id': np.array([big, big + 1], dtype='int64'), 'value': [1, 2]})
+    assert diff(left, right, ['id']).identical
+
+
+def test_integers_beyond_float_precision_with_nulls_differ():
+    big = 2 ** 53
+    left = pd.DataFrame({'amount': pd.array([big, None], dtype='Int64')})
+    right = pd.DataFrame({'amount': pd.array([big + 1, None], dtype='Int64')})
+    result = diff(left, right)
+    assert (result.added, result.removed, result.unchanged) == (1, 1, 1)
+
+
+def test_decimals_are_compared_exactly():
+    left = pd.DataFrame({'amount': [Decimal('12345678901234567.01'), Decimal('0.1')]})
+    right = pd.DataFrame({'amount': [Decimal('12345678901234567.02'), Decimal('0.10')]})
+    result = diff(left, right)
+    assert (result.added, result.removed, result.unchanged) == (1, 1, 1)
+
+
+def test_equal_numbers_hash_the_same_across_types():
+    as_int = pd.DataFrame({'amount': np.array([5, 7], dtype='int64')})
+    with_nulls = pd.DataFrame({'amount': [5.0, np.nan]})
+    as_decimal = pd.DataFrame({'amount': [Decimal('5.00'), None]})
+    assert hash_rows(as_int, ['amount'])[0] == hash_rows(with_nulls, ['amount'])[0] == hash_rows(as_decimal, ['amount'])[0]
+    assert hash_rows(with_nulls, ['amount'])[1] == hash_rows(as_decimal, ['amount'])[1]
+    assert hash_rows(pd.DataFrame({'amount': [2.5]}), ['amount'])[0] == hash_rows(pd.DataFrame({'amount': [Decimal('2.5')]}), ['amount'])[0]
+
+
+def test_datetimes_with_mixed_offsets_are_compared_as_instants():
+    def at(hour, hours):
+        return datetime.datetime(2024, 3, 31, hour, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=hours)))
+
+    left = pd.DataFrame({'id': [1, 2], 'at': pd.Series([at(1, 1), at(2, 2)], dtype=object)})
+    right = pd.DataFrame({'id': [1, 2], 'at': pd.Series([at(2, 2), at(3, 2)], dtype=object)})
+    result = diff(left, right, ['id'])
+    assert (result.unchanged, result.changed) == (1, 1)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from flexquery.task.io import CsvResultWriter, JsonResultWriter, write_results
+from flexquery.utils.dtypes import optimize_dtypes, stable_dtypes
+
+
+def sample_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'id': np.arange(1, 201, dtype='int64'),
+        'amount': [0.1, 1.5, 3.4028234663852886e+38, np.nan, 1 / 3] * 40,
+        'whole': [1.0, 2.0, 16777217.0, 0.5] * 50,
+        # REAL columns fetched as float64: exactly representable in float32, but written
+        # as 0.10000000149011612 rather than 0.1
+        'real': np.array([0.1, 2.5, 1e-3, 7.0] * 50, dtype='float32').astype('float64'),
+        'region': ['north', 'south', None, 'east'] * 50,
+        'name': [f"customer {i}" for i in range(200)],
+    })
+
+
+def test_optimize_dtypes_keeps_csv_output():
+    df = sample_frame()
+    assert optimize_dtypes(df).to_csv(index=False) == df.to_csv(index=False)
+
+
+def test_optimize_dtypes_keeps_json_output():
+    df = sample_frame()
+    assert optimize_dtypes(df).to_json(orient='records') == df.to_json(orient='records')
+
+
+def test_optimize_dtypes_shrinks_integers_and_keeps_floats():
+    optimized = optimize_dtypes(sample_frame())
+    assert optimized['id'].dtype == np.int16
+    assert (optimized.dtypes[['amount', 'whole', 'real']] == np.float64).all()
+    assert isinstance(optimized['region'].dtype, pd.CategoricalDtype)
+
+
+def test_stable_dtypes_keeps_integer_columns_integer_across_chunks():
+    chunks = [
+        pd.DataFrame({'id': [99, 100], 'v': [99, 100], 'b': [True, False]}),
+        pd.DataFrame({'id': [101, 102], 'v': [101.0, np.nan], 'b': [None, True]}),
+    ]
+    first, second = stable_dtypes(chunks)
+    assert first['v'].dtype == second['v'].dtype == pd.Int64Dtype()
+    assert first['b'].dtype == second['b'].dtype == pd.BooleanDtype()
+
+
+def test_stable_dtypes_casts_to_the_first_non_null_dtype():
+    chunks = [
+        pd.DataFrame({'v': [None, None]}, dtype=object),
+        pd.DataFrame({'v': [1.5, np.nan]}),
+        pd.DataFrame({'v': [2, 3]}),
+    ]
+    dtypes = [chunk['v'].dtype for chunk in stable_dtypes(chunks)]
+    assert dtypes[1:] == [np.float64, np.float64]
+
+
+def test_streamed_csv_and_json_keep_number_formatting(tmp_path):
+    def chunks():
+        yield pd.DataFrame({'id': [99, 100], 'v': [99, 100]})
+        yield pd.DataFrame({'id': [101, 102], 'v': [101.0, np.nan]})
+
+    csv_writer = CsvResultWriter('stream', str(tmp_path))
+    json_writer = JsonResultWriter('stream', str(tmp_path))
+    write_results([csv_writer, json_writer], chunks())
+
+    with open(csv_writer.output_file) as f:
+        assert f.read().splitlines() == ['id,v', '99,99', '100,100', '101,101', '102,']
+    with open(json_writer.output_file) as f:
+        assert f.read().splitlines()[2:] == ['{"id":101,"v":101}', '{"id":102,"v":null}']
@@ -0,0 +1,76 @@
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+
+from flexquery.config.exceptions import ConfigurationError
+from flexquery.utils.in_list import JsonInList, choose_in_list_strategies
+
+
+def strategy_names(chosen):
+    return {param: strategy.name for param, strategy in chosen.items()}
+
+
+def test_short_lists_are_expanded():
+    lists = {'a': [1, 2], 'b': list(range(500))}
+    assert strategy_names(choose_in_list_strategies('mssql', lists)) == {'a': 'expand', 'b': 'expand'}
+
+
+def test_long_lists_use_the_backend_strategy():
+    lists = {'a': list(range(501))}
+    assert strategy_names(choose_in_list_strategies('mssql', lists)) == {'a': 'json'}
+    assert strategy_names(choose_in_list_strategies('duckdb', lists)) == {'a': 'unnest'}
+    assert strategy_names(choose_in_list_strategies('sqlite', lists)) == {'a': 'expand'}
+
+
+def test_lists_switch_when_the_bind_parameter_budget_runs_out():
+    lists = {'a': list(range(500)), 'b': list(range(400)), 'c': list(range(450)), 'd': list(range(480))}
+    # 2100 - 300 reserved leaves room for the three shortest lists only
+    chosen = strategy_names(choose_in_list_strategies('mssql', lists, reserved=300))
+    assert chosen == {'a': 'json', 'b': 'expand', 'c': 'expand', 'd': 'expand'}
+    assert strategy_names(choose_in_list_strategies('mssql', lists, reserved=800)) == {'a': 'json', 'b': 'expand', 'c': 'expand', 'd': 'json'}
+    # Only SQL Server has the 2100 limit
+    assert set(strategy_names(choose_in_list_strategies('duckdb', lists, reserved=350)).values()) == {'expand'}
+
+
+def test_explicit_strategy_on_an_unsupported_backend_is_rejected():
+    with pytest.raises(ConfigurationError, match="in_list_strategy 'json' is not supported for duckdb"):
+        choose_in_list_strategies('duckdb', {'a': [1]}, 'json')
+    with pytest.raises(ConfigurationError, match="in_list_strategy 'unnest' is not supported for mssql"):
+        choose_in_list_strategies('mssql', {'a': [1]}, 'unnest')
+    assert strategy_names(choose_in_list_strategies('duckdb', {'a': [1]}, 'expand')) == {'a': 'expand'}
+
+
+@pytest.mark.parametrize('values, sql_type', [
+    ([True, False, None], 'BIT'),
+    ([1, 2 ** 40, None], 'BIGINT'),
+    ([1, Decimal('2.50'), 123], 'DECIMAL(5,2)'),
+    ([Decimal('-0.001'), 7], 'DECIMAL(4,3)'),
+    ([1, Decimal('1E+40')], 'FLOAT'),
+    ([1, 2.5], 'FLOAT'),
+    ([datetime.date(2024, 1, 1)], 'DATE'),
+    ([datetime.datetime(2024, 1, 1, 10)], 'DATETIME2'),
+    ([None, None], 'NVARCHAR(MAX)'),
+    (['ab', 'abc'], 'VARCHAR(3)'),
+    (['ab', 'äbc'], 'NVARCHAR(3)'),
+])
+def test_json_list_type(values, sql_type):
+    assert JsonInList._sql_server_type(values) == sql_type
+
+
+def test_mixed_int_and_decimal_list_is_sent_exactly():
+    sql, binds = JsonInList().bind('ids', [1, Decimal('2.50'), Decimal('1E+3')])
+    assert sql == "IN (SELECT CAST([value] AS DECIMAL(6,2)) FROM OPENJSON(:ids))"
+    assert binds == {'ids': '[1, "2.50", "1000"]'}
+
+
+def test_tz_aware_datetime_list_keeps_its_offsets():
+    values = [
+        datetime.datetime(2024, 3, 31, 1, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=1))),
+        datetime.datetime(2024, 3, 31, 3, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+        None,
+    ]
+    sql, binds = JsonInList().bind('at', values)
+    assert sql == "IN (SELECT CAST([value] AS DATETIMEOFFSET) FROM OPENJSON(:at))"
+    assert json.loads(binds['at']) == ['2024-03-31T01:30:00+01:00', '2024-03-31T03:30:00+02:00', None]
@@ -0,0 +1,149 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from flexquery.config.exceptions import ConfigurationError, DataProcessorError
+from flexquery.utils.partition import key_slices, merge_streams, split_points, subquery_sql
+
+
+def bounds(slices):
+    return [(key_slice.lower, key_slice.upper) for key_slice in slices]
+
+
+def test_integer_range_is_split_into_equal_slices():
+    assert split_points(0, 100, 4) == [25, 50, 75]
+    assert bounds(key_slices('id', 0, 100, 4)) == [(None, 25), (25, 50), (50, 75), (75, None)]
+
+
+def test_every_key_falls_in_exactly_one_slice():
+    slices = key_slices('id', -7, 93, 6)
+    for key in range(-7, 94):
+        assert sum(
+            (key_slice.lower is None or key_slice.lower <= key) and (key_slice.upper is None or key < key_slice.upper)
+            for key_slice in slices
+        ) == 1
+
+
+def test_narrow_ranges_give_fewer_slices():
+    assert split_points(1, 3, 8) == [2]
+    assert bounds(key_slices('id', 5, 5, 4)) == [(None, None)]
+    day = datetime.date(2024, 1, 1)
+    assert split_points(day, day + datetime.timedelta(days=2), 4) == [day + datetime.timedelta(days=1)]
+
+
+def test_date_datetime_and_decimal_ranges():
+    assert split_points(datetime.date(2024, 1, 1), datetime.date(2024, 1, 31), 3) == [
+        datetime.date(2024, 1, 11), datetime.date(2024, 1, 21)
+    ]
+    assert split_points(datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 2), 4) == [
+        datetime.datetime(2024, 1, 1, 6), datetime.datetime(2024, 1, 1, 12), datetime.datetime(2024, 1, 1, 18)
+    ]
+    assert split_points(Decimal('0'), Decimal('1'), 4) == [Decimal('0.25'), Decimal('0.5'), Decimal('0.75')]
+
+
+def test_empty_result_gives_a_single_slice():
+    assert bounds(key_slices('id', None, None, 4)) == [(None, None)]
+
+
+def test_unsupported_keys_are_rejected():
+    with pytest.raises(DataProcessorError, match='boolean'):
+        split_points(False, True, 2)
+    with pytest.raises(DataProcessorError, match='numeric or a date'):
+        split_points('a', 'z', 2)
+
+
+def test_first_slice_takes_null_keys():
+    first, middle, last = key_slices('id', 0, 90, 3)
+    assert first.query("SELECT * FROM t", '"id"').endswith('WHERE ("id" < :_partition_upper OR "id" IS NULL)\nORDER BY "id"')
+    assert middle.parameters == {'_partition_lower': 30, '_partition_upper': 60}
+    assert last.query("SELECT * FROM t;", '"id"') == 'SELECT * FROM (\nSELECT * FROM t\n) AS partitioned\nWHERE "id" >= :_partition_lower\nORDER BY "id"'
+
+
+def test_final_order_by_is_dropped():
+    assert subquery_sql("SELECT a FROM t\nORDER BY a DESC;\n", 'mssql') == "SELECT a FROM t"
+    assert subquery_sql("SELECT a FROM t UNION ALL SELECT a FROM u ORDER BY 1 -- sorted", 'duckdb') == (
+        "SELECT a FROM t UNION ALL SELECT a FROM u"
+    )
+
+
+def test_order_by_outside_the_final_clause_is_kept():
+    sql = "SELECT ROW_NUMBER() OVER (ORDER BY a) AS n, 'ORDER BY' AS s FROM (SELECT a FROM t ORDER BY a OFFSET 0 ROWS) AS x -- ORDER BY a"
+    assert subquery_sql(sql, 'mssql') == sql
+
+
+def test_order_by_that_selects_rows_is_kept():
+    for sql in ("SELECT TOP 10 a FROM t ORDER BY a", "SELECT a FROM t ORDER BY a OFFSET 5 ROWS", "SELECT a FROM t ORDER BY a LIMIT 5"):
+        assert subquery_sql(sql, 'mssql') == sql
+
+
+def test_with_clause_is_rejected_on_sql_server_only():
+    sql = "WITH recent AS (SELECT * FROM t) SELECT * FROM recent"
+    with pytest.raises(ConfigurationError, match='derived tables'):
+        subquery_sql(sql, 'mssql')
+    with pytest.raises(ConfigurationError):
+        subquery_sql("-- recent rows\n;WITH recent AS (SELECT * FROM t) SELECT * FROM recent", 'mssql')
+    assert subquery_sql(sql, 'duckdb') == sql
+
+
+def producer(name, count, started=None, fail=False):
+    def produce():
+        if started is not None:
+            started.wait(5)
+        for i in range(count):
+            yield f"{name}{i}"
+        if fail:
+            raise ValueError(f"{name} failed")
+    return produce
+
+
+def test_ordered_merge_yields_producers_in_order():
+    # The first producer only starts once the second one has finished
+    second_done = threading.Event()
+
+    def second():
+        yield from producer('b', 3)()
+        second_done.set()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        chunks = list(merge_streams(executor, [producer('a', 2, second_done), second, producer('c', 1)], buffer=4))
+    assert chunks == ['a0', 'a1', 'b0', 'b1', 'b2', 'c0']
+
+
+def test_unordered_merge_yields_every_chunk():
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        chunks = list(merge_streams(executor, [producer('a', 5), producer('b', 3), producer('c', 0)], ordered=False))
+    assert sorted(chunks) == ['a0', 'a1', 'a2', 'a3', 'a4', 'b0', 'b1', 'b2']
+    assert [chunk for chunk in chunks if chunk.startswith('a')] == ['a0', 'a1', 'a2', 'a3', 'a4']
+
+
+def test_merge_of_no_producers_is_empty():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert list(merge_streams(executor, [], ordered=False)) == []
+        assert list(merge_streams(executor, [])) == []
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_producer_error_is_raised_to_the_reader(ordered):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match='b failed'):
+            list(merge_streams(executor, [producer('a', 2), producer('b', 2, fail=True)], ordered))
+
+
+def test_closing_the_merge_stops_the_producers():
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield 'x'
+        finally:
+            closed.set()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        merged = merge_streams(executor, [endless], buffer=1)
+        assert next(merged) == 'x'
+        merged.close()
+        assert closed.wait(5)
@@ -0,0 +1,82 @@
+from sqlalchemy import text
+
+from flexquery.utils.template import CompiledTemplate, load_template, normalize_sql
+
+
+def bind_names(sql: str) -> set:
+    return set(text(sql).compile().params)
+
+
+def test_casts_are_not_parameters():
+    template = CompiledTemplate("SELECT amount::numeric(10, 2), created_at::date FROM orders WHERE id = :id")
+    assert template.parameters == ['id']
+    assert template.render() == "SELECT amount::numeric(10, 2), created_at::date FROM orders WHERE id = :id"
+
+
+def test_cast_of_a_parameter():
+    template = CompiledTemplate("SELECT * FROM orders WHERE created_at >= :since::date")
+    # As with sqlalchemy.text(), a placeholder followed by a cast is not bound
+    assert template.parameters == []
+    assert bind_names(template.render()) == set()
+    template = CompiledTemplate("SELECT * FROM orders WHERE created_at >= CAST(:since AS date)")
+    assert template.parameters == ['since']
+
+
+def test_names_in_string_literals_and_identifiers_are_not_parameters():
+    template = CompiledTemplate("""SELECT '12:30', 'it''s :quoted', "col:name" FROM t WHERE a = :a""")
+    assert template.parameters == ['a']
+    assert bind_names(template.render()) == {'a'}
+
+
+def test_names_in_comments_are_not_parameters():
+    sql = "SELECT a -- filter on :region later\nFROM t /* :b and\n :c */ WHERE d = :d"
+    template = CompiledTemplate(sql)
+    assert template.parameters == ['d']
+    assert bind_names(template.render()) == {'d'}
+    assert template.normalized_sql == "SELECT a FROM t WHERE d = :d"
+
+
+def test_unterminated_literals_run_to_the_end():
+    assert CompiledTemplate("SELECT :a, 'open :b").parameters == ['a']
+    assert CompiledTemplate("SELECT :a /* open :b").parameters == ['a']
+
+
+def test_escaped_colons_are_kept():
+    template = CompiledTemplate(r"SELECT * FROM t WHERE a = '\:x' AND b = \:y AND c = :c")
+    assert template.parameters == ['c']
+    assert template.render() == r"SELECT * FROM t WHERE a = '\:x' AND b = \:y AND c = :c"
+    assert bind_names(template.render()) == {'c'}
+    assert str(text(template.render())) == "SELECT * FROM t WHERE a = ':x' AND b = :y AND c = :c"
+
+
+def test_in_list_parameters_are_replaced_on_render():
+    template = CompiledTemplate("SELECT * FROM t WHERE a IN :ids AND b in\n  :ids OR c = :ids AND d IN :other")
+    assert template.parameters == ['ids', 'other']
+    assert template.in_list_parameters == ['ids', 'other']
+    rendered = template.render({'ids': "IN (:ids_0, :ids_1)"})
+    assert rendered == "SELECT * FROM t WHERE a IN (:ids_0, :ids_1) AND b IN (:ids_0, :ids_1) OR c = :ids AND d IN :other"
+
+
+def test_directives_are_parsed_from_line_comments():
+    template = CompiledTemplate(
+        "-- @watermark updated_at  \n"
+        "--@Partition_Key  id\n"
+        "-- @full_refresh\n"
+        "-- not @a directive\n"
+        "/* @block comment */\n"
+        "SELECT '-- @string' FROM t"
+    )
+    assert template.directives == {'watermark': 'updated_at', 'partition_key': 'id', 'full_refresh': ''}
+
+
+def test_normalize_sql_collapses_whitespace_outside_literals():
+    assert normalize_sql("SELECT  a,\n\tb -- note\nFROM t WHERE s = 'a  b'") == "SELECT a, b FROM t WHERE s = 'a  b'"
+
+
+def test_load_template_reloads_a_changed_file(tmp_path):
+    query_file = tmp_path / 'query.sql'
+    query_file.write_text("SELECT :a")
+    first = load_template(str(query_file))
+    assert load_template(str(query_file)) is first
+    query_file.write_text("SELECT :a, :bb")
+    assert load_template(str(query_file)).parameters == ['a', 'bb']
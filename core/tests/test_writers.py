@@ -0,0 +1,79 @@
+import datetime
+import json
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from flexquery.task.io import ExcelResultWriter, JsonResultWriter, write_results
+from flexquery.utils.processor import ColumnarQueryExecutor
+
+
+def offset(hours: int) -> datetime.timezone:
+    return datetime.timezone(datetime.timedelta(hours=hours))
+
+
+# The same instant, 2024-03-31 00:30 UTC, with two different offsets, as DATETIMEOFFSET returns them
+MIXED_OFFSETS = (
+    datetime.datetime(2024, 3, 31, 1, 30, tzinfo=offset(1)),
+    None,
+    datetime.datetime(2024, 3, 31, 2, 30, tzinfo=offset(2)),
+)
+
+
+def mixed_offset_frames():
+    converted = pd.DataFrame({'id': [1, 2, 3], 'at': ColumnarQueryExecutor._to_array(datetime.datetime, MIXED_OFFSETS)})
+    as_objects = pd.DataFrame({'id': [1, 2, 3], 'at': pd.Series(MIXED_OFFSETS, dtype=object)})
+    return [converted, as_objects]
+
+
+def test_mixed_offsets_are_converted_to_utc():
+    array = ColumnarQueryExecutor._to_array(datetime.datetime, MIXED_OFFSETS)
+    assert str(array.dtype) == 'datetime64[us, UTC]'
+    assert array[0] == array[2] == pd.Timestamp('2024-03-31 00:30', tz='UTC')
+    assert pd.isna(array[1])
+
+
+@pytest.mark.parametrize('df', mixed_offset_frames())
+def test_json_writes_mixed_offsets_in_utc(tmp_path, df):
+    writer = JsonResultWriter('result', str(tmp_path), date_format='iso')
+    assert write_results([writer], df) == 3
+    with open(writer.output_file) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['at'] for record in records] == ['2024-03-31T00:30:00.000', None, '2024-03-31T00:30:00.000']
+
+
+@pytest.mark.parametrize('df', mixed_offset_frames())
+def test_excel_writes_mixed_offsets_in_utc(tmp_path, df):
+    openpyxl = pytest.importorskip('openpyxl')
+    pytest.importorskip('xlsxwriter')
+    writer = ExcelResultWriter('result', str(tmp_path))
+    assert write_results([writer], df) == 3
+    sheet = openpyxl.load_workbook(writer.output_file).active
+    assert [row[1] for row in sheet.iter_rows(min_row=2, values_only=True)] == [
+        datetime.datetime(2024, 3, 31, 0, 30), None, datetime.datetime(2024, 3, 31, 0, 30)
+    ]
+
+
+def null_first_chunks():
+    yield pd.DataFrame({'id': [1, 2], 'day': [None, None], 'amount': [None, None]}, dtype=object)
+    yield pd.DataFrame({'id': [3, 4], 'day': [datetime.date(2024, 1, 2), None], 'amount': [Decimal('1.25'), None]})
+
+
+def test_json_encodes_columns_that_are_null_in_the_first_chunk(tmp_path):
+    writer = JsonResultWriter('result', str(tmp_path), date_format='iso')
+    assert write_results([writer], null_first_chunks()) == 4
+    with open(writer.output_file) as f:
+        records = [json.loads(line) for line in f]
+    assert [(record['day'], record['amount']) for record in records] == [
+        (None, None), (None, None), ('2024-01-02T00:00:00.000', 1.25), (None, None)
+    ]
+
+
+def test_excel_formats_columns_that_are_null_in_the_first_chunk(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    pytest.importorskip('xlsxwriter')
+    writer = ExcelResultWriter('result', str(tmp_path))
+    assert write_results([writer], null_first_chunks()) == 4
+    cell = openpyxl.load_workbook(writer.output_file).active['B4']
+    assert (cell.value, cell.number_format) == (datetime.datetime(2024, 1, 2), ExcelResultWriter.date_format)